@@ -0,0 +1,138 @@
+import os
+import shutil
+import uuid
+from hashlib import sha256
+
+# Workspace files are stored once per distinct content, as
+# BLOB_STORE_DIR/<sha256[:2]>/<sha256>, and hardlinked into each workspace
+# that contains them. Nothing writes into a workspace file in place (every
+# write replaces it), so a shared inode is never modified under another
+# workspace. Filesystems without hardlinks get a plain copy instead.
+BLOB_STORE_DIR = os.path.abspath(
+    os.getenv(
+        "BLOB_STORE_DIR",
+        os.path.join(
+            os.getenv("BUILDFLOW_STATE_DIR", os.path.join(os.path.dirname(__file__), "..", ".state")),
+            "blobs",
+        ),
+    )
+)
+
+# Unreferenced blobs are only deleted once they have been idle this long,
+# so a write that is about to link an existing blob never loses it.
+BLOB_GC_GRACE_SECONDS = max(0, int(os.getenv("BLOB_GC_GRACE_SECONDS", "3600")))
+
+_BLOCK_SIZE = 64 * 1024
+
+
+def _hash_file(path: str) -> tuple[str, int]:
+    digest = sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while block := f.read(_BLOCK_SIZE):
+            digest.update(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+class BlobStore:
+    """sha256 -> bytes, written once and shared through hardlinks."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def variant_path(self, digest: str, encoding: str) -> str:
+        """Where a precompressed copy of a blob lives, e.g. encoding "gzip"."""
+        return f"{self.path(digest)}.{encoding}"
+
+    def put_variant(self, digest: str, encoding: str, data: bytes):
+        variant_path = self.variant_path(digest, encoding)
+        tmp_path = f"{variant_path}.{uuid.uuid4().hex[:8]}.part"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, variant_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _touch(self, blob_path: str) -> bool:
+        """Refresh an existing blob's mtime so GC's grace period restarts."""
+        try:
+            os.utime(blob_path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def put_bytes(self, data: bytes) -> tuple[str, int, bool]:
+        """Store `data`; returns (digest, size, whether it was new)."""
+        digest = sha256(data).hexdigest()
+        blob_path = self.path(digest)
+        if self._touch(blob_path):
+            return digest, len(data), False
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        tmp_path = f"{blob_path}.{uuid.uuid4().hex[:8]}.part"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, blob_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest, len(data), True
+
+    def put_file(self, src_path: str) -> tuple[str, int, bool]:
+        """Move a finished file into the store; returns (digest, size, whether it was new)."""
+        digest, size = _hash_file(src_path)
+        blob_path = self.path(digest)
+        if self._touch(blob_path):
+            os.remove(src_path)
+            return digest, size, False
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        try:
+            os.replace(src_path, blob_path)
+        except OSError:
+            # Store on another filesystem: copy it in, then drop the source.
+            tmp_path = f"{blob_path}.{uuid.uuid4().hex[:8]}.part"
+            try:
+                shutil.copyfile(src_path, tmp_path)
+                os.replace(tmp_path, blob_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            os.remove(src_path)
+        return digest, size, True
+
+    def link(self, digest: str, target_path: str):
+        """Atomically point `target_path` at a blob."""
+        tmp_path = f"{target_path}.{uuid.uuid4().hex[:8]}.part"
+        try:
+            try:
+                os.link(self.path(digest), tmp_path)
+            except OSError:
+                # Cross-device or no hardlink support.
+                shutil.copyfile(self.path(digest), tmp_path)
+            os.replace(tmp_path, target_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def remove(self, digest: str) -> int:
+        """Delete a blob and its precompressed copies; returns the bytes freed."""
+        freed = 0
+        for path in (self.path(digest), self.variant_path(digest, "gzip"), self.variant_path(digest, "br")):
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                freed += size
+            except FileNotFoundError:
+                continue
+        return freed
+
+
+BLOBS = BlobStore(BLOB_STORE_DIR)
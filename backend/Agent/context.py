@@ -0,0 +1,284 @@
+import math
+import os
+import re
+from html.parser import HTMLParser
+
+try:
+    from backend.Agent.states import ImplementationTask, Plan
+except ModuleNotFoundError:
+    from Agent.states import ImplementationTask, Plan
+
+
+CODER_PROMPT_TOKEN_BUDGET = max(256, int(os.getenv("CODER_PROMPT_TOKEN_BUDGET", "2000")))
+CODER_PROMPT_SLIM = os.getenv("CODER_PROMPT_SLIM", "1").strip().lower() not in {"0", "false", "no"}
+
+_TRUNCATED = "\n... (truncated)"
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token, like most BPE vocabularies.
+    return math.ceil(len(text) / 4)
+
+
+def _ext(path: str) -> str:
+    return os.path.splitext(path)[1].lower().lstrip(".")
+
+
+# ---------------------------------------------------
+# Dependency excerpts
+# ---------------------------------------------------
+
+class _HTMLOutline(HTMLParser):
+    """Collect the element tree of an HTML file as `tag#id.class[attr=value]` lines."""
+
+    _VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+    _SKIP = {"head", "script", "style", "title", "meta", "link"}
+    _ATTRS = ("type", "name", "for", "placeholder", "href", "role")
+
+    def __init__(self):
+        super().__init__()
+        self.lines: list[str] = []
+        self._depth = 0
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        void = tag in self._VOID
+        if self._skipping or tag in self._SKIP:
+            if not void:
+                self._skipping += 1
+            return
+
+        attrs = dict(attrs)
+        label = tag
+        if attrs.get("id"):
+            label += f"#{attrs['id']}"
+        for cls in (attrs.get("class") or "").split():
+            label += f".{cls}"
+        for key, value in attrs.items():
+            if value is not None and (key in self._ATTRS or key.startswith("data-")):
+                label += f"[{key}={value}]"
+
+        line = "  " * self._depth + label
+        # Collapse runs of identical siblings such as list items.
+        if not (self.lines and self.lines[-1] == line):
+            self.lines.append(line)
+        if not void:
+            self._depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self._VOID:
+            return
+        if self._skipping:
+            self._skipping -= 1
+            return
+        self._depth = max(0, self._depth - 1)
+
+
+def _html_excerpt(content: str) -> str:
+    outline = _HTMLOutline()
+    try:
+        outline.feed(content)
+        outline.close()
+    except Exception:
+        return content
+    return "Element outline (tag#id.class[attr]):\n" + "\n".join(outline.lines)
+
+
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_CSS_CLASS = re.compile(r"\.(-?[_a-zA-Z][\w-]*)")
+_CSS_ID = re.compile(r"#(-?[_a-zA-Z][\w-]*)")
+_CSS_VAR = re.compile(r"(--[\w-]+)\s*:")
+
+
+def _css_excerpt(content: str) -> str:
+    content = _CSS_COMMENT.sub("", content)
+    selectors = " ".join(re.findall(r"([^{}]+)\{", content))
+    # Hex colours inside values are never followed by `{`, so ids here are real.
+    classes = sorted(set(_CSS_CLASS.findall(selectors)))
+    ids = sorted(set(_CSS_ID.findall(selectors)))
+    variables = sorted(set(_CSS_VAR.findall(content)))
+
+    lines = []
+    if classes:
+        lines.append("Classes: " + ", ".join(f".{name}" for name in classes))
+    if ids:
+        lines.append("Ids: " + ", ".join(f"#{name}" for name in ids))
+    if variables:
+        lines.append("Custom properties: " + ", ".join(variables))
+    return "\n".join(lines) or content
+
+
+_JS_IDS = re.compile(r"getElementById\(\s*['\"]([^'\"]+)['\"]")
+_JS_SELECTORS = re.compile(r"querySelector(?:All)?\(\s*['\"]([^'\"]+)['\"]")
+_JS_CLASSES = re.compile(r"classList\.(?:add|remove|toggle|contains)\(\s*['\"]([^'\"]+)['\"]")
+_JS_FUNCTIONS = re.compile(r"function\s+([A-Za-z_$][\w$]*)|(?:const|let)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s*)?\(")
+
+
+def _js_excerpt(content: str) -> str:
+    ids = sorted(set(_JS_IDS.findall(content)))
+    selectors = sorted(set(_JS_SELECTORS.findall(content)))
+    classes = sorted(set(_JS_CLASSES.findall(content)))
+    functions = sorted({a or b for a, b in _JS_FUNCTIONS.findall(content)})
+
+    lines = []
+    if ids:
+        lines.append("Element ids used: " + ", ".join(f"#{name}" for name in ids))
+    if selectors:
+        lines.append("Selectors used: " + ", ".join(selectors))
+    if classes:
+        lines.append("Classes toggled: " + ", ".join(f".{name}" for name in classes))
+    if functions:
+        lines.append("Functions: " + ", ".join(functions))
+    return "\n".join(lines) or content
+
+
+_EXCERPTS = {"html": _html_excerpt, "htm": _html_excerpt, "css": _css_excerpt, "js": _js_excerpt}
+
+
+def dependency_excerpt(dep_path: str, content: str) -> str:
+    """Reduce a dependency file to the names another file needs to reference.
+
+    HTML becomes an element outline (ids, classes, form attributes), CSS a
+    list of selectors, JS the ids/selectors/classes it touches. Other file
+    types are passed through and left to the token budget.
+    """
+    excerpt = _EXCERPTS.get(_ext(dep_path))
+    return excerpt(content) if excerpt else content
+
+
+# ---------------------------------------------------
+# Plan slice
+# ---------------------------------------------------
+
+def _project_folder(plan: Plan) -> str:
+    paths = [os.path.normpath(file.path) for file in plan.files if file.path.strip()]
+    try:
+        return os.path.commonpath([os.path.dirname(path) for path in paths]) if paths else ""
+    except ValueError:
+        return ""
+
+
+def project_relative_path(plan: Plan, filepath: str) -> str:
+    """`filepath` relative to the plan's project folder, with forward slashes."""
+    return os.path.relpath(filepath, _project_folder(plan) or ".").replace("\\", "/")
+
+
+def plan_summary(plan: Plan) -> str:
+    """The plan as every coder call of a run sees it: summary, features and
+    file list. It is identical for all files of a project, so it belongs
+    before anything file-specific in the prompt."""
+    folder = _project_folder(plan) or "."
+    lines = [
+        f"App: {plan.name} - {plan.description}",
+        f"Tech stack: {plan.techstack}",
+        "Features:",
+        *[f"- {feature}" for feature in plan.features],
+        "Files: " + ", ".join(
+            os.path.relpath(file.path, folder).replace("\\", "/") for file in plan.files
+        ),
+    ]
+    return "\n".join(lines)
+
+
+def file_brief(plan: Plan, filepath: str) -> str:
+    """This file's name and purpose from the plan."""
+    target = os.path.normpath(filepath)
+    purpose = next(
+        (file.purpose for file in plan.files if os.path.normpath(file.path) == target), ""
+    )
+    name = project_relative_path(plan, filepath)
+    return f"{name} - {purpose}" if purpose else name
+
+
+# ---------------------------------------------------
+# Coder context
+# ---------------------------------------------------
+
+def _full_user_content(plan: Plan, task: ImplementationTask, dep_contents: dict[str, str]) -> str:
+    user_content = f"""
+Project Plan: {plan.model_dump_json()}
+"""
+
+    if dep_contents:
+        user_content += "\nDependency files:\n"
+        for path, cont in dep_contents.items():
+            user_content += f"\n--- {path} ---\n{cont}\n"
+
+    user_content += f"""
+Task: {task.task_description}
+
+Return ONLY the full file content for {task.filepath}. No markdown. No explanation."""
+    return user_content
+
+
+def _fit(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    keep = max(0, max_tokens * 4 - len(_TRUNCATED))
+    return text[:keep] + _TRUNCATED
+
+
+def _slim_user_content(plan: Plan, task: ImplementationTask, dep_contents: dict[str, str],
+                       token_budget: int) -> str:
+    # Shared per-project text first, then this file's details, so calls for
+    # sibling files share as long a prefix as possible.
+    head = f"""
+Project:
+{plan_summary(plan)}
+
+File: {file_brief(plan, task.filepath)}
+"""
+    tail = f"""
+Task: {task.task_description}
+
+Return ONLY the full file content for {task.filepath}. No markdown. No explanation."""
+
+    # The plan summary and task are always sent; dependency excerpts share
+    # whatever budget remains, in the architect's dependency order.
+    remaining = token_budget - estimate_tokens(head + tail)
+    sections = []
+    for path, content in dep_contents.items():
+        header = f"\n--- {path} ---\n"
+        room = remaining - estimate_tokens(header)
+        if room <= 0:
+            break
+        section = header + _fit(dependency_excerpt(path, content), room) + "\n"
+        sections.append(section)
+        remaining -= estimate_tokens(section)
+
+    body = head
+    if sections:
+        body += "\nDependency files (reference these names exactly):\n" + "".join(sections)
+    return body + tail
+
+
+def build_coder_context(plan: Plan, task: ImplementationTask, dep_contents: dict[str, str],
+                        token_budget: int = CODER_PROMPT_TOKEN_BUDGET) -> tuple[str, dict]:
+    """Return the coder's user message and token estimates before/after slimming."""
+    full = _full_user_content(plan, task, dep_contents)
+    content = _slim_user_content(plan, task, dep_contents, token_budget) if CODER_PROMPT_SLIM else full
+    return content, {
+        "prompt_tokens_full": estimate_tokens(full),
+        "prompt_tokens_sent": estimate_tokens(content),
+    }
+
+
+def build_bundle_context(plan: Plan, tasks: list[ImplementationTask]) -> str:
+    """User message asking for several files of one project in a single reply."""
+    sections = []
+    for task in tasks:
+        section = f"File: {file_brief(plan, task.filepath)}\nTask: {task.task_description}"
+        if task.dependencies:
+            deps = ", ".join(project_relative_path(plan, dep) for dep in task.dependencies)
+            section += f"\nUses: {deps}"
+        sections.append(section)
+
+    files = "\n\n".join(sections)
+    names = ", ".join(project_relative_path(plan, task.filepath) for task in tasks)
+    return f"""
+Project:
+{plan_summary(plan)}
+
+{files}
+
+Return ONLY these files, in this order: {names}."""
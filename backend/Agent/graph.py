@@ -1,19 +1,87 @@
+import asyncio
 import os
-import json
+from functools import partial
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from threading import Lock
 from dotenv import load_dotenv
 from langchain_core.globals import set_debug, set_verbose
-from langchain_groq.chat_models import ChatGroq
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.config import get_stream_writer
 from langgraph.constants import END
 from langgraph.graph import StateGraph
+from pydantic import ValidationError
 
 try:
-    from backend.Agent.prompts import architect_prompt, coder_system_prompt, planner_prompt
-    from backend.Agent.states import CoderState, Plan, TaskPlan
-    from backend.Agent.tools import safe_path, write_file
+    from backend.Agent.context import build_bundle_context, build_coder_context, project_relative_path
+    from backend.Agent.jsonrepair import ArrayItemStream, parse_json
+    from backend.Agent.llm import create_llm
+    from backend.Agent.multifile import SectionSplitter, validate_section
+    from backend.Agent.resilience import (
+        aresilient_invoke,
+        aresilient_stream,
+        is_bad_request,
+        is_llm_error,
+        resilient_invoke,
+        resilient_stream,
+    )
+    from backend.Agent.routing import (
+        ModelRouter,
+        load_routes,
+        mentions_complex_features,
+        plan_complexity,
+        prompt_complexity,
+    )
+    from backend.Agent.prompts import (
+        BLUEPRINT_JSON_SCHEMA,
+        PLAN_JSON_SCHEMA,
+        TASK_PLAN_JSON_SCHEMA,
+        architect_prompt,
+        blueprint_prompt,
+        bundle_system_prompt,
+        coder_system_prompt,
+        planner_prompt,
+    )
+    from backend.Agent.stage_cache import load_stage, save_stage, stage_key
+    from backend.Agent.states import Blueprint, CoderState, File, ImplementationTask, Plan, TaskPlan
+    from backend.Agent.telemetry import METRICS, annotate, record_bytes_written, span
+    from backend.Agent.tools import async_atomic_writer, atomic_writer, safe_path, write_file
 except ModuleNotFoundError:
-    from Agent.prompts import architect_prompt, coder_system_prompt, planner_prompt
-    from Agent.states import CoderState, Plan, TaskPlan
-    from Agent.tools import safe_path, write_file
+    from Agent.context import build_bundle_context, build_coder_context, project_relative_path
+    from Agent.jsonrepair import ArrayItemStream, parse_json
+    from Agent.llm import create_llm
+    from Agent.multifile import SectionSplitter, validate_section
+    from Agent.resilience import (
+        aresilient_invoke,
+        aresilient_stream,
+        is_bad_request,
+        is_llm_error,
+        resilient_invoke,
+        resilient_stream,
+    )
+    from Agent.routing import (
+        ModelRouter,
+        load_routes,
+        mentions_complex_features,
+        plan_complexity,
+        prompt_complexity,
+    )
+    from Agent.prompts import (
+        BLUEPRINT_JSON_SCHEMA,
+        PLAN_JSON_SCHEMA,
+        TASK_PLAN_JSON_SCHEMA,
+        architect_prompt,
+        blueprint_prompt,
+        bundle_system_prompt,
+        coder_system_prompt,
+        planner_prompt,
+    )
+    from Agent.stage_cache import load_stage, save_stage, stage_key
+    from Agent.states import Blueprint, CoderState, File, ImplementationTask, Plan, TaskPlan
+    from Agent.telemetry import METRICS, annotate, record_bytes_written, span
+    from Agent.tools import async_atomic_writer, atomic_writer, safe_path, write_file
 
 
 # ---------------------------------------------------
@@ -25,37 +93,163 @@ set_debug(False)
 set_verbose(False)
 
 MODEL_NAME = os.getenv("GROQ_MODEL", "openai/gpt-oss-120b")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY", "").strip()
-_LLM_INIT_ERROR = ""
-
-if GROQ_API_KEY:
-    try:
-        llm = ChatGroq(model=MODEL_NAME, api_key=GROQ_API_KEY)
-    except Exception as exc:
-        llm = None
-        _LLM_INIT_ERROR = str(exc)
-else:
-    llm = None
-    _LLM_INIT_ERROR = "GROQ_API_KEY is not set."
+# Tried in order when the primary model keeps failing with transient errors.
+FALLBACK_MODELS = [
+    name.strip() for name in os.getenv("GROQ_FALLBACK_MODELS", "").split(",")
+    if name.strip() and name.strip() != MODEL_NAME
+]
+CODER_MAX_CONCURRENCY = max(1, int(os.getenv("CODER_MAX_CONCURRENCY", "4")))
+CODER_STREAMING = os.getenv("CODER_STREAMING", "1").strip().lower() not in {"0", "false", "no"}
+# "schema" constrains planner/architect output to the Pydantic schema,
+# "json" only asks for a JSON object, "off" relies on the prompt alone.
+# Models that reject the requested mode with a 400 are retried with the
+# next weaker one.
+LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "schema").strip().lower()
+# Stream the architect and start coding files as soon as their task arrives.
+ARCHITECT_PIPELINING = os.getenv("ARCHITECT_PIPELINING", "1").strip().lower() not in {"0", "false", "no"}
+# Ask for all files of a small project in one multi-file call; files whose
+# section fails validation are then generated one by one.
+CODER_SINGLE_SHOT = os.getenv("CODER_SINGLE_SHOT", "0").strip().lower() not in {"0", "false", "no"}
+SINGLE_SHOT_MAX_FILES = max(2, int(os.getenv("SINGLE_SHOT_MAX_FILES", "4")))
+# "staged" runs planner then architect, "fused" asks for plan and tasks in a
+# single call, "auto" picks fused for short prompts without complex features.
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "auto").strip().lower()
+FUSED_MAX_PROMPT_WORDS = max(1, int(os.getenv("FUSED_MAX_PROMPT_WORDS", "40")))
+CHECKPOINT_PATH = os.path.abspath(
+    os.getenv(
+        "GRAPH_CHECKPOINT_PATH",
+        os.path.join(
+            os.getenv("BUILDFLOW_STATE_DIR", os.path.join(os.path.dirname(__file__), "..", ".state")),
+            "checkpoints.sqlite3",
+        ),
+    )
+)
+llm, _LLM_INIT_ERROR = create_llm(MODEL_NAME)
+# Other models (routes, fallbacks) are created on first use.
+_MODELS: dict[str, object] = {}
+_MODELS_LOCK = Lock()
+ROUTER = ModelRouter(load_routes(), MODEL_NAME)
 
 
-def _require_llm() -> ChatGroq:
+def _require_llm():
     if llm is None:
         raise RuntimeError(
-            f"ChatGroq initialization failed for model '{MODEL_NAME}'. {_LLM_INIT_ERROR}"
+            f"LLM initialization failed for model '{MODEL_NAME}'. {_LLM_INIT_ERROR}"
         )
     return llm
 
 
+def _llm_config(stage: str, **metadata) -> dict:
+    """Tag a call with its graph stage (visible in traces and to the fake LLM)."""
+    return {"run_name": stage, "metadata": {"stage": stage, **metadata}}
+
+
+def _model(name: str):
+    """The chat model called `name`, or None if it cannot be created."""
+    if name == MODEL_NAME:
+        return llm
+    with _MODELS_LOCK:
+        if name not in _MODELS:
+            _MODELS[name] = create_llm(name)[0]
+        return _MODELS[name]
+
+
+def _response_format(name: str, schema: dict) -> dict | None:
+    if LLM_JSON_MODE == "schema":
+        return {"type": "json_schema", "json_schema": {"name": name, "schema": schema}}
+    if LLM_JSON_MODE == "json":
+        return {"type": "json_object"}
+    return None
+
+
+def _format_fallbacks(response_format: dict | None) -> list[dict | None]:
+    """The requested response_format followed by the weaker ones to try if
+    the model rejects it."""
+    if response_format is None:
+        return [None]
+    if response_format["type"] == "json_schema":
+        return [response_format, {"type": "json_object"}, None]
+    return [response_format, None]
+
+
+def _format_rejected(stage: str, response_format: dict | None, exc: BaseException) -> bool:
+    if response_format is None or not is_bad_request(exc):
+        return False
+    print(f"{stage}: response_format {response_format['type']} rejected, retrying with a weaker one:", exc)
+    METRICS.inc("buildflow_llm_format_downgrades_total", node=stage, format=response_format["type"])
+    return True
+
+
+METRICS.counter(
+    "buildflow_llm_format_downgrades_total",
+    "LLM calls retried with a weaker response_format after the model rejected it.",
+)
+
+
+def _route(stage: str, metadata: dict, response_format: dict | None = None) -> tuple[str, list]:
+    """Return the routing rule for a call and its (model name, model) candidates:
+    the route's models in preference order, then GROQ_FALLBACK_MODELS."""
+    ext = os.path.splitext(metadata.get("filepath", ""))[1]
+    route, names = ROUTER.select(stage, ext, metadata.get("complexity", "simple"))
+    candidates = [(name, _model(name)) for name in dict.fromkeys(names + FALLBACK_MODELS)]
+    candidates = [(name, model) for name, model in candidates if model is not None]
+    if not candidates:
+        candidates = [(MODEL_NAME, _require_llm())]
+    if response_format:
+        candidates = [(name, model.bind(response_format=response_format)) for name, model in candidates]
+    return route, candidates
+
+
+def _invoke_llm(stage: str, messages, response_format: dict | None = None, **metadata):
+    """Invoke the routed model with retries and fallbacks, recording latency and usage on the open spans."""
+    for attempt_format in _format_fallbacks(response_format):
+        route, candidates = _route(stage, metadata, attempt_format)
+        try:
+            return resilient_invoke(
+                stage, candidates, messages, _llm_config(stage, route=route, **metadata),
+                observe=partial(ROUTER.observe, route),
+            )
+        except Exception as exc:
+            if not _format_rejected(stage, attempt_format, exc):
+                raise
+
+
+async def _ainvoke_llm(stage: str, messages, response_format: dict | None = None, **metadata):
+    for attempt_format in _format_fallbacks(response_format):
+        route, candidates = _route(stage, metadata, attempt_format)
+        try:
+            return await aresilient_invoke(
+                stage, candidates, messages, _llm_config(stage, route=route, **metadata),
+                observe=partial(ROUTER.observe, route),
+            )
+        except Exception as exc:
+            if not _format_rejected(stage, attempt_format, exc):
+                raise
+
+
+def _stream_llm(stage: str, messages, **metadata):
+    """Stream LLM chunks; latency and usage are recorded once the stream ends."""
+    route, candidates = _route(stage, metadata)
+    return resilient_stream(
+        stage, candidates, messages, _llm_config(stage, route=route, **metadata),
+        observe=partial(ROUTER.observe, route),
+    )
+
+
+def _astream_llm(stage: str, messages, **metadata):
+    route, candidates = _route(stage, metadata)
+    return aresilient_stream(
+        stage, candidates, messages, _llm_config(stage, route=route, **metadata),
+        observe=partial(ROUTER.observe, route),
+    )
+
+
 def get_llm_status() -> tuple[bool, str, str]:
     return llm is not None, MODEL_NAME, _LLM_INIT_ERROR
 
 
-def _clean_json(content: str):
-    content = content.strip()
-    if content.startswith("```"):
-        content = content.replace("```json", "").replace("```", "")
-    return content.strip()
+def get_route_stats() -> list[dict]:
+    return ROUTER.snapshot()
 
 
 def _validate_index_exists(steps):
@@ -74,11 +268,11 @@ def _validate_index_exists(steps):
         raise RuntimeError("Runnable app was not created (missing index.html).")
 
 
-def _normalize_task_filepaths(task_plan: TaskPlan, plan: Plan) -> TaskPlan:
-    """Map architect output to project-scoped file paths from the plan."""
+def _path_normalizer(plan: Plan):
+    """Return a function mapping architect file paths onto the plan's project-scoped paths."""
     planned_paths = [file.path.strip() for file in plan.files if file.path.strip()]
     if not planned_paths:
-        return task_plan
+        return lambda path: path
 
     normalized_planned = {
         os.path.normpath(path).replace("\\", "/") for path in planned_paths
@@ -107,9 +301,20 @@ def _normalize_task_filepaths(task_plan: TaskPlan, plan: Plan) -> TaskPlan:
         prefixed = os.path.join(base_folder, cleaned)
         return os.path.normpath(prefixed).replace("\\", "/")
 
+    return _normalize
+
+
+def _normalize_step(step: ImplementationTask, normalize) -> ImplementationTask:
+    step.filepath = normalize(step.filepath)
+    step.dependencies = [normalize(dep) for dep in step.dependencies]
+    return step
+
+
+def _normalize_task_filepaths(task_plan: TaskPlan, plan: Plan) -> TaskPlan:
+    """Map architect output to project-scoped file paths from the plan."""
+    normalize = _path_normalizer(plan)
     for step in task_plan.implementation_steps:
-        step.filepath = _normalize(step.filepath)
-        step.dependencies = [_normalize(dep) for dep in step.dependencies]
+        _normalize_step(step, normalize)
 
     return task_plan
 
@@ -118,15 +323,57 @@ def _normalize_task_filepaths(task_plan: TaskPlan, plan: Plan) -> TaskPlan:
 # PLANNER
 # ---------------------------------------------------
 
-def planner_agent(state: dict) -> dict:
-    user_prompt = state["user_prompt"]
-    project_id = state.get("project_id", "")
+def _normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.strip().lower().split())
+
+
+def _project_relative_plan_json(plan: Plan) -> str:
+    """Serialize a plan without its per-run project folder so equal plans hash equally."""
+    relative = plan.model_copy(deep=True)
+    paths = [os.path.normpath(file.path) for file in relative.files if file.path.strip()]
+    try:
+        project_folder = os.path.commonpath([os.path.dirname(path) for path in paths]) if paths else ""
+    except ValueError:
+        project_folder = ""
+
+    if project_folder:
+        for file in relative.files:
+            file.path = os.path.relpath(file.path, project_folder).replace("\\", "/")
+    return relative.model_dump_json()
 
-    response = _require_llm().invoke(planner_prompt(user_prompt))
 
-    data = json.loads(_clean_json(response.content))
-    plan = Plan(**data)
+def _load_cached_stage(stage: str, cache_key: str, model, node_span):
+    data = load_stage(stage, cache_key)
+    node_span.attributes["cached"] = data is not None
+    return model(**data) if data is not None else None
 
+
+def _valid_task(item) -> bool:
+    try:
+        ImplementationTask(**item)
+    except (TypeError, ValidationError):
+        return False
+    return True
+
+
+def _parse_stage_response(stage: str, cache_key: str, text: str, model):
+    """Parse a planner/architect reply, repairing truncated JSON instead of failing the run."""
+    data, repaired = parse_json(text)
+    if not isinstance(data, dict):
+        raise ValueError(f"{stage} reply is not a JSON object")
+    if model in (TaskPlan, Blueprint) and isinstance(data.get("implementation_steps", []), list):
+        # A cut-off reply can end in a half-written task; keep the complete ones.
+        data["implementation_steps"] = [
+            item for item in data.get("implementation_steps", []) if _valid_task(item)
+        ]
+    parsed = model(**data)
+    if not repaired:
+        # Repaired output may be missing parts; do not memoize it.
+        save_stage(stage, cache_key, data)
+    return parsed
+
+
+def _plan_update(plan: Plan, project_id: str) -> dict:
     if project_id:
         for file in plan.files:
             file.path = os.path.join(project_id, file.path)
@@ -134,86 +381,617 @@ def planner_agent(state: dict) -> dict:
     return {"plan": plan}
 
 
+def planner_agent(state: dict) -> dict:
+    user_prompt = state["user_prompt"]
+
+    cache_key = stage_key("planner", _normalize_prompt(user_prompt))
+    with span("planner") as node_span:
+        plan = _load_cached_stage("planner", cache_key, Plan, node_span)
+        if plan is None:
+            response = _invoke_llm(
+                "planner", planner_prompt(user_prompt),
+                response_format=_response_format("Plan", PLAN_JSON_SCHEMA),
+                complexity=prompt_complexity(user_prompt),
+            )
+            plan = _parse_stage_response("planner", cache_key, response.content, Plan)
+
+    return _plan_update(plan, state.get("project_id", ""))
+
+
+async def aplanner_agent(state: dict) -> dict:
+    user_prompt = state["user_prompt"]
+
+    cache_key = stage_key("planner", _normalize_prompt(user_prompt))
+    with span("planner") as node_span:
+        plan = _load_cached_stage("planner", cache_key, Plan, node_span)
+        if plan is None:
+            response = await _ainvoke_llm(
+                "planner", planner_prompt(user_prompt),
+                response_format=_response_format("Plan", PLAN_JSON_SCHEMA),
+                complexity=prompt_complexity(user_prompt),
+            )
+            plan = _parse_stage_response("planner", cache_key, response.content, Plan)
+
+    return _plan_update(plan, state.get("project_id", ""))
+
+
 # ---------------------------------------------------
 # ARCHITECT
 # ---------------------------------------------------
 
+def _task_plan_update(task_plan: TaskPlan, plan: Plan) -> dict:
+    # Cached task plans may carry an earlier run's project folder;
+    # normalization remaps them onto this plan's files.
+    task_plan = _normalize_task_filepaths(task_plan, plan)
+
+    task_plan.plan = plan
+
+    return {"task_plan": task_plan}
+
+
+class _EarlyCoder:
+    """Start coding files while the architect's reply is still streaming.
+
+    Each task in `implementation_steps` is handed to `start` as soon as it
+    has streamed in, provided every planned file it depends on was already
+    written by an earlier early task. `start` returns a future or asyncio
+    task; the coder node picks up whatever was not started here.
+    """
+
+    def __init__(self, plan: Plan, start):
+        self._items = ArrayItemStream("implementation_steps")
+        self._normalize = _path_normalizer(plan)
+        self._planned = {self._normalize(file.path) for file in plan.files}
+        self._start = start
+        self.started: list[tuple[str, object]] = []
+
+    def feed(self, text: str):
+        for item in self._items.feed(text):
+            if not _valid_task(item):
+                continue
+            step = _normalize_step(ImplementationTask(**item), self._normalize)
+            if self._ready(step):
+                self.started.append((step.filepath, self._start(step)))
+
+    def _ready(self, step: ImplementationTask) -> bool:
+        handles = dict(self.started)
+        if step.filepath in handles:
+            return False
+        return all(
+            dep == step.filepath
+            or dep not in self._planned
+            or (dep in handles and handles[dep].done())
+            for dep in step.dependencies
+        )
+
+
+def _early_coder_update(task_plan: TaskPlan, early: _EarlyCoder, results: list) -> dict:
+    """Record early-coded files whose task is in the final task plan.
+
+    Matched by file rather than stream position, since the final plan drops
+    invalid items; an early task is always the first valid one for its file.
+    """
+    first_step = {}
+    for idx, step in enumerate(task_plan.implementation_steps):
+        first_step.setdefault(step.filepath, idx)
+    wave, wave_results = [], []
+    for (filepath, _), result in zip(early.started, results):
+        idx = first_step.get(filepath)
+        # Failed early files are left for the coder node to retry.
+        if isinstance(result, BaseException) or idx is None:
+            continue
+        wave.append(idx)
+        wave_results.append(result)
+
+    coder_state = CoderState(task_plan=task_plan, current_step_idx=0)
+    order = sorted(range(len(wave)), key=wave.__getitem__)
+    _record_wave(coder_state, [wave[i] for i in order], [wave_results[i] for i in order])
+    return {"coder_state": coder_state}
+
+
 def architect_agent(state: dict) -> dict:
     plan: Plan = state["plan"]
 
-    response = _require_llm().invoke(architect_prompt(plan))
+    cache_key = stage_key("architect", _project_relative_plan_json(plan))
+    early, executor = None, None
+    with span("architect") as node_span:
+        task_plan = _load_cached_stage("architect", cache_key, TaskPlan, node_span)
+        if task_plan is None and ARCHITECT_PIPELINING and not _single_shot_applies(plan):
+            emit = _locked_stream_writer()
+            executor = ThreadPoolExecutor(max_workers=CODER_MAX_CONCURRENCY)
+            early = _EarlyCoder(plan, lambda step: executor.submit(
+                copy_context().run, _generate_file, plan, step, emit, True
+            ))
+            try:
+                text = ""
+                for chunk in _stream_llm("architect", architect_prompt(plan), complexity=plan_complexity(plan)):
+                    piece = _chunk_text(chunk)
+                    text += piece
+                    early.feed(piece)
+                task_plan = _parse_stage_response("architect", cache_key, text, TaskPlan)
+            except BaseException:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            node_span.attributes["early_files"] = len(early.started)
+        elif task_plan is None:
+            response = _invoke_llm(
+                "architect", architect_prompt(plan),
+                response_format=_response_format("TaskPlan", TASK_PLAN_JSON_SCHEMA),
+                complexity=plan_complexity(plan),
+            )
+            task_plan = _parse_stage_response("architect", cache_key, response.content, TaskPlan)
+
+    update = _task_plan_update(task_plan, plan)
+    if early:
+        executor.shutdown(wait=True)
+        results = [
+            handle.exception() or handle.result() for _, handle in early.started
+        ]
+        update.update(_early_coder_update(update["task_plan"], early, results))
+    return update
+
+
+async def aarchitect_agent(state: dict) -> dict:
+    plan: Plan = state["plan"]
 
-    data = json.loads(_clean_json(response.content))
-    task_plan = TaskPlan(**data)
-    task_plan = _normalize_task_filepaths(task_plan, plan)
+    cache_key = stage_key("architect", _project_relative_plan_json(plan))
+    early = None
+    with span("architect") as node_span:
+        task_plan = _load_cached_stage("architect", cache_key, TaskPlan, node_span)
+        if task_plan is None and ARCHITECT_PIPELINING and not _single_shot_applies(plan):
+            emit = _locked_stream_writer()
+            semaphore = asyncio.Semaphore(CODER_MAX_CONCURRENCY)
+
+            async def generate(step: ImplementationTask) -> str:
+                async with semaphore:
+                    return await _agenerate_file(plan, step, emit, True)
+
+            early = _EarlyCoder(plan, lambda step: asyncio.ensure_future(generate(step)))
+            try:
+                text = ""
+                async for chunk in _astream_llm("architect", architect_prompt(plan), complexity=plan_complexity(plan)):
+                    piece = _chunk_text(chunk)
+                    text += piece
+                    early.feed(piece)
+                task_plan = _parse_stage_response("architect", cache_key, text, TaskPlan)
+            except BaseException:
+                for _, handle in early.started:
+                    handle.cancel()
+                raise
+            node_span.attributes["early_files"] = len(early.started)
+        elif task_plan is None:
+            response = await _ainvoke_llm(
+                "architect", architect_prompt(plan),
+                response_format=_response_format("TaskPlan", TASK_PLAN_JSON_SCHEMA),
+                complexity=plan_complexity(plan),
+            )
+            task_plan = _parse_stage_response("architect", cache_key, response.content, TaskPlan)
+
+    update = _task_plan_update(task_plan, plan)
+    if early:
+        results = await asyncio.gather(
+            *(handle for _, handle in early.started), return_exceptions=True
+        )
+        update.update(_early_coder_update(update["task_plan"], early, results))
+    return update
 
-    task_plan.plan = plan
 
-    return {"task_plan": task_plan}
+# ---------------------------------------------------
+# BLUEPRINT (planner + architect in one call)
+# ---------------------------------------------------
+
+def _pipeline_mode(state: dict) -> str:
+    """Pick "fused" or "staged" for a run.
+
+    An explicit mode on the request wins over PIPELINE_MODE. In auto mode
+    short prompts for self-contained apps take the single round-trip; long
+    prompts or ones mentioning servers, auth, frameworks or several pages
+    keep a separate planner so the architect works from a reviewed plan.
+    """
+    mode = (state.get("pipeline_mode") or PIPELINE_MODE).strip().lower()
+    if mode in {"fused", "staged"}:
+        return mode
+
+    words = _normalize_prompt(state.get("user_prompt", "")).split()
+    if len(words) > FUSED_MAX_PROMPT_WORDS:
+        return "staged"
+    if mentions_complex_features(" ".join(words)):
+        return "staged"
+    return "fused"
+
+
+def _blueprint_update(blueprint: Blueprint, project_id: str) -> dict:
+    update = _plan_update(blueprint.plan, project_id)
+    task_plan = TaskPlan(implementation_steps=blueprint.implementation_steps)
+    update.update(_task_plan_update(task_plan, update["plan"]))
+    return update
+
+
+def blueprint_agent(state: dict) -> dict:
+    user_prompt = state["user_prompt"]
+
+    cache_key = stage_key("blueprint", _normalize_prompt(user_prompt))
+    with span("blueprint") as node_span:
+        blueprint = _load_cached_stage("blueprint", cache_key, Blueprint, node_span)
+        if blueprint is None:
+            response = _invoke_llm(
+                "blueprint", blueprint_prompt(user_prompt),
+                response_format=_response_format("Blueprint", BLUEPRINT_JSON_SCHEMA),
+                complexity=prompt_complexity(user_prompt),
+            )
+            blueprint = _parse_stage_response("blueprint", cache_key, response.content, Blueprint)
+
+    return _blueprint_update(blueprint, state.get("project_id", ""))
+
+
+async def ablueprint_agent(state: dict) -> dict:
+    user_prompt = state["user_prompt"]
+
+    cache_key = stage_key("blueprint", _normalize_prompt(user_prompt))
+    with span("blueprint") as node_span:
+        blueprint = _load_cached_stage("blueprint", cache_key, Blueprint, node_span)
+        if blueprint is None:
+            response = await _ainvoke_llm(
+                "blueprint", blueprint_prompt(user_prompt),
+                response_format=_response_format("Blueprint", BLUEPRINT_JSON_SCHEMA),
+                complexity=prompt_complexity(user_prompt),
+            )
+            blueprint = _parse_stage_response("blueprint", cache_key, response.content, Blueprint)
+
+    return _blueprint_update(blueprint, state.get("project_id", ""))
 
 
 # ---------------------------------------------------
 # CODER
 # ---------------------------------------------------
 
-def coder_agent(state: dict) -> dict:
-    coder_state: CoderState = state.get("coder_state")
-    if coder_state is None:
-        coder_state = CoderState(
-            task_plan=state["task_plan"],
-            current_step_idx=0
+def _ready_wave(steps, completed_steps) -> list[int]:
+    """Return indices of pending steps whose in-plan dependencies are all written."""
+    completed = set(completed_steps)
+    pending = [idx for idx in range(len(steps)) if idx not in completed]
+
+    pending_paths = {steps[idx].filepath for idx in pending}
+    wave = []
+    claimed_paths = set()
+    for idx in pending:
+        step = steps[idx]
+        blocked = any(
+            dep in pending_paths and dep != step.filepath
+            for dep in step.dependencies
         )
+        # Two tasks for the same file must still run one after another.
+        if blocked or step.filepath in claimed_paths:
+            continue
+        wave.append(idx)
+        claimed_paths.add(step.filepath)
 
-    steps = coder_state.task_plan.implementation_steps
+    if pending and not wave:
+        # Dependency cycle: fall back to the architect's ordering.
+        wave = [pending[0]]
 
-    if coder_state.current_step_idx >= len(steps):
-        _validate_index_exists(steps)
-        return {"coder_state": coder_state, "status": "DONE"}
+    return wave
 
-    current_task = steps[coder_state.current_step_idx]
 
-    # Read dependency contents if any
+def _read_dependencies(current_task) -> dict[str, str]:
+    """Contents of the task's dependency files that exist so far."""
     dep_contents = {}
     for dep in current_task.dependencies:
         dep_full_path = safe_path(dep)
         if os.path.exists(dep_full_path):
             with open(dep_full_path, 'r', encoding='utf-8') as f:
                 dep_contents[dep] = f.read()
+    return dep_contents
 
-    system_prompt = coder_system_prompt()
-
-    user_content = f"""
-Project Plan: {coder_state.task_plan.plan.model_dump_json()}
-
-Task: {current_task.task_description}
-"""
 
-    if dep_contents:
-        user_content += "\nDependency files:\n"
-        for path, cont in dep_contents.items():
-            user_content += f"\n--- {path} ---\n{cont}\n"
+def _coder_messages(plan: Plan, current_task, dep_contents: dict[str, str]) -> list[dict]:
+    user_content, token_counts = build_coder_context(plan, current_task, dep_contents)
+    annotate(**token_counts)
+    METRICS.inc("buildflow_coder_prompt_tokens_total", token_counts["prompt_tokens_full"], kind="full")
+    METRICS.inc("buildflow_coder_prompt_tokens_total", token_counts["prompt_tokens_sent"], kind="sent")
 
-    user_content += f"\nReturn ONLY the full file content for {current_task.filepath}. No markdown. No explanation."
-
-    response = _require_llm().invoke([
-        {"role": "system", "content": system_prompt},
+    return [
+        {"role": "system", "content": coder_system_prompt()},
         {"role": "user", "content": user_content}
-    ])
+    ]
+
 
-    content = response.content.strip()
+def _write_content(filepath: str, content: str) -> str:
+    content = content.strip()
 
-    print("Writing:", current_task.filepath)
+    print("Writing:", filepath)
 
-    write_result = write_file.invoke({
-        "path": current_task.filepath,
+    result = write_file.invoke({
+        "path": filepath,
         "content": content
     })
-    if isinstance(write_result, str) and write_result.startswith("Error writing file:"):
-        coder_state.failed_files.append(current_task.filepath)
-    else:
-        coder_state.created_files.append(current_task.filepath)
+    if not result.startswith("Error writing file:"):
+        record_bytes_written(len(content.encode("utf-8")), stage="coder")
+    return result
+
+
+class _TrimmedStream:
+    """Drop leading and trailing whitespace from streamed text as it arrives,
+    so a streamed file matches what the non-streaming path writes."""
+
+    def __init__(self):
+        self.started = False
+        self.pending_space = ""
+
+    def feed(self, text: str) -> str:
+        if not self.started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self.started = True
+
+        body = text.rstrip()
+        if not body:
+            self.pending_space += text
+            return ""
+
+        piece = self.pending_space + body
+        self.pending_space = text[len(body):]
+        return piece
+
+
+def _chunk_text(chunk) -> str:
+    return chunk.content if isinstance(chunk.content, str) else ""
+
+
+def _generate_file(plan: Plan, current_task, emit, early: bool = False) -> str:
+    # Files started by the architect are their own root span, so their LLM
+    # time is not counted as architect time.
+    with span("coder_file", emit=emit, detached=early, file=current_task.filepath, early=early):
+        messages = _coder_messages(plan, current_task, _read_dependencies(current_task))
+        complexity = plan_complexity(plan)
+        if CODER_STREAMING:
+            return _stream_file(messages, current_task.filepath, emit, complexity)
+
+        response = _invoke_llm("coder", messages, filepath=current_task.filepath, complexity=complexity)
+        return _write_content(current_task.filepath, response.content)
+
+
+async def _agenerate_file(plan: Plan, current_task, emit, early: bool = False) -> str:
+    with span("coder_file", emit=emit, detached=early, file=current_task.filepath, early=early):
+        dep_contents = await asyncio.to_thread(_read_dependencies, current_task)
+        messages = _coder_messages(plan, current_task, dep_contents)
+        complexity = plan_complexity(plan)
+        if CODER_STREAMING:
+            return await _astream_file(messages, current_task.filepath, emit, complexity)
+
+        response = await _ainvoke_llm("coder", messages, filepath=current_task.filepath, complexity=complexity)
+        return await asyncio.to_thread(_write_content, current_task.filepath, response.content)
+
+
+def _stream_file(messages, filepath: str, emit, complexity: str = "simple") -> str:
+    """Stream a file from the LLM into a temp file, forwarding chunks to `emit`."""
+    print("Writing:", filepath)
+    written = 0
+    trimmed = _TrimmedStream()
+    try:
+        with atomic_writer(filepath) as out:
+            for chunk in _stream_llm("coder", messages, filepath=filepath, complexity=complexity):
+                piece = trimmed.feed(_chunk_text(chunk))
+                if not piece:
+                    continue
+                out.write(piece)
+                out.flush()
+                written += len(piece.encode("utf-8"))
+                emit({"type": "file_chunk", "file": filepath, "text": piece})
+    except (OSError, ValueError) as e:
+        return f"Error writing file: {e}"
+
+    record_bytes_written(written, stage="coder")
+    emit({"type": "file_done", "file": filepath})
+    return f"Successfully wrote to {safe_path(filepath)}"
+
+
+async def _astream_file(messages, filepath: str, emit, complexity: str = "simple") -> str:
+    """Async counterpart of `_stream_file`."""
+    print("Writing:", filepath)
+    written = 0
+    trimmed = _TrimmedStream()
+    try:
+        async with async_atomic_writer(filepath) as out:
+            async for chunk in _astream_llm("coder", messages, filepath=filepath, complexity=complexity):
+                piece = trimmed.feed(_chunk_text(chunk))
+                if not piece:
+                    continue
+                out.write(piece)
+                out.flush()
+                written += len(piece.encode("utf-8"))
+                emit({"type": "file_chunk", "file": filepath, "text": piece})
+    except (OSError, ValueError) as e:
+        return f"Error writing file: {e}"
+
+    record_bytes_written(written, stage="coder")
+    emit({"type": "file_done", "file": filepath})
+    return f"Successfully wrote to {safe_path(filepath)}"
+
+
+# ---------------------------------------------------
+# Single-shot (all files in one call)
+# ---------------------------------------------------
+
+def _single_shot_applies(plan: Plan) -> bool:
+    return CODER_SINGLE_SHOT and 2 <= len(plan.files) <= SINGLE_SHOT_MAX_FILES
+
 
-    coder_state.current_step_idx += 1
+def _single_shot_steps(coder_state: CoderState) -> list[int]:
+    """Pending steps to request in one multi-file call, or [] to code file by file."""
+    if not CODER_SINGLE_SHOT or coder_state.single_shot_attempted:
+        return []
+
+    steps = coder_state.task_plan.implementation_steps
+    completed = set(coder_state.completed_steps)
+    pending = [idx for idx in range(len(steps)) if idx not in completed]
+    paths = {os.path.normpath(steps[idx].filepath) for idx in pending}
+    # Several tasks for one file need to see each other's output.
+    if not 2 <= len(pending) <= SINGLE_SHOT_MAX_FILES or len(paths) != len(pending):
+        return []
+    return pending
+
+
+def _section_key(path: str) -> str:
+    return os.path.normpath(path.strip()).replace("\\", "/")
+
+
+class _BundleWriter:
+    """Write each file of a multi-file reply as soon as its section is complete.
+
+    Sections that fail validation are not written; their steps stay pending
+    and the regular per-file coder picks them up on its next pass.
+    """
+
+    def __init__(self, plan: Plan, steps, pending: list[int], emit):
+        self.steps = steps
+        self.emit = emit
+        self.splitter = SectionSplitter()
+        self.results: dict[int, str] = {}
+        self.targets = {}
+        for idx in pending:
+            self.targets[_section_key(project_relative_path(plan, steps[idx].filepath))] = idx
+            self.targets[_section_key(steps[idx].filepath)] = idx
+
+    def feed(self, text: str):
+        for idx, filepath, content in self._sections(self.splitter.feed(text)):
+            self._written(idx, filepath, _write_content(filepath, content))
+
+    def close(self) -> dict[int, str]:
+        for idx, filepath, content in self._sections(self.splitter.close()):
+            self._written(idx, filepath, _write_content(filepath, content))
+        return self.results
+
+    async def afeed(self, text: str):
+        for idx, filepath, content in self._sections(self.splitter.feed(text)):
+            self._written(idx, filepath, await asyncio.to_thread(_write_content, filepath, content))
+
+    async def aclose(self) -> dict[int, str]:
+        for idx, filepath, content in self._sections(self.splitter.close()):
+            self._written(idx, filepath, await asyncio.to_thread(_write_content, filepath, content))
+        return self.results
+
+    def _sections(self, events):
+        """Yield (step index, filepath, content) for each complete, valid section."""
+        for kind, name, text in events:
+            idx = self.targets.get(_section_key(name))
+            if idx is None or idx in self.results:
+                continue
+
+            filepath = self.steps[idx].filepath
+            if kind == "chunk":
+                self.emit({"type": "file_chunk", "file": filepath, "text": text})
+                continue
+
+            problem = "section cut off" if kind == "partial" else validate_section(filepath, text)
+            if problem:
+                self.emit({"type": "file_retry", "file": filepath, "reason": problem})
+                continue
+
+            yield idx, filepath, text
+
+    def _written(self, idx: int, filepath: str, write_result: str):
+        if not write_result.startswith("Error writing file:"):
+            self.results[idx] = write_result
+            self.emit({"type": "file_done", "file": filepath})
+
+
+def _bundle_messages(plan: Plan, tasks: list[ImplementationTask]) -> list[dict]:
+    return [
+        {"role": "system", "content": bundle_system_prompt()},
+        {"role": "user", "content": build_bundle_context(plan, tasks)},
+    ]
+
+
+def _generate_bundle(plan: Plan, steps, pending: list[int], emit) -> dict[int, str]:
+    """Request the pending files in one call; returns write results by step index."""
+    writer = _BundleWriter(plan, steps, pending, emit)
+    messages = _bundle_messages(plan, [steps[idx] for idx in pending])
+    files = [steps[idx].filepath for idx in pending]
+    complexity = plan_complexity(plan)
+    try:
+        if CODER_STREAMING:
+            for chunk in _stream_llm("coder_bundle", messages, files=files, complexity=complexity):
+                writer.feed(_chunk_text(chunk))
+        else:
+            writer.feed(_invoke_llm("coder_bundle", messages, files=files, complexity=complexity).content)
+    except Exception as e:
+        if not is_llm_error(e):
+            raise
+        # Whatever was not written yet falls back to per-file generation.
+        print("Single-shot generation failed:", e)
+        emit({"type": "bundle_failed", "files": files, "reason": str(e)})
+    return writer.close()
+
+
+async def _agenerate_bundle(plan: Plan, steps, pending: list[int], emit) -> dict[int, str]:
+    writer = _BundleWriter(plan, steps, pending, emit)
+    messages = _bundle_messages(plan, [steps[idx] for idx in pending])
+    files = [steps[idx].filepath for idx in pending]
+    complexity = plan_complexity(plan)
+    try:
+        if CODER_STREAMING:
+            async for chunk in _astream_llm("coder_bundle", messages, files=files, complexity=complexity):
+                await writer.afeed(_chunk_text(chunk))
+        else:
+            await writer.afeed((await _ainvoke_llm("coder_bundle", messages, files=files, complexity=complexity)).content)
+    except Exception as e:
+        if not is_llm_error(e):
+            raise
+        print("Single-shot generation failed:", e)
+        emit({"type": "bundle_failed", "files": files, "reason": str(e)})
+    return await writer.aclose()
+
+
+def _record_single_shot(coder_state: CoderState, results: dict[int, str]) -> dict:
+    coder_state.single_shot_attempted = True
+    written = sorted(results)
+    return _record_wave(coder_state, written, [results[idx] for idx in written])
+
+
+def _next_coder_wave(state: dict) -> tuple[CoderState, list[int], dict | None]:
+    """Return the coder state, the next wave of step indices, and a final
+    update when there is nothing left to generate."""
+    coder_state: CoderState = state.get("coder_state")
+    if coder_state is None:
+        coder_state = CoderState(
+            task_plan=state["task_plan"],
+            current_step_idx=0
+        )
+
+    steps = coder_state.task_plan.implementation_steps
+
+    if coder_state.current_step_idx >= len(steps):
+        _validate_index_exists(steps)
+        return coder_state, [], {"coder_state": coder_state, "status": "DONE"}
+
+    return coder_state, _ready_wave(steps, coder_state.completed_steps), None
+
+
+def _locked_stream_writer():
+    writer = get_stream_writer()
+    writer_lock = Lock()
+
+    def emit(payload: dict):
+        with writer_lock:
+            writer(payload)
+
+    return emit
+
+
+def _record_wave(coder_state: CoderState, wave: list[int], results: list) -> dict:
+    steps = coder_state.task_plan.implementation_steps
+
+    # Record results in step order so created/failed lists stay deterministic.
+    for idx, write_result in zip(wave, results):
+        filepath = steps[idx].filepath
+        if isinstance(write_result, str) and write_result.startswith("Error writing file:"):
+            coder_state.failed_files.append(filepath)
+        else:
+            coder_state.created_files.append(filepath)
+        coder_state.completed_steps.append(idx)
+
+    coder_state.current_step_idx = len(coder_state.completed_steps)
 
     status = "DONE" if coder_state.current_step_idx >= len(steps) else "RUNNING"
 
@@ -223,26 +1001,136 @@ Task: {current_task.task_description}
     return {"coder_state": coder_state, "status": status}
 
 
+def coder_agent(state: dict) -> dict:
+    """Generate the next wave of independent files concurrently."""
+    coder_state, wave, final_update = _next_coder_wave(state)
+    if final_update:
+        return final_update
+
+    steps = coder_state.task_plan.implementation_steps
+    emit = _locked_stream_writer()
+
+    pending = _single_shot_steps(coder_state)
+    if pending:
+        with span("coder", emit=emit, files=len(pending), single_shot=True):
+            results = _generate_bundle(coder_state.task_plan.plan, steps, pending, emit)
+        return _record_single_shot(coder_state, results)
+
+    # Worker threads do not inherit the node's runnable context, which the
+    # stream writer needs; run each task in its own copy of it.
+    with span("coder", emit=emit, files=len(wave)):
+        with ThreadPoolExecutor(max_workers=min(CODER_MAX_CONCURRENCY, len(wave))) as executor:
+            futures = [
+                executor.submit(
+                    copy_context().run, _generate_file, coder_state.task_plan.plan, steps[idx], emit
+                )
+                for idx in wave
+            ]
+        results = [future.result() for future in futures]
+
+    return _record_wave(coder_state, wave, results)
+
+
+async def acoder_agent(state: dict) -> dict:
+    """Async `coder_agent`: the wave runs as tasks on the event loop."""
+    coder_state, wave, final_update = _next_coder_wave(state)
+    if final_update:
+        return final_update
+
+    steps = coder_state.task_plan.implementation_steps
+    emit = _locked_stream_writer()
+
+    pending = _single_shot_steps(coder_state)
+    if pending:
+        with span("coder", emit=emit, files=len(pending), single_shot=True):
+            results = await _agenerate_bundle(coder_state.task_plan.plan, steps, pending, emit)
+        return _record_single_shot(coder_state, results)
+
+    semaphore = asyncio.Semaphore(CODER_MAX_CONCURRENCY)
+
+    async def generate(idx: int) -> str:
+        async with semaphore:
+            return await _agenerate_file(coder_state.task_plan.plan, steps[idx], emit)
+
+    with span("coder", emit=emit, files=len(wave)):
+        results = await asyncio.gather(*(generate(idx) for idx in wave))
+
+    return _record_wave(coder_state, wave, results)
+
+
 # ---------------------------------------------------
 # GRAPH
 # ---------------------------------------------------
 
 graph = StateGraph(dict)
 
-graph.add_node("planner", planner_agent)
-graph.add_node("architect", architect_agent)
-graph.add_node("coder", coder_agent)
+# Each node has a sync and an async implementation: `invoke`/`stream` run
+# the former on the calling thread, `ainvoke`/`astream` the latter on the
+# event loop.
+graph.add_node("planner", RunnableLambda(planner_agent, afunc=aplanner_agent, name="planner"))
+graph.add_node("architect", RunnableLambda(architect_agent, afunc=aarchitect_agent, name="architect"))
+graph.add_node("blueprint", RunnableLambda(blueprint_agent, afunc=ablueprint_agent, name="blueprint"))
+graph.add_node("coder", RunnableLambda(coder_agent, afunc=acoder_agent, name="coder"))
 
 graph.add_edge("planner", "architect")
 graph.add_edge("architect", "coder")
+graph.add_edge("blueprint", "coder")
 graph.add_conditional_edges(
     "coder",
     lambda s: "END" if s.get("status") == "DONE" else "coder",
     {"END": END, "coder": "coder"},
 )
 
-graph.set_entry_point("planner")
-agent = graph.compile()
+graph.set_conditional_entry_point(_pipeline_mode, {"staged": "planner", "fused": "blueprint"})
+
+
+def _create_checkpointer():
+    """Persist graph progress per thread_id so interrupted runs can resume."""
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError:
+        from langgraph.checkpoint.memory import InMemorySaver
+        return InMemorySaver()
+
+    class _SqliteSaver(SqliteSaver):
+        """SqliteSaver usable from `ainvoke`/`astream` as well.
+
+        Checkpoint writes are small local transactions, so the async methods
+        run the sync ones in a worker thread rather than needing a second,
+        loop-bound connection.
+        """
+
+        async def aget_tuple(self, config):
+            return await asyncio.to_thread(self.get_tuple, config)
+
+        async def alist(self, config, *, filter=None, before=None, limit=None):
+            items = await asyncio.to_thread(
+                lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+            )
+            for item in items:
+                yield item
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+        async def adelete_thread(self, thread_id):
+            await asyncio.to_thread(self.delete_thread, thread_id)
+
+    os.makedirs(os.path.dirname(CHECKPOINT_PATH), exist_ok=True)
+    conn = sqlite3.connect(CHECKPOINT_PATH, check_same_thread=False)
+    serde = JsonPlusSerializer(
+        allowed_msgpack_modules=[
+            (model.__module__, model.__name__)
+            for model in (CoderState, File, ImplementationTask, Plan, TaskPlan)
+        ]
+    )
+    return _SqliteSaver(conn, serde=serde)
+
+
+agent = graph.compile(checkpointer=_create_checkpointer())
 
 
 # ---------------------------------------------------
@@ -254,6 +1142,6 @@ if __name__ == "__main__":
     test_project_id = "test_" + uuid.uuid4().hex[:8]
     result = agent.invoke(
         {"user_prompt": "Build a colourful modern todo app in html css and js", "project_id": test_project_id},
-        {"recursion_limit": 15},
+        {"recursion_limit": 15, "configurable": {"thread_id": test_project_id}},
     )
     print("Final State:", result)
\ No newline at end of file
@@ -0,0 +1,198 @@
+import json
+import re
+
+_PARTIAL_UNICODE_ESCAPE = re.compile(r"(?<!\\)\\u[0-9a-fA-F]{0,3}$")
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _strip_wrapping(text: str) -> str:
+    """Drop code fences and any prose before the first JSON object."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.replace("```json", "").replace("```", "").strip()
+    start = text.find("{")
+    return text[start:] if start > 0 else text
+
+
+def repair_json(text: str) -> str:
+    """Close whatever a truncated JSON object left open.
+
+    An unterminated string is closed, a dangling key, colon or comma is
+    dropped, and open arrays/objects are closed innermost first. Text that
+    is already valid JSON comes back unchanged apart from surrounding prose
+    and code fences.
+    """
+    text = _strip_wrapping(text)
+    stack: list[str] = []
+    in_string = escape = False
+    # End of the last position where the document could be cut cleanly.
+    last_clean = 0
+    last_clean_stack: list[str] = []
+
+    for idx, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+                last_clean, last_clean_stack = idx + 1, list(stack)
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(char)
+            last_clean, last_clean_stack = idx + 1, list(stack)
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            last_clean, last_clean_stack = idx + 1, list(stack)
+            if not stack:
+                # Ignore anything after the top-level value.
+                return text[:idx + 1]
+        elif not char.isspace() and char not in ",:":
+            last_clean, last_clean_stack = idx + 1, list(stack)
+
+    if in_string:
+        # Cut inside an escape sequence: drop the partial escape.
+        if escape:
+            text = text[:-1]
+        else:
+            text = _PARTIAL_UNICODE_ESCAPE.sub("", text)
+        text += '"'
+        last_clean, last_clean_stack = len(text), list(stack)
+
+    body = text[:last_clean].rstrip()
+    stack = last_clean_stack
+    # Drop anything that cannot be kept as is: a cut-off literal or number,
+    # a key with no value, or a trailing comma.
+    while True:
+        stripped = body.rstrip()
+        token_start = len(stripped)
+        while token_start and stripped[token_start - 1] not in '{}[]",: \t\r\n':
+            token_start -= 1
+        token = stripped[token_start:]
+        if token and not _is_scalar(token):
+            body = stripped[:token_start]
+            continue
+        if stripped.endswith((",", ":")):
+            body = stripped[:-1]
+            continue
+        if stack and stack[-1] == "{" and stripped.endswith('"'):
+            key_start = _string_start(stripped)
+            before = stripped[:key_start].rstrip()
+            if before.endswith(("{", ",")):
+                body = before
+                continue
+        break
+
+    return body + "".join(_CLOSERS[opener] for opener in reversed(stack))
+
+
+def _is_scalar(token: str) -> bool:
+    try:
+        json.loads(token)
+    except ValueError:
+        return False
+    return True
+
+
+def _string_start(text: str) -> int:
+    """Index of the opening quote of the string that ends `text`."""
+    idx = len(text) - 2
+    while idx >= 0:
+        if text[idx] == '"':
+            backslashes = 0
+            probe = idx - 1
+            while probe >= 0 and text[probe] == "\\":
+                backslashes += 1
+                probe -= 1
+            if backslashes % 2 == 0:
+                return idx
+        idx -= 1
+    return 0
+
+
+def parse_json(text: str) -> tuple[object, bool]:
+    """`json.loads` that tolerates code fences, leading prose and truncation.
+
+    Returns the decoded value and whether it had to be repaired.
+    """
+    try:
+        return json.loads(_strip_wrapping(text)), False
+    except ValueError:
+        return json.loads(repair_json(text)), True
+
+
+class ArrayItemStream:
+    """Yield the elements of one top-level array as a JSON document streams in.
+
+    `feed` takes the next chunk of text and returns the elements of the
+    array under `key` that have been completed by it, already decoded.
+    Elements that fail to decode are skipped; the caller still parses the
+    whole document at the end.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.text = ""
+        self._pos = 0
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string = ""
+        self._array_depth = 0
+        self._item_start: int | None = None
+
+    def feed(self, chunk: str) -> list:
+        self.text += chunk
+        items = []
+        text = self.text
+        while self._pos < len(text):
+            char = text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = text[self._string_start + 1:self._pos]
+                self._pos += 1
+                continue
+
+            in_array = self._array_depth and len(self._stack) == self._array_depth
+            if in_array and char in ",]":
+                if self._item_start is not None:
+                    item = self._decode(text[self._item_start:self._pos])
+                    if item is not None:
+                        items.append(item)
+                    self._item_start = None
+                if char == "]":
+                    self._array_depth = 0
+            elif in_array and self._item_start is None and not char.isspace():
+                self._item_start = self._pos
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif char in _CLOSERS:
+                self._stack.append(char)
+                if char == "[" and len(self._stack) == 2 and self._last_string == self.key:
+                    self._array_depth = 2
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+            self._pos += 1
+        return items
+
+    @staticmethod
+    def _decode(fragment: str):
+        try:
+            return json.loads(fragment)
+        except ValueError:
+            return None
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import os
+import random
+import time
+from threading import Lock
+
+import httpx
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+try:
+    from backend.Agent.multifile import format_sections
+except ModuleNotFoundError:
+    from Agent.multifile import format_sections
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "fake_llm.json")
+
+LLM_MAX_CONNECTIONS = max(1, int(os.getenv("LLM_MAX_CONNECTIONS", "100")))
+LLM_MAX_KEEPALIVE_CONNECTIONS = max(0, int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20")))
+LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "30"))
+LLM_HTTP_TIMEOUT_SECONDS = float(os.getenv("LLM_HTTP_TIMEOUT_SECONDS", "120"))
+
+
+def _prompt_text(messages) -> str:
+    if isinstance(messages, str):
+        return messages
+    parts = []
+    for message in messages:
+        if isinstance(message, dict):
+            parts.append(str(message.get("content", "")))
+        else:
+            parts.append(str(getattr(message, "content", message)))
+    return "\n".join(parts)
+
+
+class FakeChatModel:
+    """Offline replay model with the subset of the chat model API the graph uses.
+
+    Responses come from a fixtures file keyed by graph stage (taken from the
+    `stage` metadata the nodes attach to each call); coder responses are
+    picked by the target file's extension, and multi-file coder replies are
+    assembled from them. Latency per stage is scaled by
+    `latency_scale` and spread by `jitter` (a fraction of the base latency),
+    both seeded so benchmark runs are repeatable. `error_rate` fails that
+    share of calls with a connection error and `stall_rate` makes calls
+    `stall_factor` times slower, to exercise retries and hedging; a
+    `timeout` passed to a call is honoured like a provider would.
+    """
+
+    def __init__(self, fixtures_path: str = DEFAULT_FIXTURES, model_name: str = "fake",
+                 latency_scale: float = 1.0, jitter: float = 0.0, chunk_size: int = 64, seed: int = 0,
+                 error_rate: float = 0.0, stall_rate: float = 0.0, stall_factor: float = 10.0):
+        with open(fixtures_path, "r", encoding="utf-8") as f:
+            self.fixtures = json.load(f)
+        self.model_name = model_name
+        # Optional per-model speed factors, so routing to a smaller model
+        # shows up in offline timings.
+        self.speed = self.fixtures.get("model_speed", {}).get(model_name, 1.0)
+        self.latency_scale = latency_scale
+        self.jitter = jitter
+        self.chunk_size = max(1, chunk_size)
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_factor = stall_factor
+        self._random = random.Random(seed)
+        self._random_lock = Lock()
+
+    def bind(self, **kwargs) -> "FakeChatModel":
+        # Fixtures are already valid JSON; response_format needs no emulation.
+        return self
+
+    def _stage(self, config: dict | None) -> tuple[str, dict]:
+        metadata = (config or {}).get("metadata", {})
+        return metadata.get("stage", "coder"), metadata
+
+    def _coder_text(self, filepath: str) -> str:
+        # Coder fixtures map file extension -> content.
+        response = self.fixtures["responses"]["coder"]
+        ext = os.path.splitext(filepath)[1].lstrip(".")
+        return response.get(ext, response.get("default", ""))
+
+    def _response_text(self, stage: str, metadata: dict) -> str:
+        if stage == "coder":
+            return self._coder_text(metadata.get("filepath", ""))
+        if stage == "coder_bundle":
+            files = metadata.get("files", [])
+            folder = os.path.commonpath([os.path.dirname(path) for path in files]) if files else ""
+            return format_sections({
+                os.path.relpath(path, folder or ".").replace("\\", "/"): self._coder_text(path)
+                for path in files
+            })
+        response = self.fixtures["responses"][stage]
+        if isinstance(response, str):
+            return response
+        return json.dumps(response)
+
+    def _latency(self, stage: str) -> tuple[float, float]:
+        """(response time, extra stall) of the next call; raises ConnectionError
+        for an injected failure."""
+        base = self.fixtures.get("latency_ms", {}).get(stage, 0) / 1000 * self.latency_scale * self.speed
+        with self._random_lock:
+            spread = self._random.uniform(-self.jitter, self.jitter) * base
+            failed = self._random.random() < self.error_rate
+            stalled = self._random.random() < self.stall_rate
+        if failed:
+            raise ConnectionError("Fake LLM connection error")
+        delay = max(0.0, base + spread)
+        return delay, delay * (self.stall_factor - 1) if stalled else 0.0
+
+    @staticmethod
+    def _wait(seconds: float, timeout: float | None) -> float:
+        """Seconds to sleep before answering or, past `timeout`, failing."""
+        return seconds if timeout is None else min(seconds, timeout)
+
+    @staticmethod
+    def _check_timeout(seconds: float, timeout: float | None):
+        if timeout is not None and seconds > timeout:
+            raise TimeoutError(f"Fake LLM call timed out after {timeout:.2f}s")
+
+    def _usage(self, messages, text: str) -> dict:
+        # Roughly four characters per token, like most BPE vocabularies.
+        input_tokens = max(1, len(_prompt_text(messages)) // 4)
+        output_tokens = max(1, len(text) // 4)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+
+    def invoke(self, messages, config: dict | None = None, timeout: float | None = None,
+               **kwargs) -> AIMessage:
+        stage, metadata = self._stage(config)
+        text = self._response_text(stage, metadata)
+        delay = sum(self._latency(stage))
+        time.sleep(self._wait(delay, timeout))
+        self._check_timeout(delay, timeout)
+        return AIMessage(content=text, usage_metadata=self._usage(messages, text))
+
+    async def ainvoke(self, messages, config: dict | None = None, timeout: float | None = None,
+                      **kwargs) -> AIMessage:
+        stage, metadata = self._stage(config)
+        text = self._response_text(stage, metadata)
+        delay = sum(self._latency(stage))
+        await asyncio.sleep(self._wait(delay, timeout))
+        self._check_timeout(delay, timeout)
+        return AIMessage(content=text, usage_metadata=self._usage(messages, text))
+
+    def _chunks(self, stage: str, text: str) -> tuple[list[str], float, float]:
+        """Split `text` into chunks; returns them, the delay per chunk and the
+        stall before the first one."""
+        chunks = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)] or [""]
+        delay, stall = self._latency(stage)
+        return chunks, delay / len(chunks), stall
+
+    def stream(self, messages, config: dict | None = None, timeout: float | None = None, **kwargs):
+        stage, metadata = self._stage(config)
+        text = self._response_text(stage, metadata)
+        chunks, per_chunk, stall = self._chunks(stage, text)
+        time.sleep(self._wait(stall, timeout))
+        self._check_timeout(stall, timeout)
+        for piece in chunks:
+            time.sleep(per_chunk)
+            yield AIMessageChunk(content=piece)
+        yield AIMessageChunk(content="", usage_metadata=self._usage(messages, text))
+
+    async def astream(self, messages, config: dict | None = None, timeout: float | None = None, **kwargs):
+        stage, metadata = self._stage(config)
+        text = self._response_text(stage, metadata)
+        chunks, per_chunk, stall = self._chunks(stage, text)
+        await asyncio.sleep(self._wait(stall, timeout))
+        self._check_timeout(stall, timeout)
+        for piece in chunks:
+            await asyncio.sleep(per_chunk)
+            yield AIMessageChunk(content=piece)
+        yield AIMessageChunk(content="", usage_metadata=self._usage(messages, text))
+
+
+_HTTP_CLIENTS: tuple[httpx.Client, httpx.AsyncClient] | None = None
+_HTTP_CLIENTS_LOCK = Lock()
+
+
+def shared_http_clients() -> tuple[httpx.Client, httpx.AsyncClient]:
+    """Process-wide sync and async HTTP clients with a bounded keep-alive pool.
+
+    Reusing one pool keeps TLS connections to the provider warm instead of
+    opening a new one per request.
+    """
+    global _HTTP_CLIENTS
+    with _HTTP_CLIENTS_LOCK:
+        if _HTTP_CLIENTS is None:
+            limits = httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS,
+            )
+            timeout = httpx.Timeout(LLM_HTTP_TIMEOUT_SECONDS, connect=10.0)
+            _HTTP_CLIENTS = (
+                httpx.Client(limits=limits, timeout=timeout),
+                httpx.AsyncClient(limits=limits, timeout=timeout),
+            )
+        return _HTTP_CLIENTS
+
+
+def create_llm(model_name: str):
+    """Build the chat model selected by LLM_PROVIDER; returns (llm, init_error)."""
+    provider = os.getenv("LLM_PROVIDER", "groq").strip().lower()
+    if provider == "fake":
+        try:
+            return FakeChatModel(
+                fixtures_path=os.getenv("FAKE_LLM_FIXTURES", DEFAULT_FIXTURES),
+                model_name=model_name,
+                latency_scale=float(os.getenv("FAKE_LLM_LATENCY_SCALE", "1.0")),
+                jitter=float(os.getenv("FAKE_LLM_JITTER", "0.2")),
+                chunk_size=int(os.getenv("FAKE_LLM_CHUNK_SIZE", "64")),
+                seed=int(os.getenv("FAKE_LLM_SEED", "0")),
+                error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+                stall_rate=float(os.getenv("FAKE_LLM_STALL_RATE", "0")),
+                stall_factor=float(os.getenv("FAKE_LLM_STALL_FACTOR", "10")),
+            ), ""
+        except (OSError, ValueError) as exc:
+            return None, f"Fake LLM fixtures could not be loaded: {exc}"
+
+    if provider != "groq":
+        return None, f"Unknown LLM_PROVIDER '{provider}' (expected 'groq' or 'fake')."
+
+    api_key = os.getenv("GROQ_API_KEY", "").strip()
+    if not api_key:
+        return None, "GROQ_API_KEY is not set."
+
+    try:
+        from langchain_groq.chat_models import ChatGroq
+        http_client, http_async_client = shared_http_clients()
+        return ChatGroq(
+            model=model_name,
+            api_key=api_key,
+            # Retries, timeouts and fallbacks are handled per call by the graph.
+            max_retries=0,
+            http_client=http_client,
+            http_async_client=http_async_client,
+        ), ""
+    except Exception as exc:
+        return None, str(exc)
@@ -0,0 +1,318 @@
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock, local
+
+# Every workspace written under BUILDFLOW_WORKSPACES_DIR is indexed here:
+# project id -> owning job, creation time, status and, per relative path,
+# the file's size and blob digest. Blob refcounts live alongside.
+# Lookups hit an in-process LRU first and fall back to a SQLite file shared
+# by every worker, so nothing needs to list or stat the workspaces directory.
+MANIFEST_PATH = os.path.abspath(
+    os.getenv(
+        "WORKSPACE_MANIFEST_PATH",
+        os.path.join(
+            os.getenv("BUILDFLOW_STATE_DIR", os.path.join(os.path.dirname(__file__), "..", ".state")),
+            "workspaces.sqlite3",
+        ),
+    )
+)
+MANIFEST_MEMORY_MAX = max(100, int(os.getenv("WORKSPACE_MANIFEST_MEMORY_MAX", "10000")))
+# Reads only bump a workspace's last access this often, so serving its
+# files does not turn into a SQLite write per request.
+_TOUCH_INTERVAL_SECONDS = 60.0
+# Only workspaces nothing writes to any more are kept in the LRU; any other
+# may be changing in another worker, so it is always read from SQLite. A
+# succeeded run has no graph steps left to resume and adopted folders are
+# never generated into.
+_SETTLED_STATUSES = frozenset({"succeeded", "adopted"})
+
+
+class WorkspaceManifest:
+    """Project id -> owner job, created time, status and per-file sizes and
+    digests, plus how many workspace files reference each blob."""
+
+    _SCHEMA = """
+CREATE TABLE IF NOT EXISTS workspaces (
+    project_id TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT 'created',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    last_access REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS workspace_files (
+    project_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    digest TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (project_id, path)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    refcount INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS workspaces_job_id ON workspaces (job_id);
+CREATE INDEX IF NOT EXISTS workspaces_last_access ON workspaces (last_access);
+CREATE INDEX IF NOT EXISTS blobs_refcount ON blobs (refcount, updated_at);
+"""
+
+    def __init__(self, path: str, memory_max: int = MANIFEST_MEMORY_MAX):
+        self.path = path
+        self.memory_max = memory_max
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = Lock()
+        self._local = local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            # Manifests written by earlier versions lack the newer columns.
+            for table, column, definition in (
+                ("workspace_files", "digest", "TEXT NOT NULL DEFAULT ''"),
+                ("workspaces", "last_access", "REAL NOT NULL DEFAULT 0"),
+            ):
+                columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if columns and column not in columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            conn.executescript(self._SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections must not cross threads; keep one per thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, entry: dict):
+        with self._lock:
+            self._entries[entry["project_id"]] = entry
+            self._entries.move_to_end(entry["project_id"])
+            while len(self._entries) > self.memory_max:
+                self._entries.popitem(last=False)
+
+    def _load(self, project_id: str) -> dict | None:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT job_id, status, created_at, updated_at, last_access FROM workspaces WHERE project_id = ?",
+            (project_id,),
+        ).fetchone()
+        if not row:
+            return None
+        rows = conn.execute(
+            "SELECT path, size_bytes, digest FROM workspace_files WHERE project_id = ?",
+            (project_id,),
+        ).fetchall()
+        entry = {
+            "project_id": project_id,
+            "job_id": row[0],
+            "status": row[1],
+            "created_at": row[2],
+            "updated_at": row[3],
+            "last_access": row[4],
+            "files": {path: size for path, size, _ in rows},
+            "digests": {path: digest for path, _, digest in rows if digest},
+        }
+        if entry["status"] in _SETTLED_STATUSES:
+            self._remember(entry)
+        return entry
+
+    def _invalidate(self, project_id: str):
+        with self._lock:
+            self._entries.pop(project_id, None)
+
+    def _cached(self, project_id: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry is not None:
+                self._entries.move_to_end(project_id)
+            return entry
+
+    def register(self, project_id: str, job_id: str = "", status: str = "created"):
+        """Record (or re-own) a workspace before anything is written to it."""
+        now = time.time()
+        self._connect().execute(
+            """
+INSERT INTO workspaces (project_id, job_id, status, created_at, updated_at, last_access)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(project_id) DO UPDATE SET
+    job_id = excluded.job_id,
+    status = excluded.status,
+    updated_at = excluded.updated_at,
+    last_access = excluded.last_access
+""",
+            (project_id, job_id, status, now, now, now),
+        )
+        self._invalidate(project_id)
+
+    def adopt(self, project_id: str, files: dict[str, int], last_access: float):
+        """Index a workspace written before the manifest existed; its files
+        stay plain files rather than blobs."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR IGNORE INTO workspaces "
+                "(project_id, status, created_at, updated_at, last_access) VALUES (?, 'adopted', ?, ?, ?)",
+                (project_id, last_access, last_access, last_access),
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO workspace_files (project_id, path, size_bytes) VALUES (?, ?, ?)",
+                [(project_id, path, size) for path, size in files.items()],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def touch(self, project_id: str):
+        """Mark a workspace as just used, for least-recently-used cleanup."""
+        now = time.time()
+        entry = self._cached(project_id) or self._load(project_id)
+        if entry is None or now - entry.get("last_access", 0) < _TOUCH_INTERVAL_SECONDS:
+            return
+        with self._lock:
+            entry["last_access"] = now
+        self._connect().execute(
+            "UPDATE workspaces SET last_access = ? WHERE project_id = ?",
+            (now, project_id),
+        )
+
+    def project_ids(self) -> set[str]:
+        return {row[0] for row in self._connect().execute("SELECT project_id FROM workspaces")}
+
+    def by_last_access(self) -> list[dict]:
+        """Every workspace with its total size, least recently used first."""
+        rows = self._connect().execute(
+            """
+SELECT w.project_id, w.status, w.updated_at, w.last_access, COALESCE(SUM(f.size_bytes), 0)
+FROM workspaces w LEFT JOIN workspace_files f ON f.project_id = w.project_id
+GROUP BY w.project_id
+ORDER BY w.last_access ASC
+"""
+        ).fetchall()
+        return [
+            {"project_id": row[0], "status": row[1], "updated_at": row[2],
+             "last_access": row[3], "size_bytes": row[4]}
+            for row in rows
+        ]
+
+    @staticmethod
+    def _ref(conn: sqlite3.Connection, digest: str, size_bytes: int, delta: int, now: float):
+        if not digest:
+            return
+        conn.execute(
+            """
+INSERT INTO blobs (digest, size_bytes, refcount, updated_at) VALUES (?, ?, ?, ?)
+ON CONFLICT(digest) DO UPDATE SET
+    refcount = refcount + excluded.refcount,
+    updated_at = excluded.updated_at
+""",
+            (digest, size_bytes, delta, now),
+        )
+
+    def record_file(self, project_id: str, path: str, size_bytes: int, digest: str = ""):
+        """Record a written file; `path` is relative to the project folder and
+        `digest` names the blob it links to, if any."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR IGNORE INTO workspaces (project_id, created_at, updated_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (project_id, now, now, now),
+            )
+            conn.execute(
+                "UPDATE workspaces SET updated_at = ? WHERE project_id = ?",
+                (now, project_id),
+            )
+            previous = conn.execute(
+                "SELECT size_bytes, digest FROM workspace_files WHERE project_id = ? AND path = ?",
+                (project_id, path),
+            ).fetchone()
+            conn.execute(
+                """
+INSERT INTO workspace_files (project_id, path, size_bytes, digest) VALUES (?, ?, ?, ?)
+ON CONFLICT(project_id, path) DO UPDATE SET
+    size_bytes = excluded.size_bytes,
+    digest = excluded.digest
+""",
+                (project_id, path, size_bytes, digest),
+            )
+            if not previous or previous[1] != digest:
+                self._ref(conn, digest, size_bytes, 1, now)
+                if previous:
+                    self._ref(conn, previous[1], previous[0], -1, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._invalidate(project_id)
+
+    def set_status(self, project_id: str, status: str):
+        now = time.time()
+        self._connect().execute(
+            "UPDATE workspaces SET status = ?, updated_at = ? WHERE project_id = ?",
+            (status, now, project_id),
+        )
+        self._invalidate(project_id)
+
+    def get(self, project_id: str) -> dict | None:
+        """Return a copy of the workspace's entry, or None if it was never written."""
+        entry = self._cached(project_id) or self._load(project_id)
+        if entry is None:
+            return None
+        with self._lock:
+            return {**entry, "files": dict(entry["files"]), "digests": dict(entry["digests"])}
+
+    def forget(self, project_id: str):
+        """Drop a workspace's entry and release its blob references."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                """
+UPDATE blobs SET refcount = refcount - (
+    SELECT COUNT(*) FROM workspace_files
+    WHERE project_id = ? AND workspace_files.digest = blobs.digest
+), updated_at = ?
+WHERE digest IN (SELECT digest FROM workspace_files WHERE project_id = ?)
+""",
+                (project_id, now, project_id),
+            )
+            conn.execute("DELETE FROM workspace_files WHERE project_id = ?", (project_id,))
+            conn.execute("DELETE FROM workspaces WHERE project_id = ?", (project_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._invalidate(project_id)
+
+    def unreferenced_blobs(self, before: float) -> list[str]:
+        """Digests no workspace has referenced since `before`."""
+        rows = self._connect().execute(
+            "SELECT digest FROM blobs WHERE refcount <= 0 AND updated_at < ?",
+            (before,),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def drop_blob(self, digest: str, before: float) -> bool:
+        """Delete a blob's row if it is still unreferenced; True if the blob file may go."""
+        cursor = self._connect().execute(
+            "DELETE FROM blobs WHERE digest = ? AND refcount <= 0 AND updated_at < ?",
+            (digest, before),
+        )
+        return cursor.rowcount > 0
+
+
+def size_bytes(entry: dict) -> int:
+    return sum(entry["files"].values())
+
+
+MANIFEST = WorkspaceManifest(MANIFEST_PATH)
@@ -0,0 +1,153 @@
+import re
+
+# One LLM reply carries several files, each wrapped as:
+#
+#   === FILE: index.html ===
+#   ...file content...
+#   === END FILE ===
+#
+# Markers sit on their own lines so they can be recognized as the reply
+# streams in, without waiting for the whole response.
+
+_FILE_HEADER = re.compile(r"^\s*=== FILE: (.+?) ===\s*$")
+_FILE_FOOTER = re.compile(r"^\s*=== END FILE ===\s*$")
+_FENCE = re.compile(r"^\s*```[\w-]*\s*$")
+
+
+def file_header(path: str) -> str:
+    return f"=== FILE: {path} ==="
+
+
+FILE_FOOTER = "=== END FILE ==="
+
+
+def format_sections(files: dict[str, str]) -> str:
+    """Render `{path: content}` in the multi-file format."""
+    return "\n".join(
+        f"{file_header(path)}\n{content.strip()}\n{FILE_FOOTER}" for path, content in files.items()
+    ) + "\n"
+
+
+def _strip_fences(content: str) -> str:
+    lines = content.strip().splitlines()
+    if lines and _FENCE.match(lines[0]):
+        lines = lines[1:]
+        if lines and _FENCE.match(lines[-1]):
+            lines = lines[:-1]
+    return "\n".join(lines)
+
+
+class SectionSplitter:
+    """Split a streamed multi-file reply into per-file sections.
+
+    `feed` takes the next chunk of text and returns events in order:
+    ("chunk", path, text) for each completed content line and
+    ("done", path, content) when a section's footer (or the next header)
+    arrives. `close` flushes the last section; one that never saw its
+    footer is returned as ("partial", path, content).
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._path: str | None = None
+        self._lines: list[str] = []
+
+    def feed(self, chunk: str) -> list[tuple[str, str, str]]:
+        self._buffer += chunk
+        events = []
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            events.extend(self._line(line))
+        return events
+
+    def close(self) -> list[tuple[str, str, str]]:
+        events = []
+        if self._buffer:
+            line, self._buffer = self._buffer, ""
+            events.extend(self._line(line))
+        if self._path is not None:
+            events.append(("partial", self._path, _strip_fences("\n".join(self._lines))))
+            self._path, self._lines = None, []
+        return events
+
+    def _line(self, line: str) -> list[tuple[str, str, str]]:
+        header = _FILE_HEADER.match(line)
+        if header:
+            events = self._finish() if self._path is not None else []
+            self._path, self._lines = header.group(1).strip(), []
+            return events
+        if self._path is None:
+            # Prose between sections is ignored.
+            return []
+        if _FILE_FOOTER.match(line):
+            return self._finish()
+        self._lines.append(line)
+        return [("chunk", self._path, line + "\n")]
+
+    def _finish(self) -> list[tuple[str, str, str]]:
+        event = ("done", self._path, _strip_fences("\n".join(self._lines)))
+        self._path, self._lines = None, []
+        return [event]
+
+
+# ---------------------------------------------------
+# Validation
+# ---------------------------------------------------
+
+_PAIRS = {"{": "}", "(": ")", "[": "]"}
+
+
+def _balanced(content: str, comments: tuple[str, ...], quotes: str) -> bool:
+    """Check bracket nesting outside strings and comments."""
+    stack = []
+    idx, length = 0, len(content)
+    while idx < length:
+        char = content[idx]
+        if "//" in comments and content.startswith("//", idx):
+            end = content.find("\n", idx)
+            idx = length if end < 0 else end
+            continue
+        if content.startswith("/*", idx):
+            end = content.find("*/", idx + 2)
+            if end < 0:
+                return False
+            idx = end + 2
+            continue
+        if char in quotes:
+            idx += 1
+            while idx < length and content[idx] != char:
+                idx += 2 if content[idx] == "\\" else 1
+            if idx >= length:
+                return False
+        elif char in _PAIRS:
+            stack.append(_PAIRS[char])
+        elif char in _PAIRS.values():
+            if not stack or stack.pop() != char:
+                return False
+        idx += 1
+    return not stack
+
+
+def validate_section(path: str, content: str) -> str | None:
+    """Return why a generated file looks incomplete, or None if it is usable.
+
+    The checks only catch the usual single-shot failure modes, a section cut
+    short or left empty, not whether the code is correct.
+    """
+    if not content.strip():
+        return "empty section"
+
+    ext = path.rsplit(".", 1)[-1].lower() if "." in path else ""
+    lowered = content.lower()
+    if ext in {"html", "htm"}:
+        if "<html" in lowered and "</html>" not in lowered:
+            return "missing </html>"
+        if "<body" in lowered and "</body>" not in lowered:
+            return "missing </body>"
+    elif ext == "css":
+        if not _balanced(content, ("/*",), "\"'"):
+            return "unbalanced braces"
+    elif ext in {"js", "mjs"}:
+        if not _balanced(content, ("//", "/*"), "\"'`"):
+            return "unbalanced brackets"
+    return None
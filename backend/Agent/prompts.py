@@ -1,24 +1,30 @@
 import json
-from .states import Plan, TaskPlan
-def planner_prompt(user_prompt: str) -> str:
-    schema = json.dumps(Plan.model_json_schema(), indent=2)
-    return f"""
-Create a structured plan for a modern web app based on the user request.
+from .multifile import FILE_FOOTER, file_header
+from .states import Blueprint, Plan, TaskPlan
+
+# Prompts are laid out so everything static (instructions and schemas) comes
+# first and is byte-identical across requests, with per-request data last.
+# Providers that cache prompt prefixes can then reuse the static part.
 
-User Request: {user_prompt}
+PLAN_JSON_SCHEMA = Plan.model_json_schema()
+TASK_PLAN_JSON_SCHEMA = TaskPlan.model_json_schema()
+PLAN_SCHEMA = json.dumps(PLAN_JSON_SCHEMA, indent=2)
+TASK_PLAN_SCHEMA = json.dumps(TASK_PLAN_JSON_SCHEMA, indent=2)
+BLUEPRINT_JSON_SCHEMA = Blueprint.model_json_schema()
+BLUEPRINT_SCHEMA = json.dumps(BLUEPRINT_JSON_SCHEMA, indent=2)
+
+PLANNER_SYSTEM_PROMPT = f"""
+Create a structured plan for a modern web app based on the user request.
 
 Return ONLY valid JSON matching this schema:
-{schema}
+{PLAN_SCHEMA}
 
 For files, use simple relative paths like "index.html", "style.css", "script.js". Do not include project folders in paths.
 Techstack should be "html, css, javascript" for simple web apps.
 Keep it concise. Return JSON only. No explanation.
 """
 
-
-def architect_prompt(plan: Plan) -> str:
-    schema = json.dumps(TaskPlan.model_json_schema(), indent=2)
-    return f"""
+ARCHITECT_SYSTEM_PROMPT = f"""
 You are the ARCHITECT agent.
 
 Create one implementation task per file in the project plan.
@@ -28,16 +34,32 @@ For each task:
 - task_description: detailed instructions on what to implement in that file, based on the plan features and description.
 - dependencies: list of other filepaths this task depends on (e.g., JS depends on HTML).
 
-Project Plan: {plan.model_dump_json(indent=2)}
-
 Return ONLY valid JSON matching this schema:
-{schema}
+{TASK_PLAN_SCHEMA}
 Return JSON only. No explanation.
 """
 
+BLUEPRINT_SYSTEM_PROMPT = f"""
+Create a structured plan for a modern web app based on the user request,
+together with one implementation task per planned file.
 
-def coder_system_prompt() -> str:
-    return """
+Return ONLY valid JSON matching this schema:
+{BLUEPRINT_SCHEMA}
+
+Plan:
+- For files, use simple relative paths like "index.html", "style.css", "script.js". Do not include project folders in paths.
+- Techstack should be "html, css, javascript" for simple web apps.
+
+Implementation steps:
+- One task per file in plan.files, ordered by dependencies (e.g., HTML before JS).
+- filepath: exact from plan.files.path
+- task_description: detailed instructions on what to implement in that file, based on the plan features and description.
+- dependencies: list of other filepaths this task depends on (e.g., JS depends on HTML).
+
+Keep it concise. Return JSON only. No explanation.
+"""
+
+CODER_SYSTEM_PROMPT = """
 You are a senior frontend engineer.
 
 Requirements:
@@ -51,7 +73,52 @@ Requirements:
 - Smooth hover transitions
 - Clean typography scale
 
-Return only full file content.
+When dependency files are listed, reference their ids, classes and paths exactly.
+Return only the full content of the requested file.
 No markdown.
 No explanation.
 """
+
+
+# Same requirements as the per-file coder, asking for all files at once.
+BUNDLE_SYSTEM_PROMPT = CODER_SYSTEM_PROMPT.replace(
+    "When dependency files are listed, reference their ids, classes and paths exactly.\n"
+    "Return only the full content of the requested file.\n",
+    f"""Files reference each other's ids, classes and paths exactly.
+Write every requested file in one reply, in the order given. Wrap each
+file in marker lines, exactly like this:
+{file_header("index.html")}
+...full content of index.html...
+{FILE_FOOTER}
+Write the full content of every file between its markers.
+""",
+)
+
+
+def planner_prompt(user_prompt: str) -> list[dict]:
+    return [
+        {"role": "system", "content": PLANNER_SYSTEM_PROMPT},
+        {"role": "user", "content": f"User Request: {user_prompt}"},
+    ]
+
+
+def architect_prompt(plan: Plan) -> list[dict]:
+    return [
+        {"role": "system", "content": ARCHITECT_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Project Plan: {plan.model_dump_json(indent=2)}"},
+    ]
+
+
+def blueprint_prompt(user_prompt: str) -> list[dict]:
+    return [
+        {"role": "system", "content": BLUEPRINT_SYSTEM_PROMPT},
+        {"role": "user", "content": f"User Request: {user_prompt}"},
+    ]
+
+
+def coder_system_prompt() -> str:
+    return CODER_SYSTEM_PROMPT
+
+
+def bundle_system_prompt() -> str:
+    return BUNDLE_SYSTEM_PROMPT
@@ -0,0 +1,360 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from threading import Lock
+
+import httpx
+from langgraph.config import get_config
+
+try:
+    from backend.Agent.telemetry import METRICS, record_llm_call
+except ModuleNotFoundError:
+    from Agent.telemetry import METRICS, record_llm_call
+
+
+LLM_MAX_RETRIES = max(0, int(os.getenv("LLM_MAX_RETRIES", "2")))
+LLM_RETRY_BASE_SECONDS = max(0.0, float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5")))
+LLM_RETRY_MAX_SECONDS = max(0.0, float(os.getenv("LLM_RETRY_MAX_SECONDS", "8")))
+# Upper bound for one call; the job's remaining budget can only shorten it.
+LLM_CALL_TIMEOUT_SECONDS = max(1.0, float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", "90")))
+# Hedging sends a duplicate request when the first one is slower than the
+# stage's recent p95, and keeps whichever answers first. It costs extra
+# tokens on the slowest ~5% of calls, so it is opt-in.
+LLM_HEDGING = os.getenv("LLM_HEDGING", "0").strip().lower() not in {"0", "false", "no"}
+LLM_HEDGE_MIN_SAMPLES = max(1, int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")))
+LLM_HEDGE_MIN_DELAY_SECONDS = max(0.0, float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "0.5")))
+
+_RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+METRICS.counter("buildflow_llm_fallbacks_total", "LLM calls answered by a fallback model.")
+METRICS.counter("buildflow_llm_hedges_total", "Hedged LLM requests, by whether the hedge answered first.")
+METRICS.counter("buildflow_llm_failures_total", "LLM calls that failed after all retries and fallbacks.")
+
+
+class DeadlineExceeded(TimeoutError):
+    """The job's time budget ran out before the LLM call could finish."""
+
+
+# ---------------------------------------------------
+# Latency window
+# ---------------------------------------------------
+
+class LatencyWindow:
+    """Recent call latencies per (stage, model), for hedge delays."""
+
+    def __init__(self, size: int = 200):
+        self.size = size
+        self._samples: dict[tuple[str, str], deque] = {}
+        self._lock = Lock()
+
+    def observe(self, stage: str, model: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault((stage, model), deque(maxlen=self.size)).append(seconds)
+
+    def percentile(self, stage: str, model: str, pct: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples.get((stage, model), ()))
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+LATENCIES = LatencyWindow()
+
+
+# ---------------------------------------------------
+# Policy
+# ---------------------------------------------------
+
+def _status_code(exc: BaseException) -> int | None:
+    return getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether retrying the same request could succeed."""
+    if isinstance(exc, (TimeoutError, ConnectionError, httpx.TimeoutException, httpx.TransportError)):
+        return not isinstance(exc, DeadlineExceeded)
+    status = _status_code(exc)
+    if status is not None:
+        return status in _RETRYABLE_STATUS
+    # Provider SDKs wrap transport failures in their own exception types.
+    return type(exc).__name__ in {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError"}
+
+
+def is_llm_error(exc: BaseException) -> bool:
+    """Whether the LLM call itself failed (transient or rejected by the
+    provider), as opposed to a bug or the job running out of time."""
+    if isinstance(exc, DeadlineExceeded):
+        return False
+    return is_transient(exc) or _status_code(exc) is not None
+
+
+def is_bad_request(exc: BaseException) -> bool:
+    """Whether the provider rejected the request itself (HTTP 400)."""
+    return _status_code(exc) == 400
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)."""
+    cap = min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+    return random.uniform(0, cap)
+
+
+def current_deadline() -> float | None:
+    """Wall-clock deadline of the running job, from the graph config."""
+    try:
+        return get_config().get("configurable", {}).get("deadline")
+    except RuntimeError:
+        return None
+
+
+def call_timeout(deadline: float | None) -> float:
+    """Timeout for the next call: the per-call cap, shortened by the job budget."""
+    if deadline is None:
+        return LLM_CALL_TIMEOUT_SECONDS
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise DeadlineExceeded("Generation time budget exhausted before the LLM call.")
+    return min(LLM_CALL_TIMEOUT_SECONDS, remaining)
+
+
+def _hedge_delay(stage: str, model: str) -> float | None:
+    if not LLM_HEDGING:
+        return None
+    p95 = LATENCIES.percentile(stage, model, 95)
+    return None if p95 is None else max(LLM_HEDGE_MIN_DELAY_SECONDS, p95)
+
+
+def _attempts(candidates):
+    """Yield (model_index, label, model, attempt) over retries, then fallbacks."""
+    for model_index, (label, model) in enumerate(candidates):
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            yield model_index, label, model, attempt
+
+
+def _record_success(stage: str, label: str, model_index: int, attempt: int, started: float, usage,
+                    observe=None):
+    seconds = time.perf_counter() - started
+    retries = model_index * (LLM_MAX_RETRIES + 1) + attempt
+    LATENCIES.observe(stage, label, seconds)
+    if observe:
+        observe(label, seconds, True)
+    record_llm_call(seconds, label, usage, retries=retries, stage=stage)
+    if model_index:
+        METRICS.inc("buildflow_llm_fallbacks_total", node=stage, model=label)
+
+
+def _record_failure(label: str, started: float, observe=None):
+    if observe:
+        observe(label, time.perf_counter() - started, False)
+
+
+def _give_up(stage: str, error: BaseException):
+    METRICS.inc("buildflow_llm_failures_total", node=stage)
+    raise error
+
+
+# ---------------------------------------------------
+# Invoke
+# ---------------------------------------------------
+
+_HEDGE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=max(2, int(os.getenv("LLM_HEDGE_THREADS", "32"))), thread_name_prefix="llm-hedge"
+)
+
+
+def _hedged_invoke(call, hedge_delay: float, timeout: float, stage: str, label: str):
+    """Run `call` and, if it is still running after `hedge_delay`, a duplicate."""
+    primary = _HEDGE_EXECUTOR.submit(copy_context().run, call)
+    done, _ = wait([primary], timeout=hedge_delay)
+    if done:
+        return primary.result()
+
+    hedge = _HEDGE_EXECUTOR.submit(copy_context().run, call)
+    pending = {primary, hedge}
+    error = None
+    deadline = time.monotonic() + timeout
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                             return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                METRICS.inc("buildflow_llm_hedges_total", node=stage, model=label,
+                            winner="hedge" if future is hedge else "primary")
+                # The slower request cannot be aborted; its result is dropped.
+                return future.result()
+            error = future.exception()
+    raise error or TimeoutError(f"LLM call exceeded {timeout:.1f}s")
+
+
+def resilient_invoke(stage: str, candidates, messages, config: dict, observe=None):
+    """Invoke the first of `candidates` ([(label, model)]) that answers.
+
+    Transient failures are retried with jittered backoff, then the next
+    (fallback) model is tried. Every call gets a timeout bounded by the
+    job's remaining budget, and slow calls may be hedged. `observe(label,
+    seconds, ok)` is told about every attempt.
+    """
+    deadline = current_deadline()
+    error = None
+    for model_index, label, model, attempt in _attempts(candidates):
+        if attempt:
+            time.sleep(min(backoff_seconds(attempt), max(0.0, call_timeout(deadline) - 1)))
+        timeout = call_timeout(deadline)
+
+        def call():
+            return model.invoke(messages, config=config, timeout=timeout)
+
+        started = time.perf_counter()
+        try:
+            hedge_delay = _hedge_delay(stage, label)
+            if hedge_delay is not None and hedge_delay < timeout:
+                response = _hedged_invoke(call, hedge_delay, timeout, stage, label)
+            else:
+                response = call()
+        except Exception as exc:
+            _record_failure(label, started, observe)
+            if not is_transient(exc):
+                _give_up(stage, exc)
+            error = exc
+            continue
+        _record_success(stage, label, model_index, attempt, started,
+                        getattr(response, "usage_metadata", None), observe)
+        return response
+    _give_up(stage, error)
+
+
+async def _ahedged_invoke(call, hedge_delay: float, timeout: float, stage: str, label: str):
+    primary = asyncio.ensure_future(call())
+    done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+    if done:
+        return primary.result()
+
+    hedge = asyncio.ensure_future(call())
+    pending = {primary, hedge}
+    error = None
+    try:
+        # Each call carries its own timeout, so this loop always ends.
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    METRICS.inc("buildflow_llm_hedges_total", node=stage, model=label,
+                                winner="hedge" if task is hedge else "primary")
+                    return task.result()
+                error = task.exception()
+    finally:
+        for task in pending:
+            task.cancel()
+    raise error
+
+
+async def aresilient_invoke(stage: str, candidates, messages, config: dict, observe=None):
+    """Async `resilient_invoke`; timed-out and losing hedged calls are cancelled."""
+    deadline = current_deadline()
+    error = None
+    for model_index, label, model, attempt in _attempts(candidates):
+        if attempt:
+            await asyncio.sleep(min(backoff_seconds(attempt), max(0.0, call_timeout(deadline) - 1)))
+        timeout = call_timeout(deadline)
+
+        async def call():
+            return await asyncio.wait_for(model.ainvoke(messages, config=config, timeout=timeout), timeout)
+
+        started = time.perf_counter()
+        try:
+            hedge_delay = _hedge_delay(stage, label)
+            if hedge_delay is not None and hedge_delay < timeout:
+                response = await _ahedged_invoke(call, hedge_delay, timeout, stage, label)
+            else:
+                response = await call()
+        except Exception as exc:
+            _record_failure(label, started, observe)
+            if not is_transient(exc):
+                _give_up(stage, exc)
+            error = exc
+            continue
+        _record_success(stage, label, model_index, attempt, started,
+                        getattr(response, "usage_metadata", None), observe)
+        return response
+    _give_up(stage, error)
+
+
+# ---------------------------------------------------
+# Stream
+# ---------------------------------------------------
+
+def resilient_stream(stage: str, candidates, messages, config: dict, observe=None):
+    """Stream from the first candidate that starts answering.
+
+    A call is only retried (or handed to a fallback model) while it has not
+    produced any output; once chunks have been passed on, a failure is
+    raised to the caller.
+    """
+    deadline = current_deadline()
+    error = None
+    for model_index, label, model, attempt in _attempts(candidates):
+        if attempt:
+            time.sleep(min(backoff_seconds(attempt), max(0.0, call_timeout(deadline) - 1)))
+        timeout = call_timeout(deadline)
+
+        started = time.perf_counter()
+        usage, streamed = None, False
+        try:
+            for chunk in model.stream(messages, config=config, timeout=timeout):
+                # Providers report usage on the final chunk.
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                streamed = True
+                yield chunk
+        except Exception as exc:
+            _record_failure(label, started, observe)
+            if streamed or not is_transient(exc):
+                record_llm_call(time.perf_counter() - started, label, usage, stage=stage)
+                _give_up(stage, exc)
+            error = exc
+            continue
+        _record_success(stage, label, model_index, attempt, started, usage, observe)
+        return
+    _give_up(stage, error)
+
+
+async def aresilient_stream(stage: str, candidates, messages, config: dict, observe=None):
+    """Async `resilient_stream`; the first chunk must arrive within the call timeout."""
+    deadline = current_deadline()
+    error = None
+    for model_index, label, model, attempt in _attempts(candidates):
+        if attempt:
+            await asyncio.sleep(min(backoff_seconds(attempt), max(0.0, call_timeout(deadline) - 1)))
+        timeout = call_timeout(deadline)
+
+        started = time.perf_counter()
+        usage, streamed = None, False
+        stream = model.astream(messages, config=config, timeout=timeout)
+        try:
+            # A stuck call usually never sends its first chunk.
+            chunk = await asyncio.wait_for(anext(stream), timeout)
+            while True:
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                streamed = True
+                yield chunk
+                chunk = await anext(stream)
+        except StopAsyncIteration:
+            pass
+        except Exception as exc:
+            _record_failure(label, started, observe)
+            if streamed or not is_transient(exc):
+                record_llm_call(time.perf_counter() - started, label, usage, stage=stage)
+                _give_up(stage, exc)
+            error = exc
+            continue
+        finally:
+            await stream.aclose()
+        _record_success(stage, label, model_index, attempt, started, usage, observe)
+        return
+    _give_up(stage, error)
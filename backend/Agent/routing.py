@@ -0,0 +1,186 @@
+import json
+import os
+import time
+from collections import deque
+from threading import Lock
+
+try:
+    from backend.Agent.states import Plan
+    from backend.Agent.telemetry import METRICS
+except ModuleNotFoundError:
+    from Agent.states import Plan
+    from Agent.telemetry import METRICS
+
+
+# Routes come from LLM_ROUTES, either inline JSON or the path of a JSON
+# file: a list of rules, first match wins, e.g.
+#
+#   [{"stage": "planner", "model": "llama-3.1-8b-instant"},
+#    {"stage": "coder", "ext": "css", "model": "llama-3.1-8b-instant"},
+#    {"stage": "coder", "ext": "js", "complexity": "complex",
+#     "model": "openai/gpt-oss-120b", "downgrade": ["llama-3.3-70b-versatile"],
+#     "max_p95_seconds": 20}]
+#
+# "stage", "ext" and "complexity" default to "*". Requests no rule matches
+# use GROQ_MODEL. A route whose model degrades (p95 over max_p95_seconds or
+# too many failures) switches to its next "downgrade" model for a cooldown.
+LLM_ROUTES = os.getenv("LLM_ROUTES", "").strip()
+ROUTE_WINDOW = max(5, int(os.getenv("ROUTE_WINDOW", "50")))
+ROUTE_MIN_SAMPLES = max(1, int(os.getenv("ROUTE_MIN_SAMPLES", "10")))
+ROUTE_MAX_P95_SECONDS = float(os.getenv("ROUTE_MAX_P95_SECONDS", "0"))
+ROUTE_MAX_FAILURE_RATE = min(1.0, max(0.0, float(os.getenv("ROUTE_MAX_FAILURE_RATE", "0.5"))))
+ROUTE_COOLDOWN_SECONDS = max(1.0, float(os.getenv("ROUTE_COOLDOWN_SECONDS", "300")))
+
+METRICS.histogram("buildflow_route_seconds", "LLM call latency per routing rule and model.")
+METRICS.counter("buildflow_route_failures_total", "Failed LLM calls per routing rule and model.")
+METRICS.counter("buildflow_route_downgrades_total", "Routes switched to their next model after degrading.")
+
+_COMPLEX_HINTS = frozenset({
+    "api", "apis", "auth", "authentication", "backend", "database", "db", "django", "express",
+    "flask", "login", "multiplayer", "node", "pages", "react", "router", "routing", "server",
+    "signup", "sql", "vue", "websocket",
+})
+
+
+# ---------------------------------------------------
+# Complexity
+# ---------------------------------------------------
+
+def mentions_complex_features(text: str) -> bool:
+    """Whether `text` asks for servers, auth, frameworks or several pages."""
+    words = (word.strip(".,;:!?()\"'") for word in text.lower().split())
+    return not _COMPLEX_HINTS.isdisjoint(words)
+
+
+def prompt_complexity(prompt: str) -> str:
+    return "complex" if mentions_complex_features(prompt) else "simple"
+
+
+def plan_complexity(plan: Plan | None) -> str:
+    if plan is None:
+        return "simple"
+    if len(plan.files) > 4 or len(plan.features) > 8:
+        return "complex"
+    return prompt_complexity(f"{plan.techstack} {plan.description}")
+
+
+# ---------------------------------------------------
+# Router
+# ---------------------------------------------------
+
+class _Route:
+    def __init__(self, rule: dict, default_model: str):
+        self.stage = str(rule.get("stage", "*")).lower()
+        self.ext = str(rule.get("ext", "*")).lower().lstrip(".")
+        self.complexity = str(rule.get("complexity", "*")).lower()
+        self.models = [rule.get("model") or default_model] + [
+            name for name in rule.get("downgrade", []) if name
+        ]
+        self.max_p95_seconds = float(rule.get("max_p95_seconds", ROUTE_MAX_P95_SECONDS) or 0)
+        self.name = f"{self.stage}/{self.ext}/{self.complexity}"
+        self.active = 0
+        self.downgraded_until = 0.0
+        self.samples: dict[str, deque] = {}
+
+    def matches(self, stage: str, ext: str, complexity: str) -> bool:
+        return (
+            self.stage in {"*", stage}
+            and self.ext in {"*", ext}
+            and self.complexity in {"*", complexity}
+        )
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+class ModelRouter:
+    """Pick a model per (stage, file extension, complexity) and downgrade
+    routes whose model degrades."""
+
+    def __init__(self, rules: list[dict], default_model: str):
+        self.default_model = default_model
+        self.routes = [_Route(rule, default_model) for rule in rules]
+        self.routes.append(_Route({}, default_model))
+        self._lock = Lock()
+
+    def select(self, stage: str, ext: str = "", complexity: str = "simple") -> tuple[str, list[str]]:
+        """Return the route name and its models, the one to use first."""
+        ext = ext.lower().lstrip(".")
+        route = next(route for route in self.routes if route.matches(stage, ext, complexity))
+        with self._lock:
+            if route.active and time.monotonic() >= route.downgraded_until:
+                # Cooldown over: give the preferred model another chance.
+                route.active = 0
+            return route.name, route.models[route.active:] + route.models[:route.active]
+
+    def observe(self, route_name: str, model: str, seconds: float, ok: bool):
+        route = next((route for route in self.routes if route.name == route_name), None)
+        if route is None:
+            return
+        METRICS.observe("buildflow_route_seconds", seconds, route=route_name, model=model)
+        if not ok:
+            METRICS.inc("buildflow_route_failures_total", route=route_name, model=model)
+
+        with self._lock:
+            samples = route.samples.setdefault(model, deque(maxlen=ROUTE_WINDOW))
+            samples.append((seconds, ok))
+            if model != route.models[route.active] or route.active + 1 >= len(route.models):
+                return
+            if len(samples) < ROUTE_MIN_SAMPLES or not self._degraded(route, samples):
+                return
+            route.active += 1
+            route.downgraded_until = time.monotonic() + ROUTE_COOLDOWN_SECONDS
+            # Judge the model on fresh samples when it is tried again.
+            samples.clear()
+        METRICS.inc("buildflow_route_downgrades_total", route=route_name, model=model)
+
+    @staticmethod
+    def _degraded(route: _Route, samples) -> bool:
+        failures = sum(1 for _, ok in samples if not ok)
+        if failures / len(samples) > ROUTE_MAX_FAILURE_RATE:
+            return True
+        latencies = [seconds for seconds, ok in samples if ok]
+        return bool(route.max_p95_seconds and latencies
+                    and _percentile(latencies, 95) > route.max_p95_seconds)
+
+    def snapshot(self) -> list[dict]:
+        """Per-route models and recent latency/failure stats."""
+        now = time.monotonic()
+        with self._lock:
+            rows = []
+            for route in self.routes:
+                stats = {}
+                for model, samples in route.samples.items():
+                    latencies = [seconds for seconds, ok in samples if ok]
+                    stats[model] = {
+                        "calls": len(samples),
+                        "failures": sum(1 for _, ok in samples if not ok),
+                        "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+                        "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+                    }
+                rows.append({
+                    "route": route.name,
+                    "models": route.models,
+                    "active_model": route.models[route.active],
+                    "downgraded_for_s": round(max(0.0, route.downgraded_until - now), 1) if route.active else 0,
+                    "stats": stats,
+                })
+            return rows
+
+
+def load_routes(spec: str = LLM_ROUTES) -> list[dict]:
+    """Parse LLM_ROUTES (inline JSON or a JSON file path); invalid specs are ignored."""
+    if not spec:
+        return []
+    try:
+        if spec.lstrip().startswith("["):
+            rules = json.loads(spec)
+        else:
+            with open(spec, "r", encoding="utf-8") as f:
+                rules = json.load(f)
+    except (OSError, ValueError) as exc:
+        print(f"Ignoring LLM_ROUTES: {exc}")
+        return []
+    return [rule for rule in rules if isinstance(rule, dict)] if isinstance(rules, list) else []
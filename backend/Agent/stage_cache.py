@@ -0,0 +1,83 @@
+import json
+import os
+import time
+import uuid
+from hashlib import sha256
+
+STAGE_CACHE_DIR = os.path.abspath(
+    os.getenv(
+        "STAGE_CACHE_DIR",
+        os.path.join(
+            os.getenv("BUILDFLOW_STATE_DIR", os.path.join(os.path.dirname(__file__), "..", ".state")),
+            "stages",
+        ),
+    )
+)
+STAGE_CACHE_ENABLED = os.getenv("STAGE_CACHE_ENABLED", "1").strip().lower() not in {"0", "false", "no"}
+STAGE_CACHE_TTL_SECONDS = max(60, int(os.getenv("STAGE_CACHE_TTL_SECONDS", "86400")))
+
+
+def stage_key(stage: str, payload: str) -> str:
+    return sha256(f"{stage}|{payload}".encode("utf-8")).hexdigest()
+
+
+def _entry_path(stage: str, key: str) -> str:
+    return os.path.join(STAGE_CACHE_DIR, stage, f"{key}.json")
+
+
+def load_stage(stage: str, key: str):
+    """Return the memoized output of a graph stage, or None."""
+    if not STAGE_CACHE_ENABLED:
+        return None
+
+    path = _entry_path(stage, key)
+    try:
+        if time.time() - os.path.getmtime(path) > STAGE_CACHE_TTL_SECONDS:
+            os.remove(path)
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_stage(stage: str, key: str, data: dict):
+    """Store a stage output atomically so concurrent workers never read partial JSON."""
+    if not STAGE_CACHE_ENABLED:
+        return
+
+    path = _entry_path(stage, key)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def expire_stages(before: float) -> int:
+    """Delete stage outputs (and stray temp files) last written before `before`; returns the bytes freed."""
+    freed = 0
+    try:
+        stages = os.listdir(STAGE_CACHE_DIR)
+    except FileNotFoundError:
+        return 0
+    for stage in stages:
+        folder = os.path.join(STAGE_CACHE_DIR, stage)
+        try:
+            names = os.listdir(folder)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        for name in names:
+            path = os.path.join(folder, name)
+            try:
+                if os.path.getmtime(path) < before:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                    freed += size
+            except FileNotFoundError:
+                continue
+    return freed
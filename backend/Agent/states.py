@@ -1,6 +1,6 @@
 from typing import Optional, List
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, model_validator
 
 
 class File(BaseModel):
@@ -22,10 +22,25 @@ class ImplementationTask(BaseModel):
 class TaskPlan(BaseModel):
     implementation_steps: list[ImplementationTask] = Field(description="A list of steps to be taken to implement the task")
     model_config = ConfigDict(extra="allow")
+
+    @model_validator(mode="after")
+    def _restore_plan(self):
+        # The architect attaches the Plan as an extra field; checkpoints
+        # round-trip it as a plain dict.
+        plan = getattr(self, "plan", None)
+        if isinstance(plan, dict):
+            self.plan = Plan(**plan)
+        return self
     
+class Blueprint(BaseModel):
+    plan: Plan = Field(description="The project plan")
+    implementation_steps: list[ImplementationTask] = Field(description="One implementation task per file in plan.files, ordered by dependencies")
+
 class CoderState(BaseModel):
     task_plan: TaskPlan = Field(description="The plan for the task to be implemented")
-    current_step_idx: int = Field(0, description="The index of the current step in the implementation steps")
+    current_step_idx: int = Field(0, description="The number of implementation steps completed so far")
+    completed_steps: List[int] = Field(default_factory=list, description="Indices of implementation steps that have been processed")
     current_file_content: Optional[str] = Field(None, description="The content of the file currently being edited or created")
     created_files: List[str] = Field(default_factory=list, description="List of files successfully created")
-    failed_files: List[str] = Field(default_factory=list, description="List of files that failed to create")
\ No newline at end of file
+    failed_files: List[str] = Field(default_factory=list, description="List of files that failed to create")
+    single_shot_attempted: bool = Field(False, description="Whether the remaining files were already requested in one multi-file call")
\ No newline at end of file
@@ -0,0 +1,227 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from langgraph.config import get_stream_writer
+
+_SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def _label_str(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{str(value).replace(chr(34), chr(39))}"' for key, value in labels)
+    return "{" + inner + "}"
+
+
+class _Histogram:
+    def __init__(self, name: str, help_text: str, buckets=_SECONDS_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][idx] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self._series.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_label_str(key + (('le', bound),))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_label_str(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_label_str(key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_label_str(key)} {count}")
+        return lines
+
+
+class _Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._series: dict[tuple, float] = {}
+
+    def inc(self, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._series[key] = self._series.get(key, 0) + value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._series.items()):
+            lines.append(f"{self.name}{_label_str(key)} {value:g}")
+        return lines
+
+
+class MetricsRegistry:
+    """Minimal Prometheus text-format registry for in-process metrics."""
+
+    def __init__(self):
+        self._metrics: dict[str, object] = {}
+        self._gauges: dict[str, tuple[str, object]] = {}
+        self._lock = Lock()
+
+    def histogram(self, name: str, help_text: str, buckets=_SECONDS_BUCKETS) -> _Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, _Histogram(name, help_text, buckets))
+
+    def counter(self, name: str, help_text: str) -> _Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, _Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str, read):
+        """Register a gauge whose value is read from `read()` at scrape time."""
+        with self._lock:
+            self._gauges[name] = (help_text, read)
+
+    def observe(self, name: str, value: float, **labels):
+        with self._lock:
+            self._metrics[name].observe(value, **labels)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._metrics[name].inc(value, **labels)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+            for metric in self._metrics.values():
+                lines.extend(metric.render())
+            gauges = list(self._gauges.items())
+        for name, (help_text, read) in gauges:
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {read():g}"])
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+METRICS.histogram("buildflow_node_seconds", "Wall time per graph node execution.")
+METRICS.histogram("buildflow_llm_seconds", "Time spent inside LLM calls.")
+METRICS.counter(
+    "buildflow_llm_tokens_total",
+    "LLM tokens by kind: prompt, completion, or cached (prompt tokens served from the provider's prefix cache).",
+)
+METRICS.counter("buildflow_llm_retries_total", "Retried LLM calls.")
+METRICS.counter("buildflow_bytes_written_total", "Bytes of generated files written to workspaces.")
+METRICS.counter(
+    "buildflow_coder_prompt_tokens_total",
+    "Estimated coder prompt tokens, before (full) and after (sent) context slimming.",
+)
+
+
+class Span:
+    """Timing and usage totals for one node execution or one generated file."""
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.wall_seconds = 0.0
+        self.llm_seconds = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.bytes_written = 0
+        self.retries = 0
+        self.models: set[str] = set()
+        self._lock = Lock()
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            **self.attributes,
+            "started_at": self.started_at,
+            "wall_ms": round(self.wall_seconds * 1000, 1),
+            "llm_ms": round(self.llm_seconds * 1000, 1),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_prompt_tokens": self.cached_prompt_tokens,
+            "bytes_written": self.bytes_written,
+            "retries": self.retries,
+            "models": sorted(self.models),
+        }
+
+
+_current_spans: ContextVar[tuple[Span, ...]] = ContextVar("buildflow_spans", default=())
+
+
+def _stream_writer():
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        # Called outside a graph run (e.g. from a script); nothing to stream to.
+        return None
+
+
+@contextmanager
+def span(name: str, emit=None, detached: bool = False, **attributes):
+    """Time a block and collect LLM usage recorded inside it.
+
+    Usage also rolls up into enclosing spans, so a node span covers the
+    file spans opened by its worker threads; `detached` starts a new root
+    instead. The finished span is sent to `emit` (default: the graph's
+    custom stream writer).
+    """
+    current = Span(name, **attributes)
+    parents = () if detached else _current_spans.get()
+    token = _current_spans.set(parents + (current,))
+    started = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.wall_seconds = time.perf_counter() - started
+        _current_spans.reset(token)
+        METRICS.observe("buildflow_node_seconds", current.wall_seconds, node=name)
+        emit = emit or _stream_writer()
+        if emit is not None:
+            emit({"type": "span", **current.to_dict()})
+
+
+def annotate(**attributes):
+    """Attach attributes to the innermost open span."""
+    spans = _current_spans.get()
+    if spans:
+        with spans[-1]._lock:
+            spans[-1].attributes.update(attributes)
+
+
+def record_llm_call(seconds: float, model: str, usage: dict | None = None, retries: int = 0,
+                    stage: str | None = None):
+    """Add one LLM call to the open spans; metrics are labelled with `stage`
+    (default: the outermost open span)."""
+    usage = usage or {}
+    prompt_tokens = int(usage.get("input_tokens", 0) or 0)
+    completion_tokens = int(usage.get("output_tokens", 0) or 0)
+    cached_tokens = int((usage.get("input_token_details") or {}).get("cache_read", 0) or 0)
+    spans = _current_spans.get()
+    node = stage or (spans[0].name if spans else "unknown")
+
+    for active in spans:
+        with active._lock:
+            active.llm_seconds += seconds
+            active.prompt_tokens += prompt_tokens
+            active.completion_tokens += completion_tokens
+            active.cached_prompt_tokens += cached_tokens
+            active.retries += retries
+            active.models.add(model)
+
+    METRICS.observe("buildflow_llm_seconds", seconds, node=node, model=model)
+    METRICS.inc("buildflow_llm_tokens_total", prompt_tokens, node=node, model=model, kind="prompt")
+    METRICS.inc("buildflow_llm_tokens_total", completion_tokens, node=node, model=model, kind="completion")
+    METRICS.inc("buildflow_llm_tokens_total", cached_tokens, node=node, model=model, kind="cached")
+    if retries:
+        METRICS.inc("buildflow_llm_retries_total", retries, node=node, model=model)
+
+
+def record_bytes_written(count: int, stage: str | None = None):
+    spans = _current_spans.get()
+    for active in spans:
+        with active._lock:
+            active.bytes_written += count
+    node = stage or (spans[0].name if spans else "unknown")
+    METRICS.inc("buildflow_bytes_written_total", count, node=node)
@@ -1,7 +1,24 @@
+import asyncio
 import os
+import shutil
+import time
+import uuid
+import sqlite3
+from contextlib import asynccontextmanager, contextmanager
 from langchain_core.tools import tool
 
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "workspaces"))
+try:
+    from backend.Agent.blobs import BLOB_GC_GRACE_SECONDS, BLOBS
+    from backend.Agent.manifest import MANIFEST
+    from backend.Agent.telemetry import METRICS
+except ModuleNotFoundError:
+    from Agent.blobs import BLOB_GC_GRACE_SECONDS, BLOBS
+    from Agent.manifest import MANIFEST
+    from Agent.telemetry import METRICS
+
+BASE_DIR = os.path.abspath(
+    os.getenv("BUILDFLOW_WORKSPACES_DIR", os.path.join(os.path.dirname(__file__), "..", "workspaces"))
+)
 
 def safe_path(path: str):
     """Ensure path is within workspace directory."""
@@ -20,6 +37,108 @@ def safe_path(path: str):
     return full_path
 
 
+METRICS.counter("buildflow_blob_dedup_bytes_total", "Bytes not written because an identical blob existed.")
+METRICS.counter("buildflow_blob_reclaimed_bytes_total", "Bytes freed by deleting unreferenced blobs.")
+
+
+def _record_write(full_path: str, size_bytes: int, digest: str = ""):
+    """Index a written file under its project (the first folder below BASE_DIR)."""
+    parts = os.path.relpath(full_path, BASE_DIR).replace("\\", "/").split("/", 1)
+    if len(parts) < 2:
+        return
+    try:
+        MANIFEST.record_file(parts[0], parts[1], size_bytes, digest)
+    except sqlite3.Error as e:
+        # The file itself is written; a stale index only costs a disk check.
+        print(f"Workspace manifest update failed for {full_path}: {e}")
+
+
+def _link_blob(full_path: str, digest: str, size_bytes: int, new: bool):
+    BLOBS.link(digest, full_path)
+    if not new:
+        METRICS.inc("buildflow_blob_dedup_bytes_total", size_bytes)
+    _record_write(full_path, size_bytes, digest)
+
+
+def _store_file(tmp_path: str, full_path: str):
+    """Move a finished temp file into the blob store and link it at `full_path`."""
+    digest, size_bytes, new = BLOBS.put_file(tmp_path)
+    _link_blob(full_path, digest, size_bytes, new)
+
+
+def _discard(tmp_path: str):
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+
+@contextmanager
+def atomic_writer(path: str):
+    """Yield a text handle to a temp file that replaces `path` only on success."""
+    full_path = safe_path(path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    tmp_path = f"{full_path}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            yield f
+        _store_file(tmp_path, full_path)
+    finally:
+        _discard(tmp_path)
+
+
+@asynccontextmanager
+async def async_atomic_writer(path: str):
+    """Async counterpart of `atomic_writer`; hashing the file, linking its
+    blob and recording it in the manifest run in a worker thread."""
+    full_path = safe_path(path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    tmp_path = f"{full_path}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            yield f
+        await asyncio.to_thread(_store_file, tmp_path, full_path)
+    finally:
+        _discard(tmp_path)
+
+
+def remove_workspace(project_id: str, checkpointer=None) -> int:
+    """Delete a workspace folder and release its blobs, along with its graph
+    checkpoints when given the graph's `checkpointer`.
+
+    Returns the bytes freed outright, i.e. files not backed by a blob;
+    blob bytes are freed later by `collect_blobs`.
+    """
+    entry = MANIFEST.get(project_id)
+    shutil.rmtree(safe_path(project_id), ignore_errors=True)
+    MANIFEST.forget(project_id)
+    if checkpointer is not None:
+        try:
+            # The project id is the checkpoint thread id.
+            checkpointer.delete_thread(project_id)
+        except sqlite3.Error as e:
+            print(f"Checkpoint cleanup failed for {project_id}: {e}")
+    if not entry:
+        return 0
+    return sum(size for path, size in entry["files"].items() if path not in entry["digests"])
+
+
+def collect_blobs(grace_seconds: int = BLOB_GC_GRACE_SECONDS) -> int:
+    """Delete blobs no workspace references; returns the bytes freed."""
+    before = time.time() - grace_seconds
+    freed = 0
+    for digest in MANIFEST.unreferenced_blobs(before):
+        try:
+            if os.path.getmtime(BLOBS.path(digest)) >= before:
+                # Just reused by a write that has not recorded it yet.
+                continue
+        except FileNotFoundError:
+            pass
+        if MANIFEST.drop_blob(digest, before):
+            freed += BLOBS.remove(digest)
+    if freed:
+        METRICS.inc("buildflow_blob_reclaimed_bytes_total", freed)
+    return freed
+
+
 @tool
 def read_file(path: str) -> str:
     """Read the content of a file at the given path."""
@@ -39,8 +158,8 @@ def write_file(path: str, content: str) -> str:
         dirname = os.path.dirname(path)
         os.makedirs(dirname, exist_ok=True)
 
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        digest, size_bytes, new = BLOBS.put_bytes(content.encode('utf-8'))
+        _link_blob(path, digest, size_bytes, new)
 
         return f"Successfully wrote to {path}"
     except Exception as e:
@@ -1,32 +1,65 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
+import json
 import uuid
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 import time
 from hashlib import sha256
 from threading import Lock
+from typing import Literal
 
 from fastapi import FastAPI, Request, HTTPException
 from pydantic import BaseModel
-import shutil
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers
 
 
 try:
     # Works when launched from project root: uvicorn backend.api:app
     from backend.Agent.graph import agent
-    from backend.Agent.graph import get_llm_status
+    from backend.Agent.graph import get_llm_status, get_route_stats
+    from backend.Agent.manifest import MANIFEST, size_bytes
+    from backend.Agent.telemetry import METRICS
+    from backend.Agent.tools import write_file
+    from backend.archive import cached_archive, content_digest, stream_archive, workspace_paths
+    from backend.cache import create_cache
+    from backend.jobs import AsyncGenerationPool, GenerationPool, Job, JobStore, PoolSaturated
+    from backend.serving import finished_file_response, precompress_workspace
+    from backend.similarity import SemanticIndex
+    from backend.templates import classify_prompt, load_template_packs
+    from backend.workspace_gc import WorkspaceCollector
 except ModuleNotFoundError:
     # Works when launched from backend folder: uvicorn api:app
     from Agent.graph import agent
-    from Agent.graph import get_llm_status
+    from Agent.graph import get_llm_status, get_route_stats
+    from Agent.manifest import MANIFEST, size_bytes
+    from Agent.telemetry import METRICS
+    from Agent.tools import write_file
+    from archive import cached_archive, content_digest, stream_archive, workspace_paths
+    from cache import create_cache
+    from jobs import AsyncGenerationPool, GenerationPool, Job, JobStore, PoolSaturated
+    from serving import finished_file_response, precompress_workspace
+    from similarity import SemanticIndex
+    from templates import classify_prompt, load_template_packs
+    from workspace_gc import WorkspaceCollector
+
+
+@asynccontextmanager
+async def _lifespan(app):
+    # _WORKSPACE_GC is defined below, next to the cache and job store it watches.
+    _WORKSPACE_GC.start()
+    try:
+        yield
+    finally:
+        _WORKSPACE_GC.stop()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=_lifespan)
 
 
 def _parse_cors_origins() -> list[str]:
@@ -45,10 +78,82 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files for serving generated workspaces
-WORKSPACES_DIR = os.path.join(os.path.dirname(__file__), "workspaces")
+WORKSPACES_DIR = os.getenv("BUILDFLOW_WORKSPACES_DIR", os.path.join(os.path.dirname(__file__), "workspaces"))
 os.makedirs(WORKSPACES_DIR, exist_ok=True)
-app.mount("/workspaces", StaticFiles(directory=WORKSPACES_DIR), name="workspaces")
+
+METRICS.counter("buildflow_archive_downloads_total", "Project zip downloads by archive cache outcome.")
+
+
+def _workspace_archive(project_folder: str) -> tuple[list[str], str]:
+    """Return the workspace's file paths and content digest."""
+    entry = MANIFEST.get(os.path.basename(project_folder))
+    if entry and entry["files"]:
+        paths = sorted(entry["files"])
+        try:
+            return paths, content_digest(project_folder, paths, entry["digests"])
+        except OSError:
+            # Files were removed behind the manifest's back; fall back to disk.
+            pass
+    paths = workspace_paths(project_folder)
+    return paths, content_digest(project_folder, paths)
+
+
+# Registered before the static mount so it takes precedence over it.
+@app.get("/workspaces/{project_id}.zip")
+def download_project(project_id: str):
+    project_folder = os.path.join(WORKSPACES_DIR, project_id)
+    if project_id.startswith(".") or not os.path.isdir(project_folder):
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    try:
+        paths, digest = _workspace_archive(project_folder)
+    except OSError:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if not paths:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    headers = {"ETag": f'"{digest}"'}
+    filename = f"{project_id}.zip"
+    MANIFEST.touch(project_id)
+    archive_path = cached_archive(digest)
+    if archive_path:
+        # Keeps the archive from aging out while it is still being downloaded.
+        os.utime(archive_path)
+        METRICS.inc("buildflow_archive_downloads_total", cache="hit")
+        return FileResponse(archive_path, media_type="application/zip", filename=filename, headers=headers)
+
+    METRICS.inc("buildflow_archive_downloads_total", cache="miss")
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return StreamingResponse(
+        stream_archive(project_folder, paths, digest),
+        media_type="application/zip",
+        headers=headers,
+    )
+
+
+def _workspace_file_response(project_id: str, path: str, headers: Headers):
+    MANIFEST.touch(project_id)
+    return finished_file_response(project_id, path, headers)
+
+
+class _WorkspaceFiles(StaticFiles):
+    """StaticFiles that serves finished workspaces from their precompressed,
+    immutable blobs and records which workspaces are being viewed, so GC
+    removes the least recently used ones first."""
+
+    async def get_response(self, path: str, scope):
+        project_id, _, file_path = path.replace("\\", "/").partition("/")
+        if project_id and not project_id.startswith("."):
+            response = await asyncio.to_thread(
+                _workspace_file_response, project_id, file_path, Headers(scope=scope)
+            )
+            if response is not None:
+                return response
+        return await super().get_response(path, scope)
+
+
+# Mount static files for serving generated workspaces
+app.mount("/workspaces", _WorkspaceFiles(directory=WORKSPACES_DIR), name="workspaces")
 
 @app.get("/")
 def read_root():
@@ -57,6 +162,15 @@ def read_root():
 class AgentRequest(BaseModel):
     prompt: str
     recursion_limit: int = 20
+    # None defers to TEMPLATE_FAST_PATH.
+    use_templates: bool | None = None
+    # "staged" (planner then architect), "fused" (one call for both) or
+    # "auto"; None defers to PIPELINE_MODE.
+    pipeline_mode: Literal["auto", "staged", "fused"] | None = None
+
+
+class ResumeRequest(BaseModel):
+    recursion_limit: int = 20
 
 limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
@@ -79,9 +193,7 @@ def _build_project_response(project_folder: str):
     if not os.path.exists(index_file):
         return None
 
-    zip_path = f"{project_folder}.zip"
-    shutil.make_archive(project_folder, "zip", project_folder)
-
+    # The zip is built on first download (see download_project).
     project_id = os.path.basename(project_folder)
     app_url = f"/workspaces/{project_id}/index.html"
 
@@ -92,10 +204,32 @@ def _build_project_response(project_folder: str):
     }
 
 
-_RESPONSE_CACHE: dict[str, dict] = {}
-_RESPONSE_CACHE_LOCK = Lock()
-_RESPONSE_CACHE_MAX = max(10, int(os.getenv("GENERATION_CACHE_MAX", "200")))
-_RESPONSE_CACHE_TTL_SECONDS = max(30, int(os.getenv("GENERATION_CACHE_TTL_SECONDS", "900")))
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() not in {"0", "false", "no"}
+
+
+STATE_DIR = os.getenv("BUILDFLOW_STATE_DIR", os.path.join(os.path.dirname(__file__), ".state"))
+
+
+def _cached_workspace(response: dict):
+    project_id = os.path.basename(response.get("project") or "")
+    if not project_id:
+        return None
+    return os.path.join(WORKSPACES_DIR, project_id)
+
+
+def _cached_workspace_exists(response: dict) -> bool:
+    project_folder = _cached_workspace(response)
+    return bool(project_folder) and os.path.exists(os.path.join(project_folder, "index.html"))
+
+
+_RESPONSE_CACHE = create_cache(
+    backend=os.getenv("GENERATION_CACHE_BACKEND", "sqlite").strip().lower(),
+    path=os.getenv("GENERATION_CACHE_PATH", os.path.join(STATE_DIR, "generation_cache.sqlite3")),
+    max_entries=max(10, int(os.getenv("GENERATION_CACHE_MAX", "200"))),
+    ttl_seconds=max(30, int(os.getenv("GENERATION_CACHE_TTL_SECONDS", "900"))),
+    is_valid=_cached_workspace_exists,
+)
 
 
 def _normalize_prompt(prompt: str) -> str:
@@ -108,155 +242,653 @@ def _cache_key(prompt: str, recursion_limit: int) -> str:
 
 
 def _cache_get(key: str):
+    response = _RESPONSE_CACHE.get(key)
+    if not response:
+        return None
+    # Entries may come from another worker or an earlier deploy; point them
+    # at this process's workspace directory.
+    response["project"] = _cached_workspace(response)
+    if response["project"]:
+        MANIFEST.touch(os.path.basename(response["project"]))
+    return response
+
+
+_SEMANTIC_CACHE_ENABLED = _env_flag("SEMANTIC_CACHE_ENABLED", "1")
+_SEMANTIC_INDEX = SemanticIndex(
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.8")),
+    max_entries=max(10, int(os.getenv("GENERATION_CACHE_MAX", "200"))),
+)
+_SEMANTIC_SYNC_INTERVAL_SECONDS = 5.0
+_semantic_synced_at = 0.0
+_semantic_synced_until = 0.0
+_SEMANTIC_SYNC_LOCK = Lock()
+
+
+def _sync_semantic_index():
+    """Pull prompts cached by other workers into this process's index."""
+    global _semantic_synced_at, _semantic_synced_until
     now = time.time()
-    with _RESPONSE_CACHE_LOCK:
-        item = _RESPONSE_CACHE.get(key)
-        if not item:
-            return None
-        if now > item["expires_at"]:
-            _RESPONSE_CACHE.pop(key, None)
-            return None
+    if now - _semantic_synced_at < _SEMANTIC_SYNC_INTERVAL_SECONDS:
+        return
+    with _SEMANTIC_SYNC_LOCK:
+        if now - _semantic_synced_at < _SEMANTIC_SYNC_INTERVAL_SECONDS:
+            return
+        _semantic_synced_at = now
+        for key, prompt, created_at in _RESPONSE_CACHE.entries(since=_semantic_synced_until):
+            _SEMANTIC_INDEX.add(key, prompt)
+            _semantic_synced_until = max(_semantic_synced_until, created_at)
+
+
+def _lookup_cached(req: AgentRequest, key: str):
+    """Exact cache hit first, then the closest paraphrase of a cached prompt."""
+    cached = _cache_get(key)
+    if cached and req.use_templates is False and cached.get("template"):
+        # The caller explicitly asked for an LLM-built app.
+        cached = None
+    if cached:
+        cached["cached"] = True
+        return cached
 
-        response = item["response"]
-        project_folder = response.get("project")
-        index_file = os.path.join(project_folder, "index.html") if project_folder else None
-        if project_folder and os.path.exists(project_folder) and index_file and os.path.exists(index_file):
-            return dict(response)
+    if not _SEMANTIC_CACHE_ENABLED:
+        return None
 
-        _RESPONSE_CACHE.pop(key, None)
+    _sync_semantic_index()
+    # Only entries generated with the same parameters as the exact key:
+    # an indexed prompt's key must be what this request would produce for it.
+    match = _SEMANTIC_INDEX.lookup(
+        _normalize_prompt(req.prompt),
+        accept=lambda cached_key, cached_prompt: _cache_key(cached_prompt, req.recursion_limit) == cached_key,
+    )
+    if not match:
+        return None
+
+    similar_key, similar_prompt, similarity = match
+    cached = _cache_get(similar_key)
+    if not cached:
+        _SEMANTIC_INDEX.remove(similar_key)
+        return None
+    if req.use_templates is False and cached.get("template"):
+        return None
+
+    cached["cached"] = True
+    cached["similar_prompt"] = similar_prompt
+    cached["similarity"] = round(similarity, 3)
+    return cached
+
+
+def _workspace_size(project_folder: str) -> int:
+    entry = MANIFEST.get(os.path.basename(project_folder))
+    if entry:
+        return size_bytes(entry)
+    total = 0
+    for root, _, files in os.walk(project_folder):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+def _cache_set(key: str, response: dict, prompt: str = ""):
+    project_folder = _cached_workspace(response)
+    size_bytes = _workspace_size(project_folder) if project_folder else 0
+    normalized = _normalize_prompt(prompt)
+    _RESPONSE_CACHE.set(key, response, prompt=normalized, size_bytes=size_bytes)
+    _SEMANTIC_INDEX.add(key, normalized)
+
+
+def _job_workspace(job: Job):
+    """The job's own workspace, if the manifest shows an index.html in it."""
+    entry = MANIFEST.get(job.id)
+    if not entry or entry["job_id"] != job.id or "index.html" not in entry["files"]:
+        return None
+    return os.path.join(WORKSPACES_DIR, job.id)
+
+
+def _check_recursion_limit(recursion_limit: int):
+    if recursion_limit > 25:
+        raise HTTPException(status_code=400, detail="Recursion limit too high (max: 25)")
+    if recursion_limit < 1:
+        raise HTTPException(status_code=400, detail="Recursion limit must be at least 1")
+
+
+def _llm_error_response():
+    llm_ready, model_name, llm_error = get_llm_status()
+    if llm_ready:
         return None
+    return {
+        "error": (
+            f"LLM init failed for model '{model_name}'. "
+            "Set valid GROQ_API_KEY and confirm outbound network access from the backend host. "
+            f"Details: {llm_error}"
+        )
+    }
+
+
+def _build_generation_response(result: dict, project_folder: str):
+    plan = result.get("plan")
+    if not plan and result.get("task_plan"):
+        plan = getattr(result["task_plan"], "plan", None)
+    if not plan and result.get("coder_state"):
+        task_plan = getattr(result["coder_state"], "task_plan", None)
+        plan = getattr(task_plan, "plan", None) if task_plan else None
+
+    if not plan or not getattr(plan, "files", None):
+        return {"error": "Failed to generate project"}
+
+    coder_state = result.get("coder_state")
+    failed_files = getattr(coder_state, "failed_files", []) if coder_state else []
+
+    project_response = _build_project_response(project_folder)
+
+    if not project_response:
+        base_error = "Runnable app was not created (missing index.html)."
+        if failed_files:
+            base_error = (
+                "LLM/API generation failed for one or more files. "
+                "Check GROQ_API_KEY, model access, and outbound network from the backend host."
+            )
+        return {
+            "error": base_error,
+            "failed_files": failed_files,
+        }
+
+    if failed_files:
+        project_response["warning"] = "Some files failed during generation."
+        project_response["failed_files"] = failed_files
+
+    return project_response
 
 
-def _cache_set(key: str, response: dict):
-    with _RESPONSE_CACHE_LOCK:
-        if len(_RESPONSE_CACHE) >= _RESPONSE_CACHE_MAX:
-            oldest_key = next(iter(_RESPONSE_CACHE))
-            _RESPONSE_CACHE.pop(oldest_key, None)
-        _RESPONSE_CACHE[key] = {
-            "response": dict(response),
-            "expires_at": time.time() + _RESPONSE_CACHE_TTL_SECONDS,
+def _summarize_update(node: str, update) -> dict:
+    """Reduce a LangGraph node update to JSON-safe progress fields."""
+    if not isinstance(update, dict):
+        return {}
+
+    if node == "planner" and update.get("plan"):
+        plan = update["plan"]
+        return {"name": plan.name, "files": [file.path for file in plan.files]}
+
+    if node == "architect" and update.get("task_plan"):
+        steps = update["task_plan"].implementation_steps
+        return {"files": [step.filepath for step in steps]}
+
+    if node == "blueprint" and update.get("task_plan"):
+        plan = update["plan"]
+        steps = update["task_plan"].implementation_steps
+        return {"name": plan.name, "files": [step.filepath for step in steps]}
+
+    if node == "coder" and update.get("coder_state"):
+        coder_state = update["coder_state"]
+        return {
+            "status": update.get("status"),
+            "completed": coder_state.current_step_idx,
+            "total": len(coder_state.task_plan.implementation_steps),
+            "created_files": list(coder_state.created_files),
+            "failed_files": list(coder_state.failed_files),
         }
 
+    return {}
 
-def _find_latest_workspace(since_time: float):
-    latest_path = None
-    latest_mtime = since_time
 
-    for name in os.listdir(WORKSPACES_DIR):
-        path = os.path.join(WORKSPACES_DIR, name)
-        if not os.path.isdir(path):
-            continue
+def _graph_config(job_id: str, recursion_limit: int, deadline: float | None = None) -> dict:
+    # The project id doubles as the checkpoint thread, so a job can be
+    # resumed even after the process that started it has gone away.
+    configurable = {"thread_id": job_id}
+    if deadline is not None:
+        # LLM calls shorten their timeouts to what is left of the job's budget.
+        configurable["deadline"] = deadline
+    return {"recursion_limit": recursion_limit, "configurable": configurable}
 
-        index_file = os.path.join(path, "index.html")
-        if not os.path.exists(index_file):
-            continue
 
-        mtime = os.path.getmtime(path)
-        if mtime >= latest_mtime:
-            latest_mtime = mtime
-            latest_path = path
+def _run_generation(job: Job, prompt: str | None, recursion_limit: int, pipeline_mode: str | None = None):
+    """Run a job; a `prompt` of None resumes the job's last checkpoint."""
+    try:
+        _execute_generation(job, prompt, recursion_limit, pipeline_mode)
+    finally:
+        _after_generation(job)
 
-    return latest_path
 
-@app.post("/generate")
+async def _arun_generation(job: Job, prompt: str | None, recursion_limit: int,
+                           pipeline_mode: str | None = None):
+    """Event-loop counterpart of `_run_generation`."""
+    try:
+        await _aexecute_generation(job, prompt, recursion_limit, pipeline_mode)
+    finally:
+        _after_generation(job)
+
+
+def _after_generation(job: Job):
+    _JOBS.release(job)
+    if job.started_at is not None:
+        METRICS.observe(
+            "buildflow_generation_seconds",
+            (job.finished_at or time.time()) - job.started_at,
+            status=job.status,
+        )
+
+
+def _begin_generation(job: Job) -> bool:
+    if job.cancelled:
+        job.finish({"error": f"Generation cancelled ({job.cancel_reason})."}, error=job.cancel_reason)
+        return False
+
+    job.mark_running()
+    os.makedirs(os.path.join(WORKSPACES_DIR, job.id), exist_ok=True)
+    MANIFEST.register(job.id, job_id=job.id, status=job.status)
+    return True
+
+
+def _apply_stream_chunk(job: Job, mode: str, chunk, final_state: dict) -> tuple[dict, bool]:
+    """Publish one graph stream chunk; returns the latest state and whether to stop."""
+    if mode == "custom":
+        # Partial file output or timing spans; not a node boundary.
+        event_type = chunk.pop("type", "custom")
+        if event_type == "span":
+            job.add_span(chunk)
+        else:
+            job.publish(event_type, chunk)
+        return final_state, False
+    if mode == "values":
+        final_state = chunk
+    else:
+        for node, update in chunk.items():
+            job.publish("node", {"node": node, **_summarize_update(node, update)})
+
+    # Each chunk marks a node boundary: stop here rather than paying
+    # for further LLM calls nobody is waiting for.
+    if job.expired():
+        job.cancel("timeout")
+    return final_state, job.cancelled
+
+
+def _end_generation(job: Job, result: dict, error: str = ""):
+    """Record the workspace's final status before waking the job's waiters,
+    so their first preview requests already see it finished."""
+    MANIFEST.set_status(job.id, job.final_status(error))
+    job.finish(result, error=error)
+
+
+def _finish_generation(job: Job, prompt: str | None, final_state: dict):
+    if job.cancelled:
+        message = f"Generation cancelled ({job.cancel_reason})."
+        _end_generation(job, {"error": message}, error=message)
+        return
+
+    try:
+        project_folder = os.path.join(WORKSPACES_DIR, job.id)
+        response = _build_generation_response(final_state, project_folder)
+    except Exception as e:
+        _end_generation(job, {"error": str(e)}, error=str(e))
+        return
+
+    if response.get("error"):
+        _end_generation(job, response, error=response["error"])
+        return
+
+    precompress_workspace(job.id)
+    if job.key and prompt is not None:
+        _cache_set(job.key, response, prompt)
+    _end_generation(job, response)
+
+
+def _graph_input(job: Job, prompt: str, pipeline_mode: str | None) -> dict:
+    return {"user_prompt": prompt, "project_id": job.id, "pipeline_mode": pipeline_mode}
+
+
+def _execute_generation(job: Job, prompt: str | None, recursion_limit: int, pipeline_mode: str | None = None):
+    if not _begin_generation(job):
+        return
+
+    config = _graph_config(job.id, recursion_limit, job.deadline)
+    final_state = {}
+
+    try:
+        graph_input = None
+        if prompt is None:
+            final_state = agent.get_state(config).values or {}
+        else:
+            graph_input = _graph_input(job, prompt, pipeline_mode)
+
+        for mode, chunk in agent.stream(
+            graph_input,
+            config,
+            stream_mode=["updates", "values", "custom"],
+        ):
+            final_state, stop = _apply_stream_chunk(job, mode, chunk, final_state)
+            if stop:
+                break
+    except Exception as e:
+        _end_generation(job, {"error": str(e)}, error=str(e))
+        return
+
+    _finish_generation(job, prompt, final_state)
+
+
+async def _aexecute_generation(job: Job, prompt: str | None, recursion_limit: int,
+                               pipeline_mode: str | None = None):
+    if not _begin_generation(job):
+        return
+
+    config = _graph_config(job.id, recursion_limit, job.deadline)
+    final_state = {}
+
+    try:
+        graph_input = None
+        if prompt is None:
+            final_state = (await agent.aget_state(config)).values or {}
+        else:
+            graph_input = _graph_input(job, prompt, pipeline_mode)
+
+        async for mode, chunk in agent.astream(
+            graph_input,
+            config,
+            stream_mode=["updates", "values", "custom"],
+        ):
+            final_state, stop = _apply_stream_chunk(job, mode, chunk, final_state)
+            if stop:
+                break
+    except Exception as e:
+        await asyncio.to_thread(_end_generation, job, {"error": str(e)}, error=str(e))
+        return
+
+    # Building the response touches the disk and the SQLite cache; keep it off the loop.
+    await asyncio.to_thread(_finish_generation, job, prompt, final_state)
+
+
+_JOBS = JobStore(max_jobs=max(10, int(os.getenv("GENERATION_JOB_HISTORY", "500"))))
+# "async" runs generations as tasks on the event loop via the graph's async
+# nodes; "thread" keeps one worker thread per in-flight generation.
+_GENERATION_ASYNC = os.getenv("GENERATION_MODE", "async").strip().lower() != "thread"
+_POOL = (AsyncGenerationPool if _GENERATION_ASYNC else GenerationPool)(
+    workers=max(1, int(os.getenv("GENERATION_WORKERS", "128" if _GENERATION_ASYNC else "4"))),
+    queue_max=max(0, int(os.getenv("GENERATION_QUEUE_MAX", "16"))),
+)
+_RETRY_AFTER_SECONDS = max(1, int(os.getenv("GENERATION_RETRY_AFTER_SECONDS", "30")))
+_GENERATION_TIMEOUT_SECONDS = int(os.getenv("GENERATION_TIMEOUT_SECONDS", "180"))
+_SSE_KEEPALIVE_SECONDS = 15
+
+METRICS.histogram("buildflow_generation_seconds", "End-to-end generation job duration.")
+METRICS.gauge("buildflow_jobs_in_flight", "Generation jobs running or queued.", lambda: _POOL.in_flight)
+METRICS.gauge("buildflow_jobs_queued", "Generation jobs waiting for a worker.", lambda: _POOL.queue_depth)
+
+_WORKSPACE_GC = WorkspaceCollector(
+    protected=lambda: _RESPONSE_CACHE.live_projects() | _JOBS.active_ids(),
+    # Jobs on other workers are only visible through the manifest; past
+    # twice the generation timeout a "running" workspace is abandoned.
+    running_grace_seconds=2 * _GENERATION_TIMEOUT_SECONDS,
+    checkpointer=agent.checkpointer,
+)
+METRICS.gauge("buildflow_workspaces", "Workspaces on disk after the last GC pass.", lambda: _WORKSPACE_GC.workspaces)
+METRICS.gauge(
+    "buildflow_workspace_bytes",
+    "Bytes of workspace files after the last GC pass.",
+    lambda: _WORKSPACE_GC.workspace_bytes,
+)
+
+
+def _start_job(req: AgentRequest, key: str) -> tuple[Job, bool]:
+    """Start a generation, or join the one already running for the same key."""
+    job, coalesced = _JOBS.claim(
+        Job(uuid.uuid4().hex[:12], key, timeout_seconds=_GENERATION_TIMEOUT_SECONDS)
+    )
+    if coalesced:
+        return job, True
+
+    try:
+        _submit_job(job, req.prompt, req.recursion_limit, req.pipeline_mode)
+    except HTTPException:
+        _JOBS.discard(job)
+        raise
+    return job, False
+
+
+def _submit_job(job: Job, prompt: str | None, recursion_limit: int, pipeline_mode: str | None = None):
+    try:
+        _POOL.submit(
+            _arun_generation if _GENERATION_ASYNC else _run_generation,
+            job, prompt, recursion_limit, pipeline_mode,
+        )
+    except PoolSaturated as exc:
+        raise HTTPException(
+            status_code=503,
+            detail=str(exc),
+            headers={"Retry-After": str(_RETRY_AFTER_SECONDS)},
+        )
+
+
+_TEMPLATE_PACKS = load_template_packs()
+_TEMPLATE_FAST_PATH = _env_flag("TEMPLATE_FAST_PATH", "1")
+_TEMPLATE_MIN_CONFIDENCE = float(os.getenv("TEMPLATE_MIN_CONFIDENCE", "0.75"))
+_TEMPLATE_ENRICH = _env_flag("TEMPLATE_ENRICH", "0")
+
+
+def _render_template(req: AgentRequest):
+    """Write a template pack's files to a new workspace when the prompt
+    clearly asks for a known app type; blocking file and SQLite I/O."""
+    pack, confidence = classify_prompt(req.prompt, _TEMPLATE_PACKS)
+    if not pack or confidence < _TEMPLATE_MIN_CONFIDENCE:
+        return None
+
+    project_id = uuid.uuid4().hex[:12]
+    MANIFEST.register(project_id, status="running")
+    for filename, content in pack.render().items():
+        write_result = write_file.invoke({"path": f"{project_id}/{filename}", "content": content})
+        if write_result.startswith("Error writing file:"):
+            MANIFEST.set_status(project_id, "failed")
+            return None
+    precompress_workspace(project_id)
+    MANIFEST.set_status(project_id, "succeeded")
+
+    project_response = _build_project_response(os.path.join(WORKSPACES_DIR, project_id))
+    if not project_response:
+        return None
+    project_response["template"] = pack.name
+    project_response["confidence"] = round(confidence, 3)
+    return project_response
+
+
+async def _serve_template(req: AgentRequest, key: str):
+    """Materialize a template pack, keeping its disk work off the event loop."""
+    enabled = _TEMPLATE_FAST_PATH if req.use_templates is None else req.use_templates
+    if not enabled:
+        return None
+
+    project_response = await asyncio.to_thread(_render_template, req)
+    if not project_response:
+        return None
+
+    if _TEMPLATE_ENRICH and not _llm_error_response():
+        # Let the LLM build the full app in the background; its result is
+        # cached under the same key, so later requests get the richer version.
+        try:
+            job, _ = _start_job(req, key)
+            project_response["enrichment_job"] = job.id
+            return project_response
+        except HTTPException:
+            pass
+
+    await asyncio.to_thread(_cache_set, key, project_response, req.prompt)
+    return project_response
+
+
+def _job_links(job: Job) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of per-node and per-model timings."""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/routes")
+def routes():
+    """Model routing rules with the model each currently uses and recent per-model stats."""
+    return {"routes": get_route_stats()}
+
+
+@app.post("/jobs")
 @limiter.limit("5/minute")
-def generate_project(request: Request, req: AgentRequest):
-    if req.recursion_limit > 25:
-        raise HTTPException(status_code=400, detail="Recursion limit too high (max: 25)")
-    if req.recursion_limit < 1:
-        raise HTTPException(status_code=400, detail="Recursion limit must be at least 1")
+async def submit_job(request: Request, req: AgentRequest):
+    _check_recursion_limit(req.recursion_limit)
 
     key = _cache_key(req.prompt, req.recursion_limit)
-    cached = _cache_get(key)
+    cached = await asyncio.to_thread(_lookup_cached, req, key) or await _serve_template(req, key)
     if cached:
-        cached["cached"] = True
-        return cached
+        job = _JOBS.add(Job(uuid.uuid4().hex[:12], key))
+        job.finish(cached)
+        return _job_links(job)
 
-    llm_ready, model_name, llm_error = get_llm_status()
-    if not llm_ready:
-        return {
-            "error": (
-                f"LLM init failed for model '{model_name}'. "
-                "Set valid GROQ_API_KEY and confirm outbound network access from the backend host. "
-                f"Details: {llm_error}"
-            )
-        }
+    llm_error = _llm_error_response()
+    if llm_error:
+        return llm_error
 
-    project_id = uuid.uuid4().hex[:12]
-    project_folder = os.path.join(WORKSPACES_DIR, project_id)
-    os.makedirs(project_folder, exist_ok=True)
-
-    timeout_seconds = int(os.getenv("GENERATION_TIMEOUT_SECONDS", "180"))
-    request_started = time.time()
-    executor = ThreadPoolExecutor(max_workers=1)
-    future = executor.submit(
-        agent.invoke,
-        {"user_prompt": req.prompt, "project_id": project_id},
-        {"recursion_limit": req.recursion_limit}
-    )
+    job, coalesced = _start_job(req, key)
+    links = _job_links(job)
+    if coalesced:
+        links["coalesced"] = True
+    return links
 
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = _JOBS.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+
+@app.post("/jobs/{job_id}/resume")
+@limiter.limit("5/minute")
+async def resume_job(request: Request, job_id: str, req: ResumeRequest):
+    """Continue an interrupted job from its last completed graph step."""
+    _check_recursion_limit(req.recursion_limit)
+
+    previous = _JOBS.get(job_id)
+    if previous and not previous.done:
+        raise HTTPException(status_code=409, detail="Job is still running")
+
+    snapshot = await agent.aget_state(_graph_config(job_id, req.recursion_limit))
+    if not snapshot.values:
+        raise HTTPException(status_code=404, detail="No checkpoint found for job")
+    if not snapshot.next:
+        raise HTTPException(status_code=409, detail="Job already ran to completion; nothing to resume")
+
+    llm_error = _llm_error_response()
+    if llm_error:
+        return llm_error
+
+    job = Job(job_id, previous.key if previous else "", timeout_seconds=_GENERATION_TIMEOUT_SECONDS)
+    # Registered before it can run, so its events and status are never missed.
+    _JOBS.add(job)
     try:
-        result = future.result(timeout=timeout_seconds)
-        executor.shutdown(wait=False, cancel_futures=True)
-
-        plan = result.get("plan")
-        if not plan and result.get("task_plan"):
-            plan = getattr(result["task_plan"], "plan", None)
-        if not plan and result.get("coder_state"):
-            task_plan = getattr(result["coder_state"], "task_plan", None)
-            plan = getattr(task_plan, "plan", None) if task_plan else None
-
-        if not plan or not getattr(plan, "files", None):
-            return {"error": "Failed to generate project"}
-
-        coder_state = result.get("coder_state")
-        created_files = getattr(coder_state, "created_files", []) if coder_state else []
-        failed_files = getattr(coder_state, "failed_files", []) if coder_state else []
-
-        project_response = _build_project_response(project_folder)
-
-        if not project_response:
-            latest_workspace = _find_latest_workspace(request_started)
-            if latest_workspace:
-                project_response = _build_project_response(latest_workspace)
-
-        if not project_response:
-            base_error = "Runnable app was not created (missing index.html)."
-            if failed_files:
-                base_error = (
-                    "LLM/API generation failed for one or more files. "
-                    "Check GROQ_API_KEY, model access, and outbound network from the backend host."
-                )
-            return {
-                "error": base_error,
-                "failed_files": failed_files,
-            }
+        _submit_job(job, None, req.recursion_limit)
+    except HTTPException:
+        _JOBS.discard(job)
+        if previous:
+            _JOBS.add(previous)
+        raise
 
-        if failed_files:
-            project_response["warning"] = "Some files failed during generation."
-            project_response["failed_files"] = failed_files
-
-        _cache_set(key, project_response)
-        return project_response
-    
-    except FuturesTimeoutError:
-        future.cancel()
-        executor.shutdown(wait=False, cancel_futures=True)
-
-        latest_workspace = _find_latest_workspace(request_started)
-        if latest_workspace:
-            project_response = _build_project_response(latest_workspace)
-            if project_response:
-                project_response["warning"] = (
-                    f"Generation exceeded {timeout_seconds} seconds, "
-                    "but app files were created."
-                )
-                project_response["timed_out"] = True
-                _cache_set(key, project_response)
-                return project_response
-
-        return {"error": f"Execution timeout - request took longer than {timeout_seconds} seconds"}
-    
-    except Exception as e:
-        executor.shutdown(wait=False, cancel_futures=True)
-        return {"error": str(e)}
\ No newline at end of file
+    links = _job_links(job)
+    links["resumed_from"] = list(snapshot.next)
+    return links
+
+
+def _format_sse(event_id: int, event: dict) -> str:
+    payload = json.dumps(event["data"])
+    return f"id: {event_id}\nevent: {event['event']}\ndata: {payload}\n\n"
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    job = _JOBS.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    try:
+        start = int(request.headers.get("last-event-id", "-1")) + 1
+    except ValueError:
+        start = 0
+
+    async def event_source():
+        index = max(0, start)
+        while True:
+            pending, finished = await job.next_events(index, _SSE_KEEPALIVE_SECONDS)
+            for event in pending:
+                if event is not None:
+                    yield _format_sse(index, event)
+                index += 1
+            if finished and not pending:
+                yield _format_sse(index, {"event": "result", "data": job.snapshot()})
+                return
+            if not pending:
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _timed_out_response(job: Job, key: str, prompt: str, timeout_seconds: int) -> dict | None:
+    """Serve and cache what a timed-out job managed to write; blocking disk and SQLite I/O."""
+    job_workspace = _job_workspace(job)
+    if not job_workspace:
+        return None
+    project_response = _build_project_response(job_workspace)
+    if not project_response:
+        return None
+    project_response["warning"] = (
+        f"Generation exceeded {timeout_seconds} seconds, "
+        "but app files were created."
+    )
+    project_response["timed_out"] = True
+    _cache_set(key, project_response, prompt)
+    return project_response
+
+
+@app.post("/generate")
+@limiter.limit("5/minute")
+async def generate_project(request: Request, req: AgentRequest):
+    _check_recursion_limit(req.recursion_limit)
+
+    key = _cache_key(req.prompt, req.recursion_limit)
+    cached = await asyncio.to_thread(_lookup_cached, req, key) or await _serve_template(req, key)
+    if cached:
+        return cached
+
+    llm_error = _llm_error_response()
+    if llm_error:
+        return llm_error
+
+    timeout_seconds = _GENERATION_TIMEOUT_SECONDS
+    job, coalesced = _start_job(req, key)
+
+    if await job.wait(timeout_seconds):
+        if not job.result:
+            return {"error": job.error}
+        response = dict(job.result)
+        if coalesced and not job.error:
+            response["cached"] = True
+            response["coalesced"] = True
+        elif job.spans:
+            response["spans"] = list(job.spans)
+        return response
+
+    # Other requests may be sharing this job; they rely on its own deadline.
+    if not coalesced and job.followers == 0:
+        job.cancel("timeout")
+
+    partial_response = await asyncio.to_thread(_timed_out_response, job, key, req.prompt, timeout_seconds)
+    if partial_response:
+        return partial_response
+
+    return {"error": f"Execution timeout - request took longer than {timeout_seconds} seconds"}
@@ -0,0 +1,129 @@
+import os
+import uuid
+import zipfile
+from hashlib import sha256
+
+# Project zips are built on first download, streamed to the client as they
+# are compressed, and kept under ARCHIVE_CACHE_DIR keyed by a hash of the
+# workspace content, so repeat downloads are served straight from disk.
+ARCHIVE_CACHE_DIR = os.path.abspath(
+    os.getenv(
+        "ARCHIVE_CACHE_DIR",
+        os.path.join(
+            os.getenv("BUILDFLOW_STATE_DIR", os.path.join(os.path.dirname(__file__), ".state")),
+            "archives",
+        ),
+    )
+)
+ZIP_COMPRESSION_LEVEL = min(9, max(0, int(os.getenv("ZIP_COMPRESSION_LEVEL", "6"))))
+# Deflating a few hundred bytes saves less than its header costs.
+ZIP_STORE_BELOW_BYTES = max(0, int(os.getenv("ZIP_STORE_BELOW_BYTES", "512")))
+
+_BLOCK_SIZE = 64 * 1024
+_COMPRESSED_EXTENSIONS = frozenset({
+    ".br", ".gif", ".gz", ".jpeg", ".jpg", ".mp3", ".mp4", ".png", ".webm", ".webp",
+    ".woff", ".woff2", ".zip",
+})
+
+
+def workspace_paths(project_folder: str) -> list[str]:
+    """Relative paths of every file in a workspace, for workspaces the manifest does not know."""
+    paths = []
+    for root, _, files in os.walk(project_folder):
+        for name in files:
+            if name.endswith(".part"):
+                continue
+            full_path = os.path.join(root, name)
+            paths.append(os.path.relpath(full_path, project_folder).replace("\\", "/"))
+    return sorted(paths)
+
+
+def content_digest(project_folder: str, paths: list[str], blob_digests: dict[str, str] | None = None) -> str:
+    """Hash of the workspace's paths and bytes plus the zip settings.
+
+    Files with a known blob digest are hashed by that digest instead of
+    being read. Raises OSError if a file that must be read is missing.
+    """
+    blob_digests = blob_digests or {}
+    digest = sha256(f"zip|{ZIP_COMPRESSION_LEVEL}|{ZIP_STORE_BELOW_BYTES}".encode("utf-8"))
+    for path in sorted(paths):
+        digest.update(f"\0{path}\0".encode("utf-8"))
+        if path in blob_digests:
+            digest.update(blob_digests[path].encode("utf-8"))
+            continue
+        file_digest = sha256()
+        with open(os.path.join(project_folder, path), "rb") as f:
+            while block := f.read(_BLOCK_SIZE):
+                file_digest.update(block)
+        digest.update(file_digest.hexdigest().encode("utf-8"))
+    return digest.hexdigest()
+
+
+def cached_archive(digest: str) -> str | None:
+    path = os.path.join(ARCHIVE_CACHE_DIR, f"{digest}.zip")
+    return path if os.path.exists(path) else None
+
+
+def _compression(path: str, size: int) -> int:
+    if size < ZIP_STORE_BELOW_BYTES or ZIP_COMPRESSION_LEVEL == 0:
+        return zipfile.ZIP_STORED
+    if os.path.splitext(path)[1].lower() in _COMPRESSED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object collecting zip output between yields.
+
+    Without `seek`, zipfile writes each entry's sizes after its data, so the
+    archive can be sent while it is being built.
+    """
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._offset = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def stream_archive(project_folder: str, paths: list[str], digest: str):
+    """Yield a zip of the workspace, saving it under `digest` once complete."""
+    os.makedirs(ARCHIVE_CACHE_DIR, exist_ok=True)
+    final_path = os.path.join(ARCHIVE_CACHE_DIR, f"{digest}.zip")
+    tmp_path = f"{final_path}.{uuid.uuid4().hex[:8]}.part"
+    sink = _ChunkSink()
+    try:
+        with open(tmp_path, "wb") as cache_file:
+            with zipfile.ZipFile(sink, "w") as archive:
+                for path in sorted(paths):
+                    full_path = os.path.join(project_folder, path)
+                    archive.write(
+                        full_path,
+                        path,
+                        compress_type=_compression(path, os.path.getsize(full_path)),
+                        compresslevel=ZIP_COMPRESSION_LEVEL,
+                    )
+                    chunk = sink.drain()
+                    cache_file.write(chunk)
+                    yield chunk
+            chunk = sink.drain()
+            cache_file.write(chunk)
+        os.replace(tmp_path, final_path)
+        yield chunk
+    finally:
+        # Client went away or a file vanished mid-download: drop the partial zip.
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,148 @@
+"""
+Latency and output quality of the fused plan+tasks node against the staged
+planner -> architect path.
+
+Every request runs through the full graph once per pipeline mode, with
+isolated, throwaway workspace and state directories:
+
+    python -m backend.benchmarks.bench_fused --concurrency 1 8 --requests 16
+
+Offline runs use the fake provider, whose fixture latencies make the saved
+round-trip visible but say nothing about quality; pass --provider groq
+(GROQ_API_KEY set) to compare real outputs. Quality columns are averages
+per request:
+
+    files_ok     planned files that were written and are non-empty
+    coverage     planned files that received an implementation task
+    ids_ok       ids looked up by JS files that exist in the HTML files
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import uuid
+from threading import Lock
+
+from backend.benchmarks.bench_pipeline import _configure_environment
+
+_PROMPTS = [
+    "todo app with categories",
+    "calculator with history",
+    "pomodoro timer with sound",
+    "quiz game about planets",
+]
+_JS_IDS = re.compile(r"getElementById\(\s*['\"]([^'\"]+)['\"]")
+_HTML_IDS = re.compile(r"\bid\s*=\s*['\"]([^'\"]+)['\"]")
+
+
+def _read(path: str) -> str:
+    from backend.Agent.tools import safe_path
+
+    try:
+        with open(safe_path(path), "r", encoding="utf-8") as f:
+            return f.read()
+    except (OSError, ValueError):
+        return ""
+
+
+def _quality(result: dict) -> dict:
+    coder_state = result.get("coder_state")
+    task_plan = coder_state.task_plan if coder_state else None
+    plan = task_plan.plan if task_plan else None
+    if not plan or not plan.files:
+        return {"files_ok": 0.0, "coverage": 0.0, "ids_ok": 0.0}
+
+    planned = [os.path.normpath(file.path) for file in plan.files]
+    tasked = {os.path.normpath(step.filepath) for step in task_plan.implementation_steps}
+    contents = {path: _read(path) for path in planned}
+
+    html_ids = set()
+    js_ids = set()
+    for path, content in contents.items():
+        if path.endswith((".html", ".htm")):
+            html_ids.update(_HTML_IDS.findall(content))
+        elif path.endswith(".js"):
+            js_ids.update(_JS_IDS.findall(content))
+
+    return {
+        "files_ok": sum(1 for content in contents.values() if content.strip()) / len(planned),
+        "coverage": sum(1 for path in planned if path in tasked) / len(planned),
+        "ids_ok": len(js_ids & html_ids) / len(js_ids) if js_ids else 1.0,
+    }
+
+
+def bench_mode(mode: str, concurrency: int, total: int) -> dict:
+    from backend.Agent.graph import agent
+    from backend.benchmarks.harness import run_threaded
+
+    run_id = uuid.uuid4().hex[:6]
+    scores, lock = [], Lock()
+
+    def _one(i: int) -> bool:
+        project_id = f"fused-{mode}-{run_id}-{concurrency}-{i}"
+        result = agent.invoke(
+            {
+                "user_prompt": f"{_PROMPTS[i % len(_PROMPTS)]} {run_id} {i}",
+                "project_id": project_id,
+                "pipeline_mode": mode,
+            },
+            {"recursion_limit": 20, "configurable": {"thread_id": project_id}},
+        )
+        with lock:
+            scores.append(_quality(result))
+        coder_state = result.get("coder_state")
+        return bool(coder_state and coder_state.created_files and not coder_state.failed_files)
+
+    row = run_threaded(mode, _one, concurrency, total)
+    for column in ("files_ok", "coverage", "ids_ok"):
+        row[column] = round(sum(score[column] for score in scores) / max(1, len(scores)), 3)
+    return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the fused and staged planning pipelines")
+    parser.add_argument("--mode", nargs="+", choices=["staged", "fused"], default=["staged", "fused"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--requests", type=int, default=16, help="Requests per mode and concurrency level")
+    parser.add_argument("--provider", choices=["fake", "groq"], default="fake")
+    parser.add_argument("--latency-scale", type=float, default=0.1,
+                        help="Multiplier for the fixture latencies (1.0 = recorded Groq timings)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Latency spread as a fraction of the base")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write result rows to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary workspace directory")
+    args = parser.parse_args(argv)
+    args.generation_mode = "thread"
+    args.with_caches = False
+
+    workdir = tempfile.mkdtemp(prefix="buildflow-bench-")
+    _configure_environment(args, workdir)
+    os.environ["LLM_PROVIDER"] = args.provider
+
+    from backend.benchmarks.harness import format_table
+
+    rows = []
+    try:
+        for concurrency in args.concurrency:
+            for mode in args.mode:
+                row = bench_mode(mode, concurrency, args.requests)
+                rows.append(row)
+                print(json.dumps(row), file=sys.stderr)
+    finally:
+        if args.keep:
+            print(f"Workspaces kept in {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(format_table(rows))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
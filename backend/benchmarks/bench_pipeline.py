@@ -0,0 +1,149 @@
+"""
+End-to-end latency benchmark for the agent graph and the /generate endpoint.
+
+Runs fully offline against the fake LLM provider with isolated, throwaway
+workspace and state directories:
+
+    python -m backend.benchmarks.bench_pipeline --concurrency 1 4 16 --requests 32
+
+Fake latencies come from backend/Agent/fixtures/fake_llm.json and are
+multiplied by --latency-scale; --json writes the rows for CI to compare.
+The api target needs httpx installed.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+
+
+def _configure_environment(args, workdir: str):
+    # Must run before the backend modules are imported: they read their
+    # configuration at import time.
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_SCALE"] = str(args.latency_scale)
+    os.environ["FAKE_LLM_JITTER"] = str(args.jitter)
+    os.environ["FAKE_LLM_SEED"] = str(args.seed)
+    os.environ["BUILDFLOW_WORKSPACES_DIR"] = os.path.join(workdir, "workspaces")
+    os.environ["BUILDFLOW_STATE_DIR"] = os.path.join(workdir, "state")
+    os.environ["STAGE_CACHE_DIR"] = os.path.join(workdir, "state", "stages")
+    os.environ["GRAPH_CHECKPOINT_PATH"] = os.path.join(workdir, "state", "checkpoints.sqlite3")
+    os.environ["GENERATION_CACHE_BACKEND"] = "memory"
+    os.environ["GENERATION_WORKERS"] = str(max(args.concurrency))
+    os.environ["GENERATION_QUEUE_MAX"] = str(args.requests)
+    os.environ["GENERATION_MODE"] = args.generation_mode
+    # Every request should pay for the full pipeline unless asked otherwise.
+    if not args.with_caches:
+        os.environ["STAGE_CACHE_ENABLED"] = "0"
+        os.environ["SEMANTIC_CACHE_ENABLED"] = "0"
+        os.environ["TEMPLATE_FAST_PATH"] = "0"
+
+
+def bench_graph(concurrency: int, total: int) -> dict:
+    from backend.Agent.graph import agent
+    from backend.benchmarks.harness import run_threaded
+
+    run_id = uuid.uuid4().hex[:6]
+
+    def _one(i: int) -> bool:
+        project_id = f"bench-{run_id}-{concurrency}-{i}"
+        result = agent.invoke(
+            {"user_prompt": f"benchmark todo app {run_id} {concurrency} {i}", "project_id": project_id},
+            {"recursion_limit": 20, "configurable": {"thread_id": project_id}},
+        )
+        coder_state = result.get("coder_state")
+        return bool(coder_state and coder_state.created_files and not coder_state.failed_files)
+
+    return run_threaded("graph", _one, concurrency, total)
+
+
+def bench_graph_async(concurrency: int, total: int) -> dict:
+    from backend.Agent.graph import agent
+    from backend.benchmarks.harness import run_async
+
+    run_id = uuid.uuid4().hex[:6]
+
+    async def _one(i: int) -> bool:
+        project_id = f"bench-async-{run_id}-{concurrency}-{i}"
+        result = await agent.ainvoke(
+            {"user_prompt": f"benchmark todo app {run_id} {concurrency} {i}", "project_id": project_id},
+            {"recursion_limit": 20, "configurable": {"thread_id": project_id}},
+        )
+        coder_state = result.get("coder_state")
+        return bool(coder_state and coder_state.created_files and not coder_state.failed_files)
+
+    return run_async("graph-async", _one, concurrency, total)
+
+
+def bench_api(concurrency: int, total: int) -> dict:
+    import httpx
+
+    from backend import api
+    from backend.benchmarks.harness import run_async
+
+    api.limiter.enabled = False
+    run_id = uuid.uuid4().hex[:6]
+    client = None
+
+    async def _one(i: int) -> bool:
+        nonlocal client
+        if client is None:
+            client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=api.app), base_url="http://bench", timeout=None
+            )
+        response = await client.post(
+            "/generate", json={"prompt": f"benchmark todo app {run_id} {concurrency} {i}"}
+        )
+        return response.status_code == 200 and "error" not in response.json()
+
+    return run_async("api", _one, concurrency, total)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the generation pipeline offline")
+    parser.add_argument("--target", nargs="+", choices=["graph", "graph-async", "api"],
+                        default=["graph", "api"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=16, help="Requests per concurrency level")
+    parser.add_argument("--latency-scale", type=float, default=0.1,
+                        help="Multiplier for the fixture latencies (1.0 = recorded Groq timings)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Latency spread as a fraction of the base")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--generation-mode", choices=["async", "thread"], default="async",
+                        help="How the api target runs generations (GENERATION_MODE)")
+    parser.add_argument("--with-caches", action="store_true",
+                        help="Leave stage, semantic and template caches enabled")
+    parser.add_argument("--json", help="Write result rows to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary workspace directory")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="buildflow-bench-")
+    _configure_environment(args, workdir)
+
+    from backend.benchmarks.harness import format_table
+
+    runners = {"graph": bench_graph, "graph-async": bench_graph_async, "api": bench_api}
+    rows = []
+    try:
+        for target in args.target:
+            for concurrency in args.concurrency:
+                row = runners[target](concurrency, args.requests)
+                rows.append(row)
+                print(json.dumps(row), file=sys.stderr)
+    finally:
+        if args.keep:
+            print(f"Workspaces kept in {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(format_table(rows))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Prefix-cache hit ratio of the planner, architect and coder prompts.
+
+Inference providers that cache prompts (Groq included) only reuse the
+leading run of tokens that is identical to an earlier request, in fixed
+size blocks. This replays a mix of generated requests through the prompt
+builders and a simulated block-wise prefix cache, for the current layout
+and for the previous one that put per-request data ahead of the
+instructions and schemas:
+
+    python -m backend.benchmarks.bench_prefix --requests 50 --block-tokens 128
+
+Runs offline; plans and files come from backend/Agent/fixtures/fake_llm.json.
+"""
+
+import argparse
+import json
+import sys
+import time
+from hashlib import sha256
+
+from backend.Agent.context import build_coder_context
+from backend.Agent.llm import DEFAULT_FIXTURES
+from backend.Agent.prompts import architect_prompt, coder_system_prompt, planner_prompt
+from backend.Agent.states import Plan, TaskPlan
+from backend.benchmarks.harness import format_table
+
+_APPS = [
+    ("todo app", "Todo List"), ("calculator", "Calculator"), ("weather dashboard", "Weather"),
+    ("pomodoro timer", "Pomodoro"), ("expense tracker", "Expenses"), ("quiz game", "Quiz"),
+    ("notes app", "Notes"), ("kanban board", "Kanban"),
+]
+_STYLES = ["colourful", "minimal", "dark mode", "responsive", "playful", "modern"]
+
+
+class PrefixCache:
+    """Simulated provider cache: a prompt hits for every leading block that
+    some earlier prompt started with."""
+
+    def __init__(self, block_tokens: int):
+        self.block_chars = block_tokens * 4
+        self._seen: set[bytes] = set()
+
+    def lookup(self, text: str) -> int:
+        """Return the number of cached characters and remember the prompt."""
+        digest = sha256()
+        hit, matching = 0, True
+        for start in range(0, len(text) - self.block_chars + 1, self.block_chars):
+            digest.update(text[start:start + self.block_chars].encode("utf-8"))
+            key = digest.digest()
+            if matching and key in self._seen:
+                hit += self.block_chars
+            else:
+                matching = False
+                self._seen.add(key)
+        return hit
+
+
+def _serialize(messages) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+
+
+# Layout used before prompts were split into a static prefix and a
+# per-request suffix; kept here as the baseline.
+
+def _legacy_planner_prompt(user_prompt: str) -> str:
+    schema = json.dumps(Plan.model_json_schema(), indent=2)
+    return f"""
+Create a structured plan for a modern web app based on the user request.
+
+User Request: {user_prompt}
+
+Return ONLY valid JSON matching this schema:
+{schema}
+
+For files, use simple relative paths like "index.html", "style.css", "script.js". Do not include project folders in paths.
+Techstack should be "html, css, javascript" for simple web apps.
+Keep it concise. Return JSON only. No explanation.
+"""
+
+
+def _legacy_architect_prompt(plan: Plan) -> str:
+    schema = json.dumps(TaskPlan.model_json_schema(), indent=2)
+    return f"""
+You are the ARCHITECT agent.
+
+Create one implementation task per file in the project plan.
+Order the tasks based on dependencies (e.g., HTML before JS).
+For each task:
+- filepath: exact from plan.files.path
+- task_description: detailed instructions on what to implement in that file, based on the plan features and description.
+- dependencies: list of other filepaths this task depends on (e.g., JS depends on HTML).
+
+Project Plan: {plan.model_dump_json(indent=2)}
+
+Return ONLY valid JSON matching this schema:
+{schema}
+Return JSON only. No explanation.
+"""
+
+
+def _legacy_coder_prompt(plan: Plan, task, dep_contents: dict[str, str]) -> list[dict]:
+    user_content = f"""
+Project Plan: {plan.model_dump_json()}
+
+Task: {task.task_description}
+"""
+    if dep_contents:
+        user_content += "\nDependency files:\n"
+        for path, cont in dep_contents.items():
+            user_content += f"\n--- {path} ---\n{cont}\n"
+    user_content += f"\nReturn ONLY the full file content for {task.filepath}. No markdown. No explanation."
+    return [{"role": "system", "content": coder_system_prompt()}, {"role": "user", "content": user_content}]
+
+
+def _current_coder_prompt(plan: Plan, task, dep_contents: dict[str, str]) -> list[dict]:
+    user_content, _ = build_coder_context(plan, task, dep_contents)
+    return [{"role": "system", "content": coder_system_prompt()}, {"role": "user", "content": user_content}]
+
+
+_LAYOUTS = {
+    "legacy": (_legacy_planner_prompt, _legacy_architect_prompt, _legacy_coder_prompt),
+    "current": (planner_prompt, architect_prompt, _current_coder_prompt),
+}
+
+
+def _requests(total: int, fixtures: dict):
+    """Yield (user_prompt, plan, task_plan, file_contents) for varied apps."""
+    responses = fixtures["responses"]
+    by_ext = responses["coder"]
+    for i in range(total):
+        app, title = _APPS[i % len(_APPS)]
+        style = _STYLES[(i // len(_APPS)) % len(_STYLES)]
+        project_id = f"bench{i:04d}"
+
+        plan_data = json.loads(json.dumps(responses["planner"]))
+        plan_data["name"] = f"{title} {i}"
+        plan_data["description"] = f"A {style} {app}"
+        plan = Plan(**plan_data)
+        for file in plan.files:
+            file.path = f"{project_id}/{file.path}"
+
+        task_plan = TaskPlan(**responses["architect"])
+        for step in task_plan.implementation_steps:
+            step.filepath = f"{project_id}/{step.filepath}"
+            step.dependencies = [f"{project_id}/{dep}" for dep in step.dependencies]
+
+        contents = {
+            file.path: by_ext.get(file.path.rsplit(".", 1)[-1], "") for file in plan.files
+        }
+        yield f"Build a {style} {app} in html css and js", plan, task_plan, contents
+
+
+def run(layout: str, total: int, block_tokens: int, fixtures: dict) -> list[dict]:
+    build_planner, build_architect, build_coder = _LAYOUTS[layout]
+    cache = PrefixCache(block_tokens)
+    stats = {stage: {"prompts": 0, "chars": 0, "hit_chars": 0, "build_s": 0.0}
+             for stage in ("planner", "architect", "coder")}
+
+    def _record(stage: str, build, *args):
+        started = time.perf_counter()
+        text = _serialize(build(*args))
+        stats[stage]["build_s"] += time.perf_counter() - started
+        stats[stage]["prompts"] += 1
+        stats[stage]["chars"] += len(text)
+        stats[stage]["hit_chars"] += cache.lookup(text)
+
+    for user_prompt, plan, task_plan, contents in _requests(total, fixtures):
+        _record("planner", build_planner, user_prompt)
+        _record("architect", build_architect, plan)
+        for step in task_plan.implementation_steps:
+            deps = {dep: contents[dep] for dep in step.dependencies if dep in contents}
+            _record("coder", build_coder, plan, step, deps)
+
+    rows = []
+    for stage, stage_stats in stats.items():
+        prompts = stage_stats["prompts"]
+        rows.append({
+            "layout": layout,
+            "stage": stage,
+            "prompts": prompts,
+            # Same chars-per-token estimate as the coder context budget.
+            "avg_tokens": round(stage_stats["chars"] / max(1, prompts) / 4),
+            "hit_ratio": round(stage_stats["hit_chars"] / max(1, stage_stats["chars"]), 3),
+            "build_us": round(stage_stats["build_s"] / max(1, prompts) * 1e6, 1),
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate provider prefix-cache hits for the graph prompts")
+    parser.add_argument("--requests", type=int, default=50, help="Generations to replay")
+    parser.add_argument("--block-tokens", type=int, default=128,
+                        help="Cache granularity in (estimated) tokens")
+    parser.add_argument("--layout", nargs="+", choices=sorted(_LAYOUTS), default=["legacy", "current"])
+    parser.add_argument("--json", help="Write result rows to this file")
+    args = parser.parse_args(argv)
+
+    with open(DEFAULT_FIXTURES, "r", encoding="utf-8") as f:
+        fixtures = json.load(f)
+
+    rows = []
+    for layout in args.layout:
+        rows.extend(run(layout, args.requests, args.block_tokens, fixtures))
+        print(json.dumps(rows[-1]), file=sys.stderr)
+
+    print(format_table(rows))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
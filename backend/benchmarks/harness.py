@@ -0,0 +1,143 @@
+import asyncio
+import math
+import os
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty sample."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def rss_bytes() -> int:
+    """Current resident set size, falling back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux and bytes on macOS; either is good enough here.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ResourceSampler:
+    """Samples thread count and RSS in the background while a benchmark runs."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bench-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_threads = max(self.peak_threads, threading.active_count() - 1)
+            self.peak_rss = max(self.peak_rss, rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def summarize(target: str, concurrency: int, latencies: list[float], errors: int,
+              wall_seconds: float, sampler: ResourceSampler, rss_before: int) -> dict:
+    completed = len(latencies)
+    return {
+        "target": target,
+        "concurrency": concurrency,
+        "requests": completed + errors,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "throughput_rps": round(completed / wall_seconds, 3) if wall_seconds else 0.0,
+        "peak_threads": sampler.peak_threads,
+        "rss_mb": round(sampler.peak_rss / 2**20, 1),
+        "rss_growth_mb": round((sampler.peak_rss - rss_before) / 2**20, 1),
+    }
+
+
+def run_threaded(target: str, fn, concurrency: int, total: int) -> dict:
+    """Call `fn(i)` `total` times from `concurrency` threads; `fn` returns True on success."""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def _timed(i: int):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            ok = fn(i)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    rss_before = rss_bytes()
+    with ResourceSampler() as sampler:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as executor:
+            list(executor.map(_timed, range(total)))
+        wall = time.perf_counter() - started
+    return summarize(target, concurrency, latencies, errors, wall, sampler, rss_before)
+
+
+def run_async(target: str, coro_fn, concurrency: int, total: int) -> dict:
+    """Await `coro_fn(i)` `total` times with at most `concurrency` in flight."""
+    latencies, errors = [], 0
+
+    async def _main():
+        nonlocal errors
+        gate = asyncio.Semaphore(concurrency)
+
+        async def _timed(i: int):
+            nonlocal errors
+            async with gate:
+                started = time.perf_counter()
+                try:
+                    ok = await coro_fn(i)
+                except Exception:
+                    ok = False
+                elapsed = time.perf_counter() - started
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+        await asyncio.gather(*(_timed(i) for i in range(total)))
+
+    rss_before = rss_bytes()
+    with ResourceSampler() as sampler:
+        started = time.perf_counter()
+        asyncio.run(_main())
+        wall = time.perf_counter() - started
+    return summarize(target, concurrency, latencies, errors, wall, sampler, rss_before)
+
+
+def format_table(rows: list[dict]) -> str:
+    if not rows:
+        return ""
+    columns = list(rows[0].keys())
+    widths = {col: max(len(col), *(len(str(row[col])) for row in rows)) for col in columns}
+    lines = ["  ".join(col.ljust(widths[col]) for col in columns)]
+    for row in rows:
+        lines.append("  ".join(str(row[col]).ljust(widths[col]) for col in columns))
+    return os.linesep.join(lines)
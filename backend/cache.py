@@ -0,0 +1,222 @@
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Lock, local
+
+
+class GenerationCache(ABC):
+    """Maps a prompt cache key to a finished generation response.
+
+    `is_valid` receives a cached response and returns False once its
+    workspace has disappeared, in which case the entry is dropped.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, is_valid=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._is_valid = is_valid or (lambda response: True)
+
+    @abstractmethod
+    def get(self, key: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, response: dict, prompt: str = "", size_bytes: int = 0):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def entries(self, since: float = 0.0) -> list[tuple[str, str, float]]:
+        """Return (key, prompt, created_at) for live entries created after `since`."""
+
+    @abstractmethod
+    def live_projects(self) -> frozenset[str]:
+        """Project ids of workspaces that unexpired entries point at."""
+
+
+class MemoryCache(GenerationCache):
+    """Per-process LRU cache; entries are lost on restart."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int, is_valid=None):
+        super().__init__(max_entries, ttl_seconds, is_valid)
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            item = self._entries.get(key)
+            if not item:
+                return None
+            if now > item["expires_at"] or not self._is_valid(item["response"]):
+                self._entries.pop(key, None)
+                return None
+
+            self._entries.move_to_end(key)
+            item["hits"] += 1
+            return dict(item["response"])
+
+    def set(self, key: str, response: dict, prompt: str = "", size_bytes: int = 0):
+        with self._lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+            self._entries[key] = {
+                "response": dict(response),
+                "prompt": prompt,
+                "size_bytes": size_bytes,
+                "hits": 0,
+                "created_at": time.time(),
+                "expires_at": time.time() + self.ttl_seconds,
+            }
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def entries(self, since: float = 0.0) -> list[tuple[str, str, float]]:
+        now = time.time()
+        with self._lock:
+            return [
+                (key, item["prompt"], item["created_at"])
+                for key, item in self._entries.items()
+                if item["created_at"] > since and item["expires_at"] >= now
+            ]
+
+    def live_projects(self) -> frozenset[str]:
+        now = time.time()
+        with self._lock:
+            return frozenset(
+                os.path.basename(item["response"].get("project") or "")
+                for item in self._entries.values()
+                if item["expires_at"] >= now
+            ) - {""}
+
+
+class SQLiteCache(GenerationCache):
+    """LRU + TTL cache in a SQLite file shared by every worker process."""
+
+    _SCHEMA = """
+CREATE TABLE IF NOT EXISTS generation_cache (
+    key TEXT PRIMARY KEY,
+    prompt TEXT NOT NULL DEFAULT '',
+    project_id TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    size_bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS generation_cache_last_access ON generation_cache (last_access);
+"""
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: int, is_valid=None):
+        super().__init__(max_entries, ttl_seconds, is_valid)
+        self.path = path
+        self._local = local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(self._SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections must not cross threads; keep one per thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> dict | None:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT response, expires_at FROM generation_cache WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if not row:
+            return None
+
+        response = json.loads(row[0])
+        now = time.time()
+        if now > row[1] or not self._is_valid(response):
+            self.delete(key)
+            return None
+
+        conn.execute(
+            "UPDATE generation_cache SET hits = hits + 1, last_access = ? WHERE key = ?",
+            (now, key),
+        )
+        return response
+
+    def set(self, key: str, response: dict, prompt: str = "", size_bytes: int = 0):
+        now = time.time()
+        project_id = os.path.basename(response.get("project") or "")
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                """
+INSERT INTO generation_cache
+    (key, prompt, project_id, response, created_at, last_access, expires_at, hits, size_bytes)
+VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)
+ON CONFLICT(key) DO UPDATE SET
+    prompt = excluded.prompt,
+    project_id = excluded.project_id,
+    response = excluded.response,
+    created_at = excluded.created_at,
+    last_access = excluded.last_access,
+    expires_at = excluded.expires_at,
+    hits = 0,
+    size_bytes = excluded.size_bytes
+""",
+                (key, prompt, project_id, json.dumps(response), now, now,
+                 now + self.ttl_seconds, size_bytes),
+            )
+            conn.execute("DELETE FROM generation_cache WHERE expires_at < ?", (now,))
+            conn.execute(
+                """
+DELETE FROM generation_cache WHERE key IN (
+    SELECT key FROM generation_cache ORDER BY last_access ASC
+    LIMIT max(0, (SELECT COUNT(*) FROM generation_cache) - ?)
+)
+""",
+                (self.max_entries,),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, key: str):
+        self._connect().execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+
+    def entries(self, since: float = 0.0) -> list[tuple[str, str, float]]:
+        rows = self._connect().execute(
+            "SELECT key, prompt, created_at FROM generation_cache "
+            "WHERE created_at > ? AND expires_at >= ? ORDER BY created_at",
+            (since, time.time()),
+        ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def live_projects(self) -> frozenset[str]:
+        rows = self._connect().execute(
+            "SELECT DISTINCT project_id FROM generation_cache WHERE expires_at >= ?",
+            (time.time(),),
+        ).fetchall()
+        return frozenset(row[0] for row in rows if row[0])
+
+
+def create_cache(backend: str, path: str, max_entries: int, ttl_seconds: int, is_valid=None) -> GenerationCache:
+    if backend == "memory":
+        return MemoryCache(max_entries, ttl_seconds, is_valid)
+    if backend == "sqlite":
+        return SQLiteCache(path, max_entries, ttl_seconds, is_valid)
+    raise ValueError(f"Unknown generation cache backend '{backend}' (expected 'sqlite' or 'memory').")
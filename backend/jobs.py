@@ -0,0 +1,303 @@
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+_FINISHED_STATES = {JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED}
+
+
+class PoolSaturated(Exception):
+    """Raised when the generation pool has no free worker or queue slot."""
+
+
+class Job:
+    """A single generation run, observable from sync and async code."""
+
+    def __init__(self, job_id: str, key: str = "", timeout_seconds: float | None = None):
+        self.id = job_id
+        self.key = key
+        self.status = JOB_QUEUED
+        self.created_at = time.time()
+        self.timeout_seconds = timeout_seconds
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.result: dict | None = None
+        self.error = ""
+        self.events: list[dict | None] = []
+        self.spans: list[dict] = []
+        self.cancel_reason = ""
+        self.followers = 0
+        self._cancel_event = Event()
+        self._lock = Lock()
+        self._listeners: list[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    @property
+    def done(self) -> bool:
+        return self.status in _FINISHED_STATES
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self, reason: str):
+        """Ask the runner to stop at the next graph-node boundary."""
+        if self.done or self.cancelled:
+            return
+        self.cancel_reason = reason
+        self._cancel_event.set()
+        self.publish("cancel", {"reason": reason})
+
+    @property
+    def deadline(self) -> float | None:
+        """Wall-clock time the job must finish by, once it has started."""
+        if self.timeout_seconds is None or self.started_at is None:
+            return None
+        return self.started_at + self.timeout_seconds
+
+    def expired(self) -> bool:
+        deadline = self.deadline
+        return deadline is not None and time.time() > deadline
+
+    def publish(self, event_type: str, data: dict | None = None):
+        with self._lock:
+            self.events.append({"event": event_type, "data": data or {}, "at": time.time()})
+        self._notify()
+
+    def add_span(self, span: dict):
+        """Record a finished planner/architect/coder timing span."""
+        with self._lock:
+            self.spans.append(span)
+        self.publish("span", span)
+
+    def mark_running(self):
+        with self._lock:
+            self.status = JOB_RUNNING
+            self.started_at = time.time()
+        self.publish("status", {"status": JOB_RUNNING})
+
+    def final_status(self, error: str = "") -> str:
+        """The status `finish` will set for this error (or success)."""
+        if not error:
+            return JOB_SUCCEEDED
+        return JOB_CANCELLED if self.cancelled else JOB_FAILED
+
+    def finish(self, result: dict | None = None, error: str = ""):
+        status = self.final_status(error)
+        with self._lock:
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            # Streamed file text is only useful live; the files are on disk
+            # now. Slots stay, as None, so event ids do not shift.
+            self.events = [None if event and event["event"] == "file_chunk" else event for event in self.events]
+            self.events.append({"event": "status", "data": {"status": status}, "at": self.finished_at})
+            self.status = status
+        self._notify()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "id": self.id,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "result": dict(self.result) if self.result else None,
+                "error": self.error or None,
+                "spans": list(self.spans),
+            }
+
+    def _notify(self):
+        with self._lock:
+            listeners = list(self._listeners)
+        for loop, signal in listeners:
+            try:
+                loop.call_soon_threadsafe(signal.set)
+            except RuntimeError:
+                # The waiting loop has been closed; nothing left to wake.
+                pass
+
+    async def next_events(self, after: int, timeout: float) -> tuple[list[dict], bool]:
+        """Wait until events past index `after` exist, the job finishes, or `timeout` elapses.
+
+        Once the job has finished, its file_chunk events read as None.
+        """
+        loop = asyncio.get_running_loop()
+        signal = asyncio.Event()
+        with self._lock:
+            pending = self.events[after:]
+            finished = self.done
+            if pending or finished:
+                return pending, finished
+            self._listeners.append((loop, signal))
+
+        try:
+            await asyncio.wait_for(signal.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._listeners.remove((loop, signal))
+
+        with self._lock:
+            return self.events[after:], self.done
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait without holding a thread; returns True if the job finished in time."""
+        deadline = time.monotonic() + timeout
+        seen = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return self.done
+            pending, finished = await self.next_events(seen, remaining)
+            if finished:
+                return True
+            seen += len(pending)
+
+
+class JobStore:
+    """Process-local registry of recent jobs, trimming finished ones first."""
+
+    def __init__(self, max_jobs: int):
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._active_by_key: dict[str, Job] = {}
+        self._lock = Lock()
+        self._max_jobs = max_jobs
+
+    def add(self, job: Job) -> Job:
+        with self._lock:
+            self._jobs[job.id] = job
+            if len(self._jobs) > self._max_jobs:
+                for old_id in [jid for jid, old in self._jobs.items() if old.done]:
+                    if len(self._jobs) <= self._max_jobs:
+                        break
+                    self._jobs.pop(old_id, None)
+        return job
+
+    def claim(self, job: Job) -> tuple[Job, bool]:
+        """Register `job`, or return the live job already working on its key.
+
+        The second value is True when the caller was coalesced onto an
+        existing job and must not start `job` itself.
+        """
+        with self._lock:
+            leader = self._active_by_key.get(job.key) if job.key else None
+            if leader and not leader.done and not leader.cancelled:
+                leader.followers += 1
+                return leader, True
+            if job.key:
+                self._active_by_key[job.key] = job
+        return self.add(job), False
+
+    def discard(self, job: Job):
+        with self._lock:
+            self._jobs.pop(job.id, None)
+            if self._active_by_key.get(job.key) is job:
+                self._active_by_key.pop(job.key, None)
+
+    def release(self, job: Job):
+        """Stop routing new identical requests to a finished job."""
+        with self._lock:
+            if self._active_by_key.get(job.key) is job:
+                self._active_by_key.pop(job.key, None)
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_ids(self) -> set[str]:
+        """Ids of jobs that are queued or running."""
+        with self._lock:
+            return {job_id for job_id, job in self._jobs.items() if not job.done}
+
+
+class GenerationPool:
+    """Process-wide worker pool that rejects work once its queue is full."""
+
+    def __init__(self, workers: int, queue_max: int):
+        self.workers = workers
+        self.capacity = workers + queue_max
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="generation")
+        self._in_flight = 0
+        self._lock = Lock()
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        with self._lock:
+            return max(0, self._in_flight - self.workers)
+
+    def _reserve(self):
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                raise PoolSaturated(
+                    f"Generation queue is full ({self.capacity} jobs in flight)."
+                )
+            self._in_flight += 1
+
+    def submit(self, fn, *args):
+        self._reserve()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+
+class AsyncGenerationPool(GenerationPool):
+    """GenerationPool that runs coroutine functions as tasks on the caller's
+    event loop, so an in-flight generation costs a coroutine, not a thread.
+
+    `submit` must be called from the loop that should run the job.
+    """
+
+    def __init__(self, workers: int, queue_max: int):
+        self.workers = workers
+        self.capacity = workers + queue_max
+        self._in_flight = 0
+        self._lock = Lock()
+        self._tasks: set[asyncio.Task] = set()
+        self._semaphore: tuple[asyncio.AbstractEventLoop, asyncio.Semaphore] | None = None
+
+    def _loop_semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        # Semaphores bind to one loop; tests and scripts may run several in turn.
+        if self._semaphore is None or self._semaphore[0] is not loop:
+            self._semaphore = (loop, asyncio.Semaphore(self.workers))
+        return self._semaphore[1]
+
+    def submit(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        self._reserve()
+        semaphore = self._loop_semaphore(loop)
+
+        async def run():
+            try:
+                async with semaphore:
+                    await fn(*args)
+            finally:
+                self._release()
+
+        task = loop.create_task(run())
+        # The loop only keeps weak references to tasks.
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
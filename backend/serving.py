@@ -0,0 +1,144 @@
+import gzip
+import mimetypes
+import os
+
+from fastapi.responses import FileResponse, Response
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it only gzip copies are made.
+    brotli = None
+
+try:
+    from backend.Agent.blobs import BLOBS
+    from backend.Agent.manifest import MANIFEST
+    from backend.Agent.telemetry import METRICS
+except ModuleNotFoundError:
+    from Agent.blobs import BLOBS
+    from Agent.manifest import MANIFEST
+    from Agent.telemetry import METRICS
+
+# A finished workspace never changes, and its files are blobs named by
+# their sha256. They are served with that hash as the ETag, a year-long
+# immutable Cache-Control, and gzip/brotli copies compressed once when the
+# generation finishes. Workspaces still being written fall back to plain
+# StaticFiles.
+PRECOMPRESS_MIN_BYTES = max(0, int(os.getenv("PRECOMPRESS_MIN_BYTES", "256")))
+PRECOMPRESS_GZIP_LEVEL = min(9, max(1, int(os.getenv("PRECOMPRESS_GZIP_LEVEL", "9"))))
+PRECOMPRESS_BROTLI_QUALITY = min(11, max(0, int(os.getenv("PRECOMPRESS_BROTLI_QUALITY", "11"))))
+
+_FINISHED_STATUS = "succeeded"
+_IMMUTABLE = "public, max-age=31536000, immutable"
+_COMPRESSIBLE_EXTENSIONS = frozenset({
+    ".css", ".htm", ".html", ".js", ".json", ".map", ".mjs", ".svg", ".txt", ".xml",
+})
+
+METRICS.counter("buildflow_static_responses_total", "Finished-workspace file responses by status and encoding.")
+
+
+def _encoders() -> list[tuple[str, object]]:
+    encoders = [("gzip", lambda data: gzip.compress(data, compresslevel=PRECOMPRESS_GZIP_LEVEL, mtime=0))]
+    if brotli is not None:
+        encoders.append(("br", lambda data: brotli.compress(data, quality=PRECOMPRESS_BROTLI_QUALITY)))
+    return encoders
+
+
+def precompress_workspace(project_id: str) -> int:
+    """Write compressed copies of a workspace's text files; returns how many were written.
+
+    Copies belong to the blob, so a file shared by many workspaces is only
+    compressed once.
+    """
+    entry = MANIFEST.get(project_id)
+    if not entry:
+        return 0
+
+    written = 0
+    for path, digest in entry["digests"].items():
+        if os.path.splitext(path)[1].lower() not in _COMPRESSIBLE_EXTENSIONS:
+            continue
+        if entry["files"].get(path, 0) < PRECOMPRESS_MIN_BYTES:
+            continue
+        data = None
+        for encoding, compress in _encoders():
+            if os.path.exists(BLOBS.variant_path(digest, encoding)):
+                continue
+            if data is None:
+                try:
+                    with open(BLOBS.path(digest), "rb") as f:
+                        data = f.read()
+                except OSError:
+                    break
+            compressed = compress(data)
+            if len(compressed) < len(data):
+                BLOBS.put_variant(digest, encoding, compressed)
+                written += 1
+    return written
+
+
+def _accepts(accept_encoding: str, encoding: str) -> bool:
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        if name.strip().lower() != encoding:
+            continue
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def _etag_matches(if_none_match: str, digest: str) -> bool:
+    """Whether any listed ETag is one of this file's (any encoding)."""
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/").strip('"')
+        if tag.split("-", 1)[0] == digest:
+            return True
+    return False
+
+
+def finished_file_response(project_id: str, path: str, headers) -> Response | None:
+    """Serve one file of a finished workspace, or return None when the
+    caller should fall back to plain static serving."""
+    entry = MANIFEST.get(project_id)
+    if not entry or entry["status"] != _FINISHED_STATUS:
+        return None
+    digest = entry["digests"].get(path)
+    if not digest:
+        return None
+
+    file_path = BLOBS.path(digest)
+    encoding = "identity"
+    accept_encoding = headers.get("accept-encoding", "")
+    for candidate in ("br", "gzip"):
+        variant_path = BLOBS.variant_path(digest, candidate)
+        if _accepts(accept_encoding, candidate) and os.path.exists(variant_path):
+            file_path, encoding = variant_path, candidate
+            break
+
+    response_headers = {
+        # Each encoding is its own representation, hence its own ETag.
+        "ETag": f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"',
+        "Cache-Control": _IMMUTABLE,
+        "Vary": "Accept-Encoding",
+    }
+    if _etag_matches(headers.get("if-none-match", ""), digest):
+        METRICS.inc("buildflow_static_responses_total", status="304", encoding=encoding)
+        return Response(status_code=304, headers=response_headers)
+
+    if not os.path.exists(file_path):
+        return None
+    if encoding != "identity":
+        response_headers["Content-Encoding"] = encoding
+    METRICS.inc("buildflow_static_responses_total", status="200", encoding=encoding)
+    return FileResponse(
+        file_path,
+        media_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+        headers=response_headers,
+    )
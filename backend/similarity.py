@@ -0,0 +1,141 @@
+import re
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock
+
+
+# Words that carry no signal about which app is wanted. Paraphrases of the
+# same request mostly differ in these.
+STOPWORDS = frozenset(
+    """
+    a an the and or with for of to in on by at from as into using use
+    that this it its is are be can should will would please i me my we our you
+    your some any all also just very really
+    app apps application web website page site simple basic small little
+    create build make generate develop write give want need new
+    html css js javascript
+    """.split()
+)
+
+# Kept as tokens, and two prompts only match if they use the same ones:
+# "todo app without delete" must not be served "todo app with delete".
+NEGATIONS = frozenset({"no", "not", "without", "non", "never", "dont", "don", "except", "excluding"})
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def prompt_tokens(prompt: str) -> frozenset[str]:
+    """Content words of a prompt, lightly stemmed so plurals compare equal."""
+    tokens = set()
+    for token in _TOKEN_RE.findall(prompt.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.add(token)
+    return frozenset(tokens)
+
+
+def jaccard(left: frozenset[str], right: frozenset[str]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class SemanticIndex:
+    """MinHash/LSH index of cached prompts for near-duplicate lookups.
+
+    Signatures are bucketed into `bands` groups of `rows` hashes, so a
+    lookup only verifies the few entries sharing a bucket, and candidates
+    are then scored by exact Jaccard similarity of their token sets.
+    """
+
+    def __init__(self, threshold: float, max_entries: int, bands: int = 16, rows: int = 4):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bands = bands
+        self.rows = rows
+        # Fixed coefficients keep signatures identical across processes.
+        self._coefficients = [
+            (_token_hash(f"a{i}") % _MERSENNE_PRIME or 1, _token_hash(f"b{i}") % _MERSENNE_PRIME)
+            for i in range(bands * rows)
+        ]
+        self._entries: OrderedDict[str, tuple[str, frozenset[str], list[tuple]]] = OrderedDict()
+        self._buckets: dict[tuple, set[str]] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_keys(self, tokens: frozenset[str]) -> list[tuple]:
+        hashes = [_token_hash(token) for token in tokens]
+        signature = [
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._coefficients
+        ]
+        return [
+            (band, *signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+    def add(self, key: str, prompt: str):
+        tokens = prompt_tokens(prompt)
+        if not tokens:
+            return
+        band_keys = self._band_keys(tokens)
+        with self._lock:
+            self._remove_locked(key)
+            self._entries[key] = (prompt, tokens, band_keys)
+            for band_key in band_keys:
+                self._buckets.setdefault(band_key, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove_locked(next(iter(self._entries)))
+
+    def remove(self, key: str):
+        with self._lock:
+            self._remove_locked(key)
+
+    def _remove_locked(self, key: str):
+        entry = self._entries.pop(key, None)
+        if not entry:
+            return
+        for band_key in entry[2]:
+            bucket = self._buckets.get(band_key)
+            if bucket is None:
+                continue
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[band_key]
+
+    def lookup(self, prompt: str, accept=None) -> tuple[str, str, float] | None:
+        """Return (key, cached_prompt, similarity) of the best match above the threshold.
+
+        Candidates for which `accept(key, cached_prompt)` is False are skipped.
+        """
+        tokens = prompt_tokens(prompt)
+        if not tokens:
+            return None
+        band_keys = self._band_keys(tokens)
+        negations = tokens & NEGATIONS
+
+        best = None
+        with self._lock:
+            candidates = set()
+            for band_key in band_keys:
+                candidates.update(self._buckets.get(band_key, ()))
+            for key in candidates:
+                cached_prompt, cached_tokens, _ = self._entries[key]
+                if cached_tokens & NEGATIONS != negations:
+                    continue
+                if accept is not None and not accept(key, cached_prompt):
+                    continue
+                score = jaccard(tokens, cached_tokens)
+                if score >= self.threshold and (best is None or score > best[2]):
+                    best = (key, cached_prompt, score)
+        return best
@@ -0,0 +1,6 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const btn = document.getElementById('main-btn');
+    btn.addEventListener('click', function() {
+        alert('Hello from your web app!');
+    });
+});
@@ -0,0 +1,48 @@
+let todos = [];
+
+function addTodo() {
+    const input = document.getElementById('todo-input');
+    const text = input.value.trim();
+    if (text) {
+        todos.push({ id: Date.now(), text, completed: false });
+        input.value = '';
+        renderTodos();
+    }
+}
+
+function deleteTodo(id) {
+    todos = todos.filter(todo => todo.id !== id);
+    renderTodos();
+}
+
+function toggleTodo(id) {
+    todos = todos.map(todo => 
+        todo.id === id ? { ...todo, completed: !todo.completed } : todo
+    );
+    renderTodos();
+}
+
+function renderTodos() {
+    const list = document.getElementById('todo-list');
+    list.innerHTML = '';
+    todos.forEach(todo => {
+        const li = document.createElement('li');
+        li.className = `todo-item ${todo.completed ? 'completed' : ''}`;
+        li.innerHTML = `
+            <span onclick="toggleTodo(${todo.id})">${todo.text}</span>
+            <button class="delete-btn" onclick="deleteTodo(${todo.id})">Delete</button>
+        `;
+        list.appendChild(li);
+    });
+}
+
+function clearAll() {
+    todos = [];
+    renderTodos();
+}
+
+document.getElementById('add-btn').addEventListener('click', addTodo);
+document.getElementById('clear-btn').addEventListener('click', clearAll);
+document.getElementById('todo-input').addEventListener('keypress', (e) => {
+    if (e.key === 'Enter') addTodo();
+});
@@ -0,0 +1,118 @@
+import json
+import os
+import re
+
+try:
+    from backend.similarity import NEGATIONS, prompt_tokens
+except ModuleNotFoundError:
+    from similarity import NEGATIONS, prompt_tokens
+
+
+TEMPLATE_PACKS_DIR = os.getenv(
+    "TEMPLATE_PACKS_DIR", os.path.join(os.path.dirname(__file__), "template_packs")
+)
+
+
+_CLAUSE_RE = re.compile(r"[,.;:!?()]|\bbut\b|\binstead\b")
+
+
+def negated_tokens(prompt: str) -> frozenset[str]:
+    """Content words a negation rules out, up to the end of its clause:
+    "calculator, not a todo list" negates {"todo", "list"}."""
+    negated = set()
+    for clause in _CLAUSE_RE.split(prompt.lower().replace("'", "")):
+        words = clause.split()
+        for idx, word in enumerate(words):
+            if word in NEGATIONS:
+                negated |= prompt_tokens(" ".join(words[idx + 1:]))
+                break
+    return frozenset(negated - NEGATIONS)
+
+
+class TemplatePack:
+    """A directory of app files plus the words that identify prompts it can serve.
+
+    Each pack lives in its own folder with a `pack.json` describing it and
+    the files it renders; `{{title}}` in any file is replaced on render.
+    """
+
+    def __init__(self, name: str, title: str, files: dict[str, str],
+                 keywords: frozenset[str], vocabulary: frozenset[str], fast_path: bool):
+        self.name = name
+        self.title = title
+        self.files = files
+        self.keywords = keywords
+        self.vocabulary = vocabulary
+        self.fast_path = fast_path
+
+    @classmethod
+    def load(cls, folder: str) -> "TemplatePack":
+        with open(os.path.join(folder, "pack.json"), "r", encoding="utf-8") as f:
+            spec = json.load(f)
+
+        files = {}
+        for filename in spec["files"]:
+            with open(os.path.join(folder, filename), "r", encoding="utf-8") as f:
+                files[filename] = f.read()
+
+        return cls(
+            name=spec.get("name") or os.path.basename(folder),
+            title=spec.get("title", "Web App"),
+            files=files,
+            # Run pack words through the prompt tokenizer so plurals and
+            # casing compare the same way as user prompts.
+            keywords=prompt_tokens(" ".join(spec.get("keywords", []))),
+            vocabulary=prompt_tokens(" ".join(spec.get("vocabulary", []))),
+            fast_path=bool(spec.get("fast_path", True)),
+        )
+
+    def render(self, title: str | None = None) -> dict[str, str]:
+        title = title or self.title
+        return {
+            filename: content.replace("{{title}}", title)
+            for filename, content in self.files.items()
+        }
+
+    def score(self, tokens: frozenset[str], negated: frozenset[str] = frozenset()) -> float:
+        """Share of the prompt's content words this pack accounts for.
+
+        Zero unless the prompt names the pack, or if it rules out anything
+        the pack is or has (a template cannot leave features out); requests
+        for features beyond the pack's vocabulary lower the score.
+        """
+        if negated & (self.keywords | self.vocabulary):
+            return 0.0
+        tokens = tokens - negated - NEGATIONS
+        if not tokens or not tokens & self.keywords:
+            return 0.0
+        return len(tokens & (self.keywords | self.vocabulary)) / len(tokens)
+
+
+def load_template_packs(directory: str = TEMPLATE_PACKS_DIR) -> dict[str, TemplatePack]:
+    packs = {}
+    if not os.path.isdir(directory):
+        return packs
+
+    for name in sorted(os.listdir(directory)):
+        folder = os.path.join(directory, name)
+        if os.path.exists(os.path.join(folder, "pack.json")):
+            pack = TemplatePack.load(folder)
+            packs[pack.name] = pack
+    return packs
+
+
+def classify_prompt(prompt: str, packs: dict[str, TemplatePack]) -> tuple[TemplatePack | None, float]:
+    """Return the fast-path pack that best explains the prompt and its confidence."""
+    # "to-do" and "todo" should read the same, as should "don't" and "dont".
+    prompt = prompt.replace("-", "").replace("'", "")
+    tokens = prompt_tokens(prompt)
+    negated = negated_tokens(prompt)
+
+    best, best_score = None, 0.0
+    for pack in packs.values():
+        if not pack.fast_path:
+            continue
+        score = pack.score(tokens, negated)
+        if score > best_score:
+            best, best_score = pack, score
+    return best, best_score
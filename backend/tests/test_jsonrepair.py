@@ -0,0 +1,126 @@
+import json
+import unittest
+
+from backend.Agent.jsonrepair import ArrayItemStream, parse_json, repair_json
+
+
+class RepairJsonTest(unittest.TestCase):
+    # (case, truncated or wrapped text, value the repaired text decodes to)
+    CASES = [
+        ("complete", '{"a": 1, "b": [true, null]}', {"a": 1, "b": [True, None]}),
+        ("inside string", '{"name": "Todo ap', {"name": "Todo ap"}),
+        ("inside nested string", '{"files": [{"path": "index.ht', {"files": [{"path": "index.ht"}]}),
+        ("inside escape", '{"a": "line\\', {"a": "line"}),
+        ("after escape", '{"a": "say \\"hi', {"a": 'say "hi'}),
+        ("inside unicode escape", '{"a": "caf\\u00', {"a": "caf"}),
+        ("inside number", '{"a": 1, "b": 1.', {"a": 1}),
+        ("after minus sign", '{"a": [1, -', {"a": [1]}),
+        ("number kept whole", '{"a": [1, 22', {"a": [1, 22]}),
+        ("inside true", '{"a": 1, "b": tr', {"a": 1}),
+        ("inside null", '{"a": [nu', {"a": []}),
+        ("dangling key", '{"a": 1, "b"', {"a": 1}),
+        ("dangling partial key", '{"a": 1, "bc', {"a": 1}),
+        ("dangling colon", '{"a": 1, "b":', {"a": 1}),
+        ("dangling comma", '{"a": 1,', {"a": 1}),
+        ("dangling comma in array", '{"a": [1, 2, ', {"a": [1, 2]}),
+        ("only an opener", "{", {}),
+        ("leading prose", 'Here is the plan: {"a": 1}', {"a": 1}),
+        ("leading prose, truncated", 'Sure!\n{"a": [1, 2', {"a": [1, 2]}),
+        ("code fence", '```json\n{"a": 1}\n```', {"a": 1}),
+        ("code fence, truncated", '```json\n{"a": {"b": "c', {"a": {"b": "c"}}),
+        ("trailing prose", '{"a": 1}\nLet me know!', {"a": 1}),
+        ("bracket inside string", '{"a": "x]y}", "b": [1', {"a": "x]y}", "b": [1]}),
+        ("brace inside key", '{"a{": [', {"a{": []}),
+    ]
+
+    def test_cases(self):
+        for case, text, expected in self.CASES:
+            with self.subTest(case=case):
+                self.assertEqual(json.loads(repair_json(text)), expected)
+
+    def test_every_prefix_repairs_to_valid_json(self):
+        document = json.dumps({
+            "name": "Notes \"app\" é",
+            "implementation_steps": [
+                {"filepath": "index.html", "task_description": "Markup [with] {braces}"},
+                {"filepath": "app.js", "task_description": "Logic", "depends_on": [0]},
+            ],
+            "score": -1.5e3,
+            "done": False,
+        })
+        for end in range(1, len(document) + 1):
+            with self.subTest(end=end):
+                json.loads(repair_json(document[:end]))
+
+
+class ParseJsonTest(unittest.TestCase):
+    CASES = [
+        ("valid", '{"a": 1}', {"a": 1}, False),
+        ("fenced", '```json\n{"a": 1}\n```', {"a": 1}, False),
+        ("leading prose", 'Plan:\n{"a": 1}', {"a": 1}, False),
+        ("truncated", '{"a": [1, 2', {"a": [1, 2]}, True),
+        ("fenced and truncated", '```json\n{"a": "b', {"a": "b"}, True),
+        ("top-level array", "[1, 2", [1, 2], True),
+    ]
+
+    def test_cases(self):
+        for case, text, expected, repaired in self.CASES:
+            with self.subTest(case=case):
+                self.assertEqual(parse_json(text), (expected, repaired))
+
+    def test_not_json(self):
+        with self.assertRaises(ValueError):
+            parse_json("I could not produce a plan.")
+
+
+class ArrayItemStreamTest(unittest.TestCase):
+    DOCUMENT = json.dumps({
+        "plan": {"implementation_steps": [{"filepath": "nested.js"}]},
+        "implementation_steps": [
+            {"filepath": "index.html", "task_description": "Has ] and , and \"quotes\""},
+            {"filepath": "app.js", "depends_on": [0, [1]]},
+            "plain string ]",
+            7,
+        ],
+        "after": [{"filepath": "ignored.css"}],
+    })
+    EXPECTED = [
+        {"filepath": "index.html", "task_description": 'Has ] and , and "quotes"'},
+        {"filepath": "app.js", "depends_on": [0, [1]]},
+        "plain string ]",
+        7,
+    ]
+
+    def stream(self, text: str, size: int) -> list:
+        stream = ArrayItemStream("implementation_steps")
+        items = []
+        for start in range(0, len(text), size):
+            items += stream.feed(text[start:start + size])
+        return items
+
+    def test_chunk_sizes(self):
+        for size in (1, 2, 3, 7, 16, len(self.DOCUMENT)):
+            with self.subTest(size=size):
+                self.assertEqual(self.stream(self.DOCUMENT, size), self.EXPECTED)
+
+    def test_items_arrive_as_they_complete(self):
+        stream = ArrayItemStream("implementation_steps")
+        self.assertEqual(stream.feed('{"implementation_steps": [{"a": 1}'), [])
+        self.assertEqual(stream.feed(', {"b"'), [{"a": 1}])
+        self.assertEqual(stream.feed(": 2}]}"), [{"b": 2}])
+
+    def test_truncated_item_is_not_yielded(self):
+        text = '{"implementation_steps": [{"a": 1}, {"b": "cut'
+        self.assertEqual(self.stream(text, 5), [{"a": 1}])
+
+    def test_undecodable_item_is_skipped(self):
+        text = '{"implementation_steps": [{"a": 1}, {oops}, {"c": 3}]}'
+        self.assertEqual(self.stream(text, 4), [{"a": 1}, {"c": 3}])
+
+    def test_key_inside_string_value(self):
+        text = '{"note": "implementation_steps", "x": [1], "implementation_steps": [2]}'
+        self.assertEqual(self.stream(text, 3), [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
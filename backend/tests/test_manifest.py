@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from backend.Agent.manifest import WorkspaceManifest
+
+
+class WorkspaceManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="buildflow-manifest-test-")
+        path = os.path.join(self.folder, "workspaces.sqlite3")
+        # Two workers sharing one manifest file.
+        self.writer = WorkspaceManifest(path)
+        self.reader = WorkspaceManifest(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_reader_sees_other_workers_writes_until_settled(self):
+        self.writer.register("p1", job_id="p1", status="running")
+        self.writer.record_file("p1", "index.html", 10, "a" * 64)
+        self.assertEqual(self.reader.get("p1")["files"], {"index.html": 10})
+
+        self.writer.record_file("p1", "app.js", 20, "b" * 64)
+        self.writer.set_status("p1", "succeeded")
+        entry = self.reader.get("p1")
+        self.assertEqual(entry["status"], "succeeded")
+        self.assertEqual(entry["files"], {"index.html": 10, "app.js": 20})
+        self.assertEqual(entry["digests"], {"index.html": "a" * 64, "app.js": "b" * 64})
+
+    def test_only_settled_entries_are_cached(self):
+        self.writer.register("p1", status="running")
+        self.reader.get("p1")
+        self.assertIsNone(self.reader._cached("p1"))
+
+        self.writer.set_status("p1", "succeeded")
+        self.reader.get("p1")
+        self.assertEqual(self.reader._cached("p1")["status"], "succeeded")
+
+    def test_own_writes_invalidate_the_cached_entry(self):
+        self.writer.register("p1", status="succeeded")
+        self.writer.get("p1")
+        self.writer.register("p1", status="running")
+        self.assertEqual(self.writer.get("p1")["status"], "running")
+
+    def test_forget_releases_blob_references(self):
+        self.writer.record_file("p1", "index.html", 10, "a" * 64)
+        self.writer.record_file("p2", "index.html", 10, "a" * 64)
+        self.writer.forget("p1")
+        self.assertIsNone(self.reader.get("p1"))
+        self.assertEqual(self.writer.unreferenced_blobs(float("inf")), [])
+        self.writer.forget("p2")
+        self.assertEqual(self.writer.unreferenced_blobs(float("inf")), ["a" * 64])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+from backend.Agent.multifile import SectionSplitter, format_sections, validate_section
+
+
+def split(text: str, size: int) -> list[tuple[str, str, str]]:
+    """Feed `text` to a splitter `size` characters at a time; return the non-chunk events."""
+    splitter = SectionSplitter()
+    events = []
+    for start in range(0, len(text), size):
+        events += splitter.feed(text[start:start + size])
+    events += splitter.close()
+    return [event for event in events if event[0] != "chunk"]
+
+
+class SectionSplitterTest(unittest.TestCase):
+    def test_markers_split_across_chunks(self):
+        text = format_sections({"index.html": "<p>hi</p>", "app.js": "let a = 1;"})
+        expected = [("done", "index.html", "<p>hi</p>"), ("done", "app.js", "let a = 1;")]
+        for size in (1, 2, 3, 5, 7, 11, len(text)):
+            with self.subTest(size=size):
+                self.assertEqual(split(text, size), expected)
+
+    def test_missing_footer_is_partial(self):
+        text = "=== FILE: style.css ===\n.a { color: red;\n"
+        self.assertEqual(split(text, 4), [("partial", "style.css", ".a { color: red;")])
+
+    def test_missing_footer_without_trailing_newline(self):
+        text = "=== FILE: app.js ===\nlet a = 1;"
+        self.assertEqual(split(text, 3), [("partial", "app.js", "let a = 1;")])
+
+    def test_next_header_closes_section(self):
+        text = "=== FILE: a.js ===\nlet a;\n=== FILE: b.js ===\nlet b;\n=== END FILE ===\n"
+        self.assertEqual(split(text, 6), [("done", "a.js", "let a;"), ("done", "b.js", "let b;")])
+
+    def test_prose_and_fences_are_dropped(self):
+        text = (
+            "Here are your files:\n"
+            "=== FILE: app.js ===\n```js\nconst s = \"}\";\n```\n=== END FILE ===\n"
+            "Let me know if you need anything else.\n"
+        )
+        self.assertEqual(split(text, 4), [("done", "app.js", 'const s = "}";')])
+
+    def test_chunks_are_content_lines(self):
+        splitter = SectionSplitter()
+        events = splitter.feed("=== FILE: a.js ===\nline one\nline t")
+        self.assertEqual(events, [("chunk", "a.js", "line one\n")])
+        self.assertEqual(splitter.feed("wo\n"), [("chunk", "a.js", "line two\n")])
+
+
+class ValidateSectionTest(unittest.TestCase):
+    CASES = [
+        ("index.html", "<html><body><p>ok</p></body></html>", None),
+        ("index.html", "<html><body><p>cut", "missing </html>"),
+        ("index.html", "<body><p>cut", "missing </body>"),
+        ("index.html", "<p>fragment</p>", None),
+        ("style.css", ".a { color: red; }", None),
+        ("style.css", ".a { color: red;", "unbalanced braces"),
+        ("style.css", '.a::after { content: "}"; } /* { */', None),
+        ("app.js", "function f() { return [1, 2]; }", None),
+        ("app.js", "function f() { return [1, 2];", "unbalanced brackets"),
+        ("app.js", "const s = '}'; // {\nconst t = `(`;", None),
+        ("app.js", "const s = 'never closed;", "unbalanced brackets"),
+        ("app.js", "/* never closed", "unbalanced brackets"),
+        ("app.js", "f(]", "unbalanced brackets"),
+        ("README", "anything {", None),
+        ("app.js", "   \n", "empty section"),
+    ]
+
+    def test_cases(self):
+        for path, content, expected in self.CASES:
+            with self.subTest(path=path, content=content):
+                self.assertEqual(validate_section(path, content), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
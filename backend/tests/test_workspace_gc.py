@@ -0,0 +1,194 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+# Workspace, blob and manifest locations are read at import time.
+_STATE = tempfile.mkdtemp(prefix="buildflow-gc-test-")
+os.environ["BUILDFLOW_STATE_DIR"] = os.path.join(_STATE, "state")
+os.environ["BUILDFLOW_WORKSPACES_DIR"] = os.path.join(_STATE, "workspaces")
+os.environ["BLOB_GC_GRACE_SECONDS"] = "0"
+for name in ("BLOB_STORE_DIR", "WORKSPACE_MANIFEST_PATH", "ARCHIVE_CACHE_DIR", "STAGE_CACHE_DIR"):
+    os.environ.pop(name, None)
+
+from backend.Agent.blobs import BLOBS  # noqa: E402
+from backend.Agent.manifest import MANIFEST  # noqa: E402
+from backend.Agent.stage_cache import STAGE_CACHE_TTL_SECONDS, load_stage, save_stage  # noqa: E402
+from backend.Agent.tools import BASE_DIR, collect_blobs, write_file  # noqa: E402
+from backend.workspace_gc import WorkspaceCollector  # noqa: E402
+
+
+def tearDownModule():
+    shutil.rmtree(_STATE, ignore_errors=True)
+
+
+class _Checkpoints:
+    def __init__(self):
+        self.deleted = []
+
+    def delete_thread(self, thread_id: str):
+        self.deleted.append(thread_id)
+
+
+class WorkspaceCollectorTest(unittest.TestCase):
+    def setUp(self):
+        conn = MANIFEST._connect()
+        for table in ("workspaces", "workspace_files", "blobs"):
+            conn.execute(f"DELETE FROM {table}")
+        with MANIFEST._lock:
+            MANIFEST._entries.clear()
+        for folder in (BASE_DIR, BLOBS.root):
+            shutil.rmtree(folder, ignore_errors=True)
+        os.makedirs(BASE_DIR)
+        self.checkpoints = _Checkpoints()
+
+    def collector(self, protected=(), **quotas) -> WorkspaceCollector:
+        quotas = {"max_bytes": 0, "max_count": 0, "max_age_seconds": 3600, **quotas}
+        return WorkspaceCollector(
+            protected=lambda: set(protected),
+            running_grace_seconds=600,
+            interval_seconds=0,
+            checkpointer=self.checkpoints,
+            **quotas,
+        )
+
+    def workspace(self, project_id: str, files: dict[str, str], status: str = "succeeded",
+                  idle_seconds: float = 0, updated_seconds_ago: float = 0):
+        MANIFEST.register(project_id, job_id=project_id, status="running")
+        for path, content in files.items():
+            result = write_file.invoke({"path": f"{project_id}/{path}", "content": content})
+            self.assertTrue(result.startswith("Successfully"), result)
+        MANIFEST.set_status(project_id, status)
+        now = time.time()
+        MANIFEST._connect().execute(
+            "UPDATE workspaces SET last_access = ?, updated_at = ? WHERE project_id = ?",
+            (now - idle_seconds, now - updated_seconds_ago, project_id),
+        )
+
+    def refcounts(self) -> dict[str, int]:
+        return dict(MANIFEST._connect().execute("SELECT digest, refcount FROM blobs"))
+
+    def test_shared_blobs_survive_removal_of_one_workspace(self):
+        self.workspace("old", {"index.html": "<p>shared</p>", "app.js": "let old;"}, idle_seconds=7200)
+        self.workspace("new", {"index.html": "<p>shared</p>", "app.js": "let fresh;"})
+        shared = MANIFEST.get("new")["digests"]["index.html"]
+        only_old = MANIFEST.get("old")["digests"]["app.js"]
+        self.assertEqual(self.refcounts()[shared], 2)
+
+        result = self.collector().run_once()
+
+        self.assertEqual(result["removed"]["age"], 1)
+        self.assertEqual(MANIFEST.project_ids(), {"new"})
+        self.assertFalse(os.path.exists(os.path.join(BASE_DIR, "old")))
+        self.assertEqual(self.checkpoints.deleted, ["old"])
+        self.assertEqual(self.refcounts(), {shared: 1, MANIFEST.get("new")["digests"]["app.js"]: 1})
+        self.assertTrue(os.path.exists(BLOBS.path(shared)))
+        self.assertFalse(os.path.exists(BLOBS.path(only_old)))
+        with open(os.path.join(BASE_DIR, "new", "index.html"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "<p>shared</p>")
+
+    def test_protected_workspaces_are_skipped(self):
+        self.workspace("cached", {"index.html": "<p>cached</p>"}, idle_seconds=7200)
+        self.workspace("stale", {"index.html": "<p>stale</p>"}, idle_seconds=7200)
+
+        result = self.collector(protected={"cached"}).run_once()
+
+        self.assertEqual(result["removed"]["age"], 1)
+        self.assertEqual(MANIFEST.project_ids(), {"cached"})
+        self.assertTrue(os.path.exists(os.path.join(BASE_DIR, "cached", "index.html")))
+
+    def test_running_workspaces_are_skipped_until_abandoned(self):
+        self.workspace("running", {"index.html": "<p>a</p>"}, status="running", idle_seconds=7200)
+        self.workspace("abandoned", {"index.html": "<p>b</p>"}, status="running",
+                       idle_seconds=7200, updated_seconds_ago=7200)
+
+        self.collector().run_once()
+
+        self.assertEqual(MANIFEST.project_ids(), {"running"})
+        self.assertEqual(self.checkpoints.deleted, ["abandoned"])
+
+    def test_count_and_bytes_quotas_remove_least_recently_used(self):
+        self.workspace("a", {"index.html": "a" * 100}, idle_seconds=30)
+        self.workspace("b", {"index.html": "b" * 100}, idle_seconds=20)
+        self.workspace("c", {"index.html": "c" * 100}, idle_seconds=10)
+
+        result = self.collector(max_count=2).run_once()
+        self.assertEqual(result["removed"]["count"], 1)
+        self.assertEqual(MANIFEST.project_ids(), {"b", "c"})
+
+        result = self.collector(max_bytes=150).run_once()
+        self.assertEqual(result["removed"]["bytes"], 1)
+        self.assertEqual(MANIFEST.project_ids(), {"c"})
+
+    def test_refcounts_return_to_zero_after_forget(self):
+        self.workspace("one", {"index.html": "<p>x</p>", "app.js": "let x;"})
+        self.workspace("two", {"index.html": "<p>x</p>"})
+        digests = set(MANIFEST.get("one")["digests"].values())
+
+        MANIFEST.forget("one")
+        self.assertEqual(min(self.refcounts().values()), 0)
+        MANIFEST.forget("two")
+        self.assertEqual(set(self.refcounts().values()), {0})
+        self.assertEqual(set(MANIFEST.unreferenced_blobs(time.time() + 1)), digests)
+
+        shutil.rmtree(os.path.join(BASE_DIR, "one"))
+        shutil.rmtree(os.path.join(BASE_DIR, "two"))
+        time.sleep(0.01)
+        self.assertGreater(collect_blobs(0), 0)
+        self.assertEqual(self.refcounts(), {})
+        for digest in digests:
+            self.assertFalse(os.path.exists(BLOBS.path(digest)))
+
+    def legacy_workspace(self):
+        os.makedirs(os.path.join(BASE_DIR, "legacy"))
+        with open(os.path.join(BASE_DIR, "legacy", "index.html"), "w", encoding="utf-8") as f:
+            f.write("<p>legacy</p>")
+        with open(os.path.join(BASE_DIR, "legacy.zip"), "wb") as f:
+            f.write(b"zip")
+        old = time.time() - 7200
+        os.utime(os.path.join(BASE_DIR, "legacy"), (old, old))
+
+    def test_legacy_workspaces_are_left_alone_by_default(self):
+        self.legacy_workspace()
+        MANIFEST.adopt("adopted-earlier", {}, time.time() - 7200)
+
+        result = self.collector().run_once()
+
+        self.assertEqual(result["removed"], {"age": 0, "count": 0, "bytes": 0})
+        self.assertIsNone(MANIFEST.get("legacy"))
+        self.assertIsNotNone(MANIFEST.get("adopted-earlier"))
+        self.assertTrue(os.path.exists(os.path.join(BASE_DIR, "legacy.zip")))
+        self.assertTrue(os.path.exists(os.path.join(BASE_DIR, "legacy", "index.html")))
+
+    def test_untracked_folders_are_adopted_when_enabled(self):
+        self.legacy_workspace()
+
+        result = self.collector(max_age_seconds=0, collect_legacy=True).run_once()
+
+        self.assertEqual(result["reclaimed_bytes"]["zips"], 3)
+        self.assertFalse(os.path.exists(os.path.join(BASE_DIR, "legacy.zip")))
+        entry = MANIFEST.get("legacy")
+        self.assertEqual(entry["status"], "adopted")
+        self.assertEqual(entry["files"], {"index.html": len("<p>legacy</p>")})
+
+        result = self.collector(collect_legacy=True).run_once()
+        self.assertEqual(result["removed"]["age"], 1)
+        self.assertFalse(os.path.exists(os.path.join(BASE_DIR, "legacy")))
+
+    def test_expired_stage_outputs_are_swept(self):
+        save_stage("planner", "old", {"plan": "old"})
+        save_stage("planner", "fresh", {"plan": "fresh"})
+        old_path = os.path.join(os.environ["BUILDFLOW_STATE_DIR"], "stages", "planner", "old.json")
+        old = time.time() - STAGE_CACHE_TTL_SECONDS - 60
+        os.utime(old_path, (old, old))
+
+        result = self.collector().run_once()
+
+        self.assertEqual(result["reclaimed_bytes"]["stages"], len('{"plan": "old"}'))
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(load_stage("planner", "fresh"), {"plan": "fresh"})
+
+
+if __name__ == "__main__":
+    unittest.main()
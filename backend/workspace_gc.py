@@ -0,0 +1,186 @@
+import os
+import time
+from threading import Event, Lock, Thread
+
+try:
+    from backend.Agent.manifest import MANIFEST
+    from backend.Agent.stage_cache import STAGE_CACHE_TTL_SECONDS, expire_stages
+    from backend.Agent.telemetry import METRICS
+    from backend.Agent.tools import BASE_DIR, collect_blobs, remove_workspace
+    from backend.archive import ARCHIVE_CACHE_DIR, workspace_paths
+except ModuleNotFoundError:
+    from Agent.manifest import MANIFEST
+    from Agent.stage_cache import STAGE_CACHE_TTL_SECONDS, expire_stages
+    from Agent.telemetry import METRICS
+    from Agent.tools import BASE_DIR, collect_blobs, remove_workspace
+    from archive import ARCHIVE_CACHE_DIR, workspace_paths
+
+# 0 disables the background task; run_once() can still be called directly.
+WORKSPACE_GC_INTERVAL_SECONDS = max(0, int(os.getenv("WORKSPACE_GC_INTERVAL_SECONDS", "300")))
+# Quotas; 0 means no limit. Age counts from the workspace's last access and
+# defaults to the generation cache TTL, so a workspace lives at least as long
+# as the cache entry that points at it.
+WORKSPACE_MAX_BYTES = max(0, int(os.getenv("WORKSPACE_MAX_BYTES", str(1024 ** 3))))
+WORKSPACE_MAX_COUNT = max(0, int(os.getenv("WORKSPACE_MAX_COUNT", "5000")))
+WORKSPACE_MAX_AGE_SECONDS = max(0, int(os.getenv(
+    "WORKSPACE_MAX_AGE_SECONDS", os.getenv("GENERATION_CACHE_TTL_SECONDS", "900"),
+)))
+
+# Workspace folders and zips that predate the manifest (such as the samples
+# checked into backend/workspaces) are only indexed and collected when this
+# is set; otherwise GC never touches anything it did not see being written.
+WORKSPACE_GC_LEGACY = os.getenv("WORKSPACE_GC_LEGACY", "0").strip().lower() not in {"0", "false", "no"}
+
+_IN_FLIGHT_STATUSES = frozenset({"queued", "running"})
+_ADOPTED_STATUS = "adopted"
+
+METRICS.counter(
+    "buildflow_workspace_gc_reclaimed_bytes_total",
+    "Disk bytes freed by workspace GC, by kind: workspaces, blobs, archives, stages or zips.",
+)
+METRICS.counter("buildflow_workspace_gc_removed_total", "Workspaces deleted by GC, by quota: age, count or bytes.")
+METRICS.histogram("buildflow_workspace_gc_seconds", "Duration of one workspace GC pass.")
+
+
+class WorkspaceCollector:
+    """Delete workspaces over the age, count or size quota, least recently
+    used first, along with the zips and blobs nothing references any more
+    and stage outputs past their TTL.
+
+    `protected()` returns project ids that must survive: workspaces of live
+    cache entries and of this process's in-flight jobs. Workspaces another
+    worker marked running within `running_grace_seconds` are kept as well.
+    Removed workspaces lose their graph checkpoints in `checkpointer`.
+    Legacy folders and zips are left alone unless `collect_legacy` is set.
+    """
+
+    def __init__(self, protected, running_grace_seconds: float,
+                 max_bytes: int = WORKSPACE_MAX_BYTES, max_count: int = WORKSPACE_MAX_COUNT,
+                 max_age_seconds: int = WORKSPACE_MAX_AGE_SECONDS,
+                 interval_seconds: int = WORKSPACE_GC_INTERVAL_SECONDS, checkpointer=None,
+                 collect_legacy: bool = WORKSPACE_GC_LEGACY):
+        self.protected = protected
+        self.collect_legacy = collect_legacy
+        self.checkpointer = checkpointer
+        self.running_grace_seconds = running_grace_seconds
+        self.max_bytes = max_bytes
+        self.max_count = max_count
+        self.max_age_seconds = max_age_seconds
+        self.interval_seconds = interval_seconds
+        self.workspaces = 0
+        self.workspace_bytes = 0
+        self._adopted = False
+        self._run_lock = Lock()
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+    def start(self):
+        if self.interval_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._loop, name="workspace-gc", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Workspace GC failed: {e}")
+
+    def _adopt_untracked(self) -> int:
+        """Index workspace folders the manifest has never seen and delete the
+        zips older versions left next to them; returns the bytes freed."""
+        known = MANIFEST.project_ids()
+        freed = 0
+        for name in os.listdir(BASE_DIR):
+            path = os.path.join(BASE_DIR, name)
+            if name.startswith("."):
+                continue
+            if name.endswith(".zip") and os.path.isfile(path):
+                # Zips are served from the archive cache now.
+                freed += os.path.getsize(path)
+                os.remove(path)
+            elif os.path.isdir(path) and name not in known:
+                files = {rel: os.path.getsize(os.path.join(path, rel)) for rel in workspace_paths(path)}
+                MANIFEST.adopt(name, files, os.path.getmtime(path))
+        return freed
+
+    def _expire_archives(self, before: float) -> int:
+        freed = 0
+        try:
+            names = os.listdir(ARCHIVE_CACHE_DIR)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            path = os.path.join(ARCHIVE_CACHE_DIR, name)
+            try:
+                if os.path.getmtime(path) < before:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                    freed += size
+            except FileNotFoundError:
+                continue
+        return freed
+
+    def _removal_reason(self, row: dict, now: float, count: int, total: int) -> str | None:
+        if self.max_age_seconds and now - row["last_access"] > self.max_age_seconds:
+            return "age"
+        if self.max_count and count > self.max_count:
+            return "count"
+        if self.max_bytes and total > self.max_bytes:
+            return "bytes"
+        return None
+
+    def run_once(self) -> dict:
+        """One GC pass; returns what it removed and the bytes it freed."""
+        with self._run_lock:
+            started = time.monotonic()
+            reclaimed = {"workspaces": 0, "blobs": 0, "archives": 0, "stages": 0, "zips": 0}
+            removed = {"age": 0, "count": 0, "bytes": 0}
+            if self.collect_legacy and not self._adopted:
+                reclaimed["zips"] = self._adopt_untracked()
+                self._adopted = True
+
+            protected = self.protected()
+            now = time.time()
+            rows = MANIFEST.by_last_access()
+            count = len(rows)
+            total = sum(row["size_bytes"] for row in rows)
+            for row in rows:
+                reason = self._removal_reason(row, now, count, total)
+                if reason is None:
+                    # Rows are oldest first: nothing after this one is over quota.
+                    break
+                if row["project_id"] in protected:
+                    continue
+                if row["status"] == _ADOPTED_STATUS and not self.collect_legacy:
+                    continue
+                if (row["status"] in _IN_FLIGHT_STATUSES
+                        and now - row["updated_at"] < self.running_grace_seconds):
+                    continue
+                reclaimed["workspaces"] += remove_workspace(row["project_id"], self.checkpointer)
+                removed[reason] += 1
+                count -= 1
+                total -= row["size_bytes"]
+
+            if self.max_age_seconds:
+                reclaimed["archives"] = self._expire_archives(now - self.max_age_seconds)
+            reclaimed["stages"] = expire_stages(now - STAGE_CACHE_TTL_SECONDS)
+            reclaimed["blobs"] = collect_blobs()
+            self.workspaces, self.workspace_bytes = count, total
+
+        for kind, freed in reclaimed.items():
+            if freed:
+                METRICS.inc("buildflow_workspace_gc_reclaimed_bytes_total", freed, kind=kind)
+        for reason, removed_count in removed.items():
+            if removed_count:
+                METRICS.inc("buildflow_workspace_gc_removed_total", removed_count, reason=reason)
+        METRICS.observe("buildflow_workspace_gc_seconds", time.monotonic() - started)
+        return {"removed": removed, "reclaimed_bytes": reclaimed}
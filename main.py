@@ -1,6 +1,7 @@
 import argparse
 import sys
 import traceback
+import uuid
 
 from Agent.graph import agent
 
@@ -16,7 +17,7 @@ def main():
         user_prompt = input("Enter your project prompt: ")
         result = agent.invoke(
             {"user_prompt": user_prompt},
-            {"recursion_limit": args.recursion_limit}
+            {"recursion_limit": args.recursion_limit, "configurable": {"thread_id": uuid.uuid4().hex}}
         )
         print("Final State:", result)
     except KeyboardInterrupt: